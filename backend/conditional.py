@@ -0,0 +1,49 @@
+import hashlib
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+
+class ConditionalGetMixin:
+    """
+    GET condicional (ETag / If-None-Match) para listados de un ViewSet.
+    La huella del listado es la cantidad de filas, el mayor id y la fecha de modificación
+    más reciente de `conditional_fields` sobre el queryset filtrado: una sola consulta de
+    agregación. Si el cliente ya tiene esa versión se responde 304 sin serializar nada.
+    No se envía Last-Modified: la fecha más reciente no cambia cuando se elimina una fila
+    que no es la última, y un cliente que solo enviara If-Modified-Since recibiría un 304
+    con datos viejos.
+    """
+    conditional_fields = ('updated_at',)
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_get(request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def get_fingerprint_extra(self):
+        """Datos adicionales de la huella, para respuestas que dependen de algo más que las filas."""
+        return ''
+
+    def get_fingerprint(self, queryset, fields=None):
+        """Retorna el ETag del queryset."""
+        fields = self.conditional_fields if fields is None else fields
+        data = queryset.order_by().aggregate(
+            _count=Count('pk'), _max_pk=Max('pk'),
+            **{f'_max_{index}': Max(field) for index, field in enumerate(fields)}
+        )
+        raw = '|'.join(str(value) for value in data.values()) + '|' + self.get_fingerprint_extra()
+        return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+    def conditional_get(self, request, queryset, build_response, fields=None):
+        """
+        Responde 304 si la huella coincide con If-None-Match; en otro caso construye la
+        respuesta con `build_response` y le agrega el ETag.
+        """
+        etag = self.get_fingerprint(queryset, fields)
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+        response = build_response()
+        if response.status_code == 200:
+            response['ETag'] = etag
+        return response
@@ -0,0 +1,143 @@
+import base64
+import json
+from django.conf import settings
+from django.db.models import Q
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginación por llave (keyset) sobre un ordenamiento estable de varios campos.
+    El cursor guarda los valores de todos los campos de ordenamiento del último registro,
+    por lo que cada página se obtiene con un filtro indexado y cuesta lo mismo que la primera.
+    La subclase define `ordering`, que debe terminar en un campo único (por ejemplo id).
+    Es opcional: sin `cursor` ni `page_size` en la consulta se responde la lista completa.
+    """
+    ordering = ('id',)
+    page_size = getattr(settings, 'KEYSET_PAGE_SIZE', 100)
+    max_page_size = getattr(settings, 'KEYSET_MAX_PAGE_SIZE', 1000)
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.is_requested(request):
+            return None
+        self.request = request
+        self.page_size_value = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        self.reverse = bool(cursor and cursor.get('r'))
+
+        ordering = self._reversed(self.ordering) if self.reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        try:
+            if cursor:
+                queryset = queryset.filter(self._after(ordering, cursor['v']))
+            page = list(queryset[:self.page_size_value + 1])
+        except (DjangoValidationError, TypeError, ValueError):
+            # Valores del cursor que no corresponden al tipo de los campos de ordenamiento
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+        has_more = len(page) > self.page_size_value
+        page = page[:self.page_size_value]
+        if self.reverse:
+            page.reverse()
+
+        # Avanzando: hay siguiente si sobró un registro y anterior si se llegó con cursor.
+        # Retrocediendo: lo contrario.
+        self.has_next = has_more if not self.reverse else bool(page)
+        self.has_previous = bool(cursor) if not self.reverse else has_more
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def is_requested(self, request):
+        """El cliente pidió paginar: envió un cursor o un tamaño de página."""
+        return any(param in request.query_params for param in (self.cursor_query_param, self.page_size_query_param))
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def encode_cursor(self, obj, reverse):
+        values = [self._value(obj, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps({'v': values, 'r': reverse}, default=self._encode_value)
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            if len(cursor['v']) != len(self.ordering):
+                raise ValueError
+        except (TypeError, ValueError, KeyError):
+            raise ValidationError({self.cursor_query_param: self.invalid_cursor_message})
+        return cursor
+
+    @staticmethod
+    def _encode_value(value):
+        # isoformat conserva los microsegundos, necesarios para comparar fechas con igualdad
+        if hasattr(value, 'isoformat'):
+            return value.isoformat()
+        return str(value)
+
+    @staticmethod
+    def _value(obj, field):
+        for part in field.split('__'):
+            obj = getattr(obj, part)
+        return obj
+
+    @staticmethod
+    def _reversed(ordering):
+        return tuple(field[1:] if field.startswith('-') else f'-{field}' for field in ordering)
+
+    @staticmethod
+    def _after(ordering, values):
+        """
+        Condición (a, b, ...) > (x, y, ...) según la dirección de cada campo:
+        (a > x) OR (a = x AND b > y) OR ...
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
@@ -110,6 +110,39 @@ REST_FRAMEWORK = {
     )
 }
 
+# Paginación por llave (backend/pagination.py) de resultados y documentos
+KEYSET_PAGE_SIZE = int(os.getenv('KEYSET_PAGE_SIZE', 100))
+KEYSET_MAX_PAGE_SIZE = int(os.getenv('KEYSET_MAX_PAGE_SIZE', 1000))
+
+# Segundos que el navegador puede reutilizar la previsualización de un documento
+DOCUMENT_CACHE_MAX_AGE = int(os.getenv('DOCUMENT_CACHE_MAX_AGE', 3600))
+
+# Caché de tokens ?token= ya validados (processes/authentication.py)
+QUERY_TOKEN_CACHE_TTL = int(os.getenv('QUERY_TOKEN_CACHE_TTL', 60))
+QUERY_TOKEN_CACHE_SIZE = int(os.getenv('QUERY_TOKEN_CACHE_SIZE', 1024))
+
+# Extracción de texto de los documentos en procesos aparte (processes/extraction.py).
+# Con 0 trabajadores la extracción corre en el mismo proceso al confirmar la transacción.
+DOCUMENT_EXTRACTION_WORKERS = int(os.getenv('DOCUMENT_EXTRACTION_WORKERS', 2))
+DOCUMENT_EXTRACTION_MAX_CHARS = int(os.getenv('DOCUMENT_EXTRACTION_MAX_CHARS', 200000))
+
+# Archivos de documentos guardados una sola vez por su SHA-256 (processes/storage.py)
+DOCUMENT_DEDUP_STORAGE = os.getenv('DOCUMENT_DEDUP_STORAGE', 'True') == 'True'
+
+# Cargas por partes (processes/uploads.py): tamaño máximo del archivo y de cada parte,
+# y horas tras las que gc_document_blobs elimina las cargas abandonadas
+DOCUMENT_UPLOAD_MAX_SIZE = int(os.getenv('DOCUMENT_UPLOAD_MAX_SIZE', 2 * 1024 ** 3))
+DOCUMENT_UPLOAD_MAX_CHUNK = int(os.getenv('DOCUMENT_UPLOAD_MAX_CHUNK', 16 * 1024 ** 2))
+DOCUMENT_UPLOAD_EXPIRATION_HOURS = int(os.getenv('DOCUMENT_UPLOAD_EXPIRATION_HOURS', 24))
+
+# Segundos del catálogo de documentos por proceso en caché. Se invalida al guardar un
+# documento; con LocMemCache y varios procesos, este es el máximo que otro proceso lo ve desactualizado
+DOCUMENT_CATALOGUE_CACHE_TTL = int(os.getenv('DOCUMENT_CATALOGUE_CACHE_TTL', 300))
+
+# Miniaturas de documentos: lado mayor en píxeles y caché de las URL versionadas (?v=hash)
+DOCUMENT_THUMBNAIL_SIZE = int(os.getenv('DOCUMENT_THUMBNAIL_SIZE', 256))
+DOCUMENT_THUMBNAIL_MAX_AGE = int(os.getenv('DOCUMENT_THUMBNAIL_MAX_AGE', 60 * 60 * 24 * 365))
+
 WSGI_APPLICATION = 'backend.wsgi.application'
 AUTH_USER_MODEL = 'users.User'
 
@@ -212,6 +245,14 @@ SIMPLE_JWT = {
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Entrega de archivos por el proxy: Django autoriza y responde solo con un encabezado.
+#   ''           desactivado, Django envía los bytes
+#   'x-accel'    nginx (X-Accel-Redirect hacia FILE_OFFLOAD_ACCEL_PREFIX, location interna)
+#   'x-sendfile' Apache/lighttpd (X-Sendfile con la ruta absoluta)
+#   'local'      agrega X-Accel-Redirect pero Django envía los bytes (desarrollo y pruebas)
+FILE_OFFLOAD_MODE = os.getenv('FILE_OFFLOAD_MODE', '')
+FILE_OFFLOAD_ACCEL_PREFIX = os.getenv('FILE_OFFLOAD_ACCEL_PREFIX', '/protected-media/')
+
 # Para desarrollo, desactivar X-Frame-Options globalmente si es necesario
 if DEBUG:
     X_FRAME_OPTIONS = 'SAMEORIGIN'
@@ -0,0 +1,276 @@
+"""
+Suite de rendimiento de la API.
+
+Siembra un conjunto de datos representativo (empresas, sedes, procesos, indicadores con
+varios años de resultados, documentos y funcionarios), recorre todos los endpoints GET
+registrados en backend/urls.py y verifica para cada uno un presupuesto de consultas SQL
+y un tope de latencia. Opcionalmente escribe un reporte JSON para comparar entre versiones.
+
+No corre con el resto de las pruebas: se activa con BENCHMARK=1.
+
+    BENCHMARK=1 python manage.py test backend --tag benchmark
+
+Variables de entorno:
+    BENCHMARK              1 para ejecutar la suite
+    BENCHMARK_SCALE        multiplicador del tamaño del conjunto de datos (por defecto 1)
+    BENCHMARK_LATENCY_MS   tope de latencia por endpoint en milisegundos (por defecto 1000)
+    BENCHMARK_REPORT       ruta del reporte JSON; sin ella no se escribe reporte
+"""
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import time
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, get_resolver, reverse
+from rest_framework.test import APIClient
+from companies.models import Company, Department, Headquarters, Process, ProcessType
+from indicators.models import Indicator, Result, ResultRollup
+from main.models import ContenidoInformativo, Evento, FelicitacionCumpleanios, Funcionario, Reconocimiento
+from processes.models import CargaArchivo, Documento
+from users.models import App, Role, User
+
+SCALE = int(os.environ.get('BENCHMARK_SCALE', 1))
+LATENCY_CEILING_MS = float(os.environ.get('BENCHMARK_LATENCY_MS', 1000))
+REPORT_PATH = os.environ.get('BENCHMARK_REPORT')
+
+# Consultas permitidas por endpoint (nombre de la ruta); el resto usa DEFAULT_QUERY_BUDGET.
+# El presupuesto no debe depender de la cantidad de filas: un N+1 lo supera de inmediato.
+DEFAULT_QUERY_BUDGET = 6
+QUERY_BUDGETS = {
+    'result-detailed': 8,
+    'indicator-timeseries': 4,
+}
+
+# Parámetros de consulta que algunos endpoints necesitan para responder 200
+QUERY_PARAMS = {
+    'indicator-timeseries': lambda data: {'indicators': ','.join(str(pk) for pk in data['indicators'][:3])},
+    'documento-bundle': lambda data: {'proceso': data['processes'][0]},
+}
+
+# Rutas con parámetros distintos de pk o que no son parte de la API
+SKIPPED_PREFIXES = ('admin/',)
+
+
+def collect_get_endpoints(patterns=None, prefix=''):
+    """
+    Recorre las rutas del proyecto y retorna (nombre, ruta, clase de vista, es_detalle)
+    de cada vista de DRF que responde a GET.
+    """
+    patterns = get_resolver().url_patterns if patterns is None else patterns
+    endpoints = []
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if route.startswith(SKIPPED_PREFIXES):
+            continue
+        if isinstance(pattern, URLResolver):
+            endpoints.extend(collect_get_endpoints(pattern.url_patterns, route))
+            continue
+        if not isinstance(pattern, URLPattern) or not pattern.name or 'format' in pattern.pattern.regex.groupindex:
+            continue
+        view_class = getattr(pattern.callback, 'cls', None)
+        if view_class is None or pattern.name == 'api-root':
+            continue
+        actions = getattr(pattern.callback, 'actions', None)
+        handles_get = 'get' in actions if actions is not None else hasattr(view_class, 'get')
+        params = set(pattern.pattern.regex.groupindex)
+        if handles_get and params <= {'pk'}:
+            endpoints.append((pattern.name, route, view_class, 'pk' in params))
+    return endpoints
+
+
+def seed_dataset(scale=1):
+    """Crea el conjunto de datos de la suite y retorna los ids relevantes."""
+    today = datetime.date.today()
+    admin = User.objects.create_superuser('benchmark', 'benchmark@example.com', 'benchmark')
+    app = App.objects.create(name='indicadores')
+    Role.objects.bulk_create([Role(name=f'Rol {index}', app=app) for index in range(5)])
+    User.objects.bulk_create([
+        User(username=f'usuario{index}', email=f'usuario{index}@example.com') for index in range(20 * scale)
+    ])
+
+    companies = Company.objects.bulk_create([
+        Company(
+            name=f'Empresa {index}', nit=f'900{index}', legalRepresentative='Representante', phone='3000000',
+            address='Calle 1', contactEmail=f'empresa{index}@example.com', foundationDate=today,
+        )
+        for index in range(2)
+    ])
+    departments = Department.objects.bulk_create([
+        Department(name=f'Área {index}', departmentCode=f'A{index}', company=companies[index % 2], description='-')
+        for index in range(4)
+    ])
+    headquarters = Headquarters.objects.bulk_create([
+        Headquarters(habilitationCode=f'H{index}', name=f'Sede {index}', company=companies[index % 2], city='Pasto')
+        for index in range(10 * scale)
+    ])
+    process_types = ProcessType.objects.bulk_create([
+        ProcessType(name=f'Tipo {index}', description='-', company=companies[0], user=admin) for index in range(3)
+    ])
+    processes = Process.objects.bulk_create([
+        Process(
+            name=f'Proceso {index}', description='-', code=f'P{index}', version='1',
+            processType=process_types[index % 3], department=departments[index % 4], user=admin,
+        )
+        for index in range(6)
+    ])
+
+    frequencies = ['monthly', 'quarterly', 'semiannual', 'annual']
+    methods = ['percentage', 'rate_per_1000', 'rate_per_10000', 'average', 'ratio']
+    indicators = Indicator.objects.bulk_create([
+        Indicator(
+            name=f'Indicador {index}', description='-', code=f'I{index}', version='1',
+            calculationMethod=methods[index % len(methods)], measurementUnit='%',
+            numerator='-', numeratorResponsible='-', numeratorSource='-', numeratorDescription='-',
+            denominator='-', denominatorResponsible='-', denominatorSource='-', denominatorDescription='-',
+            trend='increasing' if index % 2 else 'decreasing', target=50, author='-',
+            process=processes[index % len(processes)], measurementFrequency=frequencies[index % len(frequencies)],
+            user=admin,
+        )
+        for index in range(8)
+    ])
+
+    periods = {
+        'monthly': [{'month': month} for month in range(1, 13)],
+        'quarterly': [{'quarter': quarter} for quarter in range(1, 5)],
+        'semiannual': [{'semester': semester} for semester in range(1, 3)],
+        'annual': [{}],
+    }
+    results = [
+        Result(
+            indicator=indicator, headquarters=sede, user=admin, year=year,
+            numerator=(index * 7) % 100, denominator=100, **period,
+        )
+        for index, (indicator, sede, year, period) in enumerate(
+            (indicator, sede, year, period)
+            for indicator in indicators
+            for sede in headquarters
+            for year in range(today.year - 3, today.year)
+            for period in periods[indicator.measurementFrequency]
+        )
+    ]
+    Result.calculate_batch(results)
+    Result.objects.bulk_create(results, batch_size=1000)
+    ResultRollup.rebuild()
+
+    documentos = []
+    for index in range(40 * scale):
+        documento = Documento(
+            codigo_documento=f'DOC-{index}', nombre_documento=f'Documento {index}',
+            proceso=processes[index % len(processes)], tipo_documento='PR', version=1,
+            archivo_oficial=f'documentos/oficiales/doc{index}.pdf', miniatura=f'documentos/miniaturas/doc{index}.jpg',
+        )
+        documento.save()
+        documentos.append(documento)
+
+    CargaArchivo.objects.create(usuario=admin, nombre_archivo='manual.pdf', tamano=1024 ** 2)
+
+    funcionarios = Funcionario.objects.bulk_create([
+        Funcionario(
+            documento=f'100{index}', nombres=f'Nombre {index}', apellidos='Apellido',
+            fecha_nacimiento=datetime.date(1980 + index % 20, index % 12 + 1, index % 28 + 1),
+            cargo='Profesional', sede=headquarters[index % len(headquarters)], telefono='3000000',
+            correo=f'funcionario{index}@example.com',
+        )
+        for index in range(50 * scale)
+    ])
+    FelicitacionCumpleanios.objects.bulk_create([
+        FelicitacionCumpleanios(funcionario=funcionario, mensaje='Feliz Cumpleaños') for funcionario in funcionarios
+    ])
+    Reconocimiento.objects.bulk_create([
+        Reconocimiento(funcionario=funcionario, titulo='Reconocimiento', descripcion='-', fecha=today)
+        for funcionario in funcionarios[:20]
+    ])
+    ContenidoInformativo.objects.bulk_create([
+        ContenidoInformativo(titulo=f'Noticia {index}', fecha=today, contenido='-', tipo='noticia')
+        for index in range(20)
+    ])
+    Evento.objects.bulk_create([
+        Evento(titulo=f'Evento {index}', fecha=today, hora=datetime.time(8, 0), detalles='-') for index in range(20)
+    ])
+    return {
+        'admin': admin.pk,
+        'indicators': [indicator.pk for indicator in indicators],
+        'documentos': [documento.pk for documento in documentos],
+        'processes': [process.pk for process in processes],
+    }
+
+
+@tag('benchmark')
+@skipUnless(os.environ.get('BENCHMARK') == '1', 'Suite de rendimiento: se activa con BENCHMARK=1')
+class EndpointBenchmarkTests(TestCase):
+    """Presupuesto de consultas y tope de latencia para cada endpoint GET de la API."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        os.makedirs(os.path.join(cls.media_root, 'documentos', 'oficiales'))
+        os.makedirs(os.path.join(cls.media_root, 'documentos', 'miniaturas'))
+        super().setUpClass()
+        cls.report = []
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+        if not REPORT_PATH:
+            return
+        with open(REPORT_PATH, 'w', encoding='utf-8') as report:
+            json.dump({
+                'scale': SCALE,
+                'vendor': connection.vendor,
+                'latency_ceiling_ms': LATENCY_CEILING_MS,
+                'endpoints': sorted(cls.report, key=lambda row: row['name']),
+            }, report, indent=2)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = seed_dataset(SCALE)
+        for name, miniatura in Documento.objects.values_list('archivo_oficial', 'miniatura'):
+            with open(os.path.join(cls.media_root, name), 'wb') as file:
+                file.write(b'%PDF-1.4\n' + b'0' * 4096)
+            with open(os.path.join(cls.media_root, miniatura), 'wb') as file:
+                file.write(b'\xff\xd8' + b'0' * 1024)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.get(pk=self.data['admin']))
+
+    def measure(self, url, params):
+        """Ejecuta la petición tres veces y retorna (respuesta, consultas, mejor latencia en ms)."""
+        timings = []
+        for _ in range(3):
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = self.client.get(url, params)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                timings.append((time.perf_counter() - start) * 1000)
+        return response, len(queries.captured_queries), min(timings)
+
+    def test_endpoints_within_budget(self):
+        endpoints = collect_get_endpoints()
+        self.assertTrue(endpoints)
+        for name, route, view_class, is_detail in endpoints:
+            with self.subTest(endpoint=name):
+                kwargs = {}
+                if is_detail:
+                    kwargs['pk'] = view_class.queryset.model.objects.order_by('pk').values_list('pk', flat=True).first()
+                url = reverse(name, kwargs=kwargs)
+                params = QUERY_PARAMS[name](self.data) if name in QUERY_PARAMS else {}
+                response, query_count, latency = self.measure(url, params)
+                budget = QUERY_BUDGETS.get(name, DEFAULT_QUERY_BUDGET)
+                self.report.append({
+                    'name': name, 'url': url, 'status': response.status_code,
+                    'queries': query_count, 'query_budget': budget, 'latency_ms': round(latency, 2),
+                })
+                self.assertEqual(response.status_code, 200, url)
+                self.assertLessEqual(query_count, budget, f'{url}: {query_count} consultas')
+                self.assertLessEqual(latency, LATENCY_CEILING_MS, f'{url}: {latency:.0f} ms')
@@ -14,14 +14,16 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework_simplejwt.views import (
     TokenObtainPairView,
     TokenRefreshView,
 )
 from django.conf import settings
 from django.conf.urls.static import static
+from processes.file_responses import media_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -38,5 +40,10 @@ urlpatterns = [
     path('api/indicators/', include('indicators.urls')),
 ]
 
-if settings.DEBUG:
+if settings.FILE_OFFLOAD_MODE:
+    # Django valida la ruta y el proxy entrega el archivo (ver FILE_OFFLOAD_MODE)
+    urlpatterns += [
+        re_path(rf'^{re.escape(settings.MEDIA_URL.lstrip("/"))}(?P<path>.*)$', media_view),
+    ]
+elif settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
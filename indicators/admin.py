@@ -2,6 +2,7 @@ from django.contrib import admin
 
 from .models.indicator import Indicator
 from .models.result import Result
+from .models.result_rollup import ResultRollup
 
 
 @admin.register(Indicator)
@@ -18,3 +19,9 @@ class ResultAdmin(admin.ModelAdmin):
     list_filter = ('creationDate', 'updateDate')
     ordering = ('creationDate',)
 
+
+@admin.register(ResultRollup)
+class ResultRollupAdmin(admin.ModelAdmin):
+    list_display = ('indicator', 'headquarters', 'year', 'month', 'quarter', 'semester', 'results_count', 'last_value', 'updateDate')
+    list_filter = ('year',)
+    readonly_fields = [field.name for field in ResultRollup._meta.fields]
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class IndicatorsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'indicators'
+
+    def ready(self):
+        """
+        Importa las señales que mantienen los agregados de resultados.
+        """
+        import indicators.signals
@@ -0,0 +1,62 @@
+"""
+Cumplimiento de metas de los indicadores.
+
+Un resultado cumple cuando su valor calculado alcanza la meta del indicador según su
+tendencia: mayor o igual para 'increasing', menor o igual para 'decreasing'.
+La clasificación se hace en SQL para cualquier cantidad de resultados, y los conteos de
+cumplimiento por período quedan guardados en ResultRollup (met_count), de modo que las
+tasas por proceso o por sede se leen de la tabla de agregados.
+"""
+from django.db.models import BooleanField, Case, F, Q, Sum, Value, When
+
+# Agrupaciones disponibles: campo de ResultRollup y campo con el nombre a mostrar
+GROUPS = {
+    'indicator': ('indicator', 'indicator__name'),
+    'process': ('indicator__process', 'indicator__process__name'),
+    'headquarters': ('headquarters', 'headquarters__name'),
+}
+
+
+def meets_target_q(prefix=''):
+    """
+    Condición de cumplimiento de un resultado. `prefix` permite usarla desde
+    modelos relacionados con Result (por ejemplo 'result__').
+    """
+    value = f'{prefix}calculatedValue'
+    trend = f'{prefix}indicator__trend'
+    target = F(f'{prefix}indicator__target')
+    return (
+        Q(**{trend: 'increasing', f'{value}__gte': target})
+        | Q(**{trend: 'decreasing', f'{value}__lte': target})
+    )
+
+
+def annotate_compliance(queryset):
+    """Agrega `meets_target` (booleano) a un queryset de resultados."""
+    return queryset.annotate(
+        meets_target=Case(When(meets_target_q(), then=Value(True)), default=Value(False), output_field=BooleanField())
+    )
+
+
+def compliance_rates(rollups, group_by='indicator'):
+    """
+    Tasas de cumplimiento agrupadas por indicador, proceso o sede, leídas de ResultRollup.
+    Retorna una lista de diccionarios con id, nombre, resultados, cumplidos y tasa (%).
+    """
+    id_field, name_field = GROUPS[group_by]
+    rows = (
+        rollups.order_by()
+        .values(id_field, name_field)
+        .annotate(results_count=Sum('results_count'), met_count=Sum('met_count'))
+        .order_by(id_field)
+    )
+    return [
+        {
+            'id': row[id_field],
+            'name': row[name_field],
+            'results_count': row['results_count'],
+            'met_count': row['met_count'],
+            'rate': (row['met_count'] * 100 / row['results_count']) if row['results_count'] else 0,
+        }
+        for row in rows
+    ]
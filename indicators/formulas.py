@@ -0,0 +1,61 @@
+"""
+Registro de fórmulas de cálculo de indicadores.
+
+Cada método de cálculo (Indicator.calculationMethod) se asocia a un objeto Formula que
+calcula el valor de un resultado o de una lista completa de resultados. Para agregar un
+método nuevo basta con registrarlo aquí; Result no necesita cambios.
+"""
+from django.db.models import Case, F, FloatField, Value, When
+
+
+class Formula:
+    """
+    Fórmula de la forma (numerador / denominador) * factor.
+    Un denominador igual a cero produce 0 para evitar la división por cero.
+    """
+
+    def __init__(self, factor=1):
+        self.factor = factor
+
+    def compute(self, numerator, denominator):
+        if denominator == 0:
+            return 0
+        return (numerator / denominator) * self.factor
+
+    def compute_many(self, numerators, denominators):
+        """Calcula los valores de dos secuencias paralelas de numeradores y denominadores."""
+        factor = self.factor
+        return [
+            (numerator / denominator) * factor if denominator != 0 else 0
+            for numerator, denominator in zip(numerators, denominators)
+        ]
+
+    def as_expression(self, numerator='numerator', denominator='denominator'):
+        """Expresión SQL equivalente, para recalcular resultados con un solo UPDATE."""
+        return Case(
+            When(**{denominator: 0}, then=Value(0.0)),
+            default=F(numerator) / F(denominator) * Value(float(self.factor)),
+            output_field=FloatField(),
+        )
+
+
+FORMULAS = {}
+DEFAULT_FORMULA = Formula()  # Cálculo básico por defecto
+
+
+def register(name, formula):
+    """Registra (o reemplaza) la fórmula de un método de cálculo."""
+    FORMULAS[name.lower()] = formula
+    return formula
+
+
+def get_formula(name):
+    """Retorna la fórmula del método indicado, o la fórmula por defecto si no existe."""
+    return FORMULAS.get((name or '').lower(), DEFAULT_FORMULA)
+
+
+register('percentage', Formula(100))
+register('rate_per_1000', Formula(1000))
+register('rate_per_10000', Formula(10000))
+register('average', Formula())
+register('ratio', Formula())
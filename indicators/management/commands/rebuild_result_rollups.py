@@ -0,0 +1,67 @@
+import math
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from indicators.models import Result, ResultRollup
+from indicators.models.result_rollup import BUCKET_FIELDS
+
+COMPARED_FIELDS = ('results_count', 'values_sum', 'min_value', 'max_value', 'last_value', 'last_result_id', 'met_count')
+
+
+def _same_value(stored, expected):
+    if stored is None or expected is None:
+        return stored is expected
+    return math.isclose(stored, expected, rel_tol=1e-9, abs_tol=1e-9)
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los agregados de resultados (ResultRollup) y los verifica contra la tabla Result.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--indicator', type=int, help='Limita la operación a un indicador.')
+        parser.add_argument('--check', action='store_true', help='Solo verifica los agregados, sin reconstruirlos.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        results = Result.objects.all()
+        rollups = ResultRollup.objects.all()
+        if options['indicator']:
+            results = results.filter(indicator_id=options['indicator'])
+            rollups = rollups.filter(indicator_id=options['indicator'])
+
+        if not options['check']:
+            with transaction.atomic():
+                created = ResultRollup.rebuild(results, batch_size=options['batch_size'])
+            self.stdout.write(f'Agregados reconstruidos: {created}')
+
+        mismatches = self.verify(results, rollups, options['batch_size'])
+        if mismatches:
+            for key, detail in mismatches[:20]:
+                self.stderr.write(f'{key}: {detail}')
+            raise CommandError(f'{len(mismatches)} agregados no coinciden con los resultados.')
+        self.stdout.write(self.style.SUCCESS('Los agregados coinciden con los resultados.'))
+
+    def verify(self, results, rollups, batch_size):
+        """
+        Compara los agregados guardados con los calculados desde la tabla Result.
+        Retorna una lista de (llave, detalle) con las diferencias encontradas.
+        """
+        stored = {
+            tuple(getattr(rollup, field) for field in BUCKET_FIELDS): rollup
+            for rollup in rollups.iterator(chunk_size=batch_size)
+        }
+        mismatches = []
+        for expected in ResultRollup.aggregate_from_results(results, batch_size=batch_size):
+            key = tuple(getattr(expected, field) for field in BUCKET_FIELDS)
+            rollup = stored.pop(key, None)
+            if rollup is None:
+                mismatches.append((key, 'agregado faltante'))
+                continue
+            diff = [
+                f'{field}={getattr(rollup, field)} (esperado {getattr(expected, field)})'
+                for field in COMPARED_FIELDS
+                if not _same_value(getattr(rollup, field), getattr(expected, field))
+            ]
+            if diff:
+                mismatches.append((key, ', '.join(diff)))
+        mismatches.extend((key, 'agregado sin resultados') for key in stored)
+        return mismatches
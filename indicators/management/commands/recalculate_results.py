@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from indicators.models import Result, ResultRollup
+
+
+class Command(BaseCommand):
+    help = 'Recalcula calculatedValue de los resultados con un UPDATE por método de cálculo.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--indicator', type=int, help='Limita el recálculo a un indicador.')
+        parser.add_argument('--year', type=int, help='Limita el recálculo a un año.')
+
+    def handle(self, *args, **options):
+        results = Result.objects.all()
+        if options['indicator']:
+            results = results.filter(indicator_id=options['indicator'])
+        if options['year']:
+            results = results.filter(year=options['year'])
+
+        with transaction.atomic():
+            updated = Result.recalculate(results)
+            ResultRollup.rebuild(results)
+        self.stdout.write(self.style.SUCCESS(f'Resultados recalculados: {updated}'))
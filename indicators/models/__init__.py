@@ -1,2 +1,3 @@
 from .indicator import Indicator
 from .result import Result
+from .result_rollup import ResultRollup
@@ -41,6 +41,7 @@ class Indicator(models.Model):
     user = models.ForeignKey(User, on_delete=models.PROTECT)
     creationDate = models.DateField(auto_now_add=True)
     updateDate = models.DateField(auto_now=True)
+    updateTimestamp = models.DateTimeField(auto_now=True, null=True, blank=True)  # Para la huella del GET condicional
 
     def __str__(self):
         return self.name
@@ -1,7 +1,10 @@
+from collections import defaultdict
 from django.db import models
+from django.utils import timezone
 from companies.models.headquarters import Headquarters
 from .indicator import Indicator
 from users.models import User
+from ..formulas import get_formula
 
 class Result(models.Model):
     headquarters = models.ForeignKey(Headquarters, on_delete=models.PROTECT)
@@ -14,6 +17,7 @@ class Result(models.Model):
 
     creationDate = models.DateField(auto_now_add=True)
     updateDate = models.DateField(auto_now=True)
+    updateTimestamp = models.DateTimeField(auto_now=True, null=True, blank=True)  # Para la huella del GET condicional
 
     year = models.PositiveIntegerField()
 
@@ -21,43 +25,68 @@ class Result(models.Model):
     quarter = models.PositiveIntegerField(null=True, blank=True)  # Solo para frecuencia trimestral
     semester = models.PositiveIntegerField(null=True, blank=True)  # Solo para frecuencia semestral
 
-    def calculate_indicator(self):
-        calculation_type = self.indicator.calculationMethod.lower()
-
-        if self.denominator == 0:
-            self.calculatedValue = 0  # Evitar la división por cero
-        else:
-            # Cálculo según el método definido en el indicador
-            if calculation_type == 'percentage':
-                self.calculatedValue = self._calculate_percentage()
-            elif calculation_type == 'rate_per_1000':
-                self.calculatedValue = self._calculate_rate_per_1000()
-            elif calculation_type == 'rate_per_10000':
-                self.calculatedValue = self._calculate_rate_per_10000()
-            elif calculation_type == 'average':
-                self.calculatedValue = self._calculate_average()
-            elif calculation_type == 'ratio':
-                self.calculatedValue = self._calculate_ratio()
-            else:
-                self.calculatedValue = self._default_calculation()  # Si no coincide con ninguno, usa cálculo por defecto
-
-        self.save()
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['indicator', 'headquarters', 'year', 'month', 'quarter', 'semester'],
+                name='result_period_idx',
+            ),
+            models.Index(fields=['year', 'id'], name='result_year_id_idx'),  # Paginación por llave
+        ]
 
-    # Cálculos específicos según el tipo
-    def _calculate_percentage(self):
-        return (self.numerator / self.denominator) * 100
+    def save(self, *args, **kwargs):
+        # El valor se calcula antes de escribir, así cada guardado es una sola escritura
+        self.calculatedValue = self.compute_value()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'calculatedValue', 'updateTimestamp'}
+        super().save(*args, **kwargs)
 
-    def _calculate_rate_per_1000(self):
-        return (self.numerator / self.denominator) * 1000
+    def calculate_indicator(self):
+        self.save()
 
-    def _calculate_rate_per_10000(self):
-        return (self.numerator / self.denominator) * 10000
+    def compute_value(self):
+        """
+        Retorna el valor calculado según el método del indicador, sin guardar.
+        """
+        return get_formula(self.indicator.calculationMethod).compute(self.numerator, self.denominator)
 
-    def _calculate_average(self):
-        return self.numerator / self.denominator
+    @classmethod
+    def calculate_batch(cls, results):
+        """
+        Asigna calculatedValue a una lista de resultados sin guardarlos, aplicando
+        cada fórmula a todos los resultados de su método de una sola vez.
+        Los resultados deben traer su indicador ya cargado para no consultar uno por uno.
+        """
+        by_method = defaultdict(list)
+        for result in results:
+            by_method[result.indicator.calculationMethod.lower()].append(result)
+        for method, group in by_method.items():
+            values = get_formula(method).compute_many(
+                [result.numerator for result in group],
+                [result.denominator for result in group],
+            )
+            for result, value in zip(group, values):
+                result.calculatedValue = value
+        return results
 
-    def _calculate_ratio(self):
-        return self.numerator / self.denominator
+    @classmethod
+    def recalculate(cls, queryset=None):
+        """
+        Recalcula calculatedValue en la base de datos con un UPDATE por método de cálculo,
+        sin cargar los resultados. Retorna el número de filas actualizadas.
+        """
+        queryset = cls.objects.all() if queryset is None else queryset
+        by_method = defaultdict(list)
+        for indicator_id, method in (
+            Indicator.objects.filter(id__in=queryset.order_by().values('indicator_id'))
+            .values_list('id', 'calculationMethod')
+        ):
+            by_method[method.lower()].append(indicator_id)
 
-    def _default_calculation(self):
-        return self.numerator / self.denominator  # Cálculo básico por defecto
+        updated = 0
+        for method, indicator_ids in by_method.items():
+            updated += queryset.filter(indicator_id__in=indicator_ids).update(
+                calculatedValue=get_formula(method).as_expression(), updateTimestamp=timezone.now()
+            )
+        return updated
@@ -0,0 +1,238 @@
+from collections import defaultdict
+from django.db import models
+from django.db.models import Count, Max, Min, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from companies.models.headquarters import Headquarters
+from .indicator import Indicator
+from .result import Result
+from ..compliance import meets_target_q
+
+# Campos que identifican un período dentro de un año (0 = no aplica)
+PERIOD_FIELDS = ('month', 'quarter', 'semester')
+BUCKET_FIELDS = ('indicator_id', 'headquarters_id', 'year') + PERIOD_FIELDS
+# Campos que se reescriben al recalcular un agregado existente
+UPSERT_FIELDS = (
+    'results_count', 'values_sum', 'min_value', 'max_value', 'last_value', 'last_result_id', 'met_count', 'updateDate',
+)
+
+
+def bucket_key(result):
+    """
+    Retorna la llave de agregación (indicador, sede, año, mes, trimestre, semestre)
+    de un resultado, usando 0 para los períodos que no aplican.
+    Lee los valores del __dict__ para no disparar consultas sobre campos diferidos.
+    """
+    values = result.__dict__
+    return (
+        values.get('indicator_id'),
+        values.get('headquarters_id'),
+        values.get('year'),
+    ) + tuple(values.get(field) or 0 for field in PERIOD_FIELDS)
+
+
+class ResultRollup(models.Model):
+    """
+    Agregado precalculado de resultados por indicador, sede, año y período.
+    Se mantiene en la misma transacción en que se crea, actualiza o elimina un Result
+    (o una carga masiva de resultados).
+    """
+    indicator = models.ForeignKey(Indicator, on_delete=models.CASCADE, related_name='rollups')
+    headquarters = models.ForeignKey(Headquarters, on_delete=models.CASCADE, related_name='result_rollups')
+    year = models.PositiveIntegerField()
+    month = models.PositiveIntegerField(default=0)
+    quarter = models.PositiveIntegerField(default=0)
+    semester = models.PositiveIntegerField(default=0)
+
+    results_count = models.PositiveIntegerField(default=0)
+    values_sum = models.FloatField(default=0)
+    min_value = models.FloatField(null=True, blank=True)
+    max_value = models.FloatField(null=True, blank=True)
+    last_value = models.FloatField(null=True, blank=True)
+    last_result_id = models.BigIntegerField(null=True, blank=True)
+    met_count = models.PositiveIntegerField(default=0)  # Resultados que cumplen la meta del indicador
+
+    updateDate = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('indicator', 'headquarters', 'year', 'month', 'quarter', 'semester')
+        indexes = [
+            models.Index(fields=['indicator', 'year']),
+            models.Index(fields=['headquarters', 'year']),
+        ]
+
+    def __str__(self):
+        return f"{self.indicator_id} - {self.headquarters_id} - {self.year}"
+
+    @property
+    def avg_value(self):
+        return (self.values_sum / self.results_count) if self.results_count else 0
+
+    @property
+    def compliance_rate(self):
+        return (self.met_count * 100 / self.results_count) if self.results_count else 0
+
+    @staticmethod
+    def _keys_filter(keys):
+        """Condición que cubre los resultados de las llaves: una por indicador y año, con sus sedes."""
+        groups = defaultdict(set)
+        for indicator_id, headquarters_id, year, *_ in keys:
+            groups[(indicator_id, year)].add(headquarters_id)
+        condition = Q()
+        for (indicator_id, year), headquarters_ids in groups.items():
+            condition |= Q(indicator_id=indicator_id, year=year, headquarters_id__in=headquarters_ids)
+        return condition
+
+    @staticmethod
+    def _aggregates():
+        return {
+            'results_count': Count('id'),
+            'values_sum': Coalesce(Sum('calculatedValue'), Value(0.0)),
+            'min_value': Min('calculatedValue'),
+            'max_value': Max('calculatedValue'),
+            'last_result_id': Max('id'),
+            'met_count': Count('id', filter=meets_target_q()),
+        }
+
+    @classmethod
+    def aggregate_from_results(cls, queryset=None, batch_size=1000):
+        """
+        Genera (sin guardar) los agregados calculados directamente desde la tabla Result,
+        con una consulta agrupada y una búsqueda por lote para el último valor.
+        """
+        queryset = Result.objects.all() if queryset is None else queryset
+        rows = (
+            queryset.order_by()
+            .values('indicator_id', 'headquarters_id', 'year')
+            .annotate(
+                m=Coalesce('month', Value(0)),
+                q=Coalesce('quarter', Value(0)),
+                s=Coalesce('semester', Value(0)),
+            )
+            .values('indicator_id', 'headquarters_id', 'year', 'm', 'q', 's')
+            .annotate(**cls._aggregates())
+            .iterator(chunk_size=batch_size)
+        )
+
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield from cls._build_batch(batch)
+                batch = []
+        if batch:
+            yield from cls._build_batch(batch)
+
+    @classmethod
+    def _build_batch(cls, rows):
+        last_values = dict(
+            Result.objects.filter(id__in=[row['last_result_id'] for row in rows])
+            .values_list('id', 'calculatedValue')
+        )
+        for row in rows:
+            yield cls(
+                indicator_id=row['indicator_id'],
+                headquarters_id=row['headquarters_id'],
+                year=row['year'],
+                month=row['m'],
+                quarter=row['q'],
+                semester=row['s'],
+                results_count=row['results_count'],
+                values_sum=row['values_sum'],
+                min_value=row['min_value'],
+                max_value=row['max_value'],
+                last_value=last_values.get(row['last_result_id']),
+                last_result_id=row['last_result_id'],
+                met_count=row['met_count'],
+            )
+
+    @classmethod
+    def summary(cls, queryset=None):
+        """
+        Retorna las estadísticas globales y el resumen por indicador leyendo los
+        agregados, con el mismo formato que el endpoint detailed de resultados.
+        """
+        queryset = (cls.objects.all() if queryset is None else queryset).order_by()
+        statistics = queryset.aggregate(
+            total_results=Coalesce(Sum('results_count'), Value(0)),
+            total_indicators=Count('indicator', distinct=True),
+            total_headquarters=Count('headquarters', distinct=True),
+        )
+        indicators_summary = []
+        for row in (
+            queryset.values('indicator', 'indicator__name', 'indicator__code')
+            .annotate(results_count=Sum('results_count'), values_sum=Sum('values_sum'))
+            .order_by('indicator')
+        ):
+            indicators_summary.append({
+                'id': row['indicator'],
+                'name': row['indicator__name'],
+                'code': row['indicator__code'],
+                'results_count': row['results_count'],
+                'avg_value': (row['values_sum'] / row['results_count']) if row['results_count'] else 0,
+            })
+        return statistics, indicators_summary
+
+    @classmethod
+    def refresh_buckets(cls, keys, batch_size=1000):
+        """
+        Recalcula un conjunto de llaves en una sola pasada: una consulta agrupada sobre los
+        resultados de los indicadores, años y sedes afectados, un upsert por lote de los
+        agregados y un DELETE de los períodos que quedaron sin resultados.
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        found = set()
+        batch = []
+        for rollup in cls.aggregate_from_results(Result.objects.filter(cls._keys_filter(keys)), batch_size=batch_size):
+            key = bucket_key(rollup)
+            if key not in keys:
+                continue  # Otro período de los mismos indicador, sede y año
+            found.add(key)
+            batch.append(rollup)
+            if len(batch) >= batch_size:
+                cls._upsert(batch)
+                batch = []
+        if batch:
+            cls._upsert(batch)
+
+        empty = keys - found
+        if empty:
+            stale = [
+                row[0] for row in cls.objects.filter(cls._keys_filter(empty)).values_list('id', *BUCKET_FIELDS)
+                if tuple(row[1:]) in empty
+            ]
+            cls.objects.filter(id__in=stale).delete()
+
+    @classmethod
+    def _upsert(cls, rollups):
+        cls.objects.bulk_create(
+            rollups, update_conflicts=True,
+            unique_fields=['indicator', 'headquarters', 'year', 'month', 'quarter', 'semester'],
+            update_fields=UPSERT_FIELDS,
+        )
+
+    @classmethod
+    def rebuild(cls, queryset=None, batch_size=1000):
+        """
+        Reconstruye desde cero los agregados del queryset de resultados indicado
+        (o de toda la tabla). Debe ejecutarse dentro de una transacción.
+        """
+        queryset = Result.objects.all() if queryset is None else queryset
+        if queryset.query.where:
+            indicator_ids = queryset.order_by().values('indicator_id').distinct()
+            cls.objects.filter(indicator_id__in=indicator_ids).delete()
+            queryset = Result.objects.filter(indicator_id__in=indicator_ids)
+        else:
+            cls.objects.all().delete()
+
+        created = 0
+        batch = []
+        for rollup in cls.aggregate_from_results(queryset, batch_size=batch_size):
+            batch.append(rollup)
+            if len(batch) >= batch_size:
+                created += len(cls.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            created += len(cls.objects.bulk_create(batch))
+        return created
@@ -0,0 +1,5 @@
+from backend.pagination import KeysetPagination
+
+
+class ResultPagination(KeysetPagination):
+    ordering = ('year', 'id')
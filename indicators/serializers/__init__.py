@@ -1,2 +1,2 @@
-from .result_serializer import ResultSerializer
+from .result_serializer import ResultSerializer, ResultBulkItemSerializer
 from .indicator_serializer import IndicatorSerializer
\ No newline at end of file
@@ -24,4 +24,19 @@ class ResultSerializer(serializers.ModelSerializer):
             'quarter',
             'semester',
         ]
-        read_only_fields = ['id', 'calculatedValue', 'creationDate', 'updateDate']
\ No newline at end of file
+        read_only_fields = ['id', 'calculatedValue', 'creationDate', 'updateDate']
+
+class ResultBulkItemSerializer(serializers.Serializer):
+    """
+    Valida una fila de la carga masiva de resultados.
+    Las llaves foráneas se reciben como ids y se verifican en la vista con una sola consulta por modelo.
+    """
+    indicator = serializers.IntegerField()
+    headquarters = serializers.IntegerField()
+    user = serializers.IntegerField(required=False)
+    numerator = serializers.FloatField()
+    denominator = serializers.FloatField()
+    year = serializers.IntegerField(min_value=0)
+    month = serializers.IntegerField(min_value=1, max_value=12, required=False, allow_null=True)
+    quarter = serializers.IntegerField(min_value=1, max_value=4, required=False, allow_null=True)
+    semester = serializers.IntegerField(min_value=1, max_value=2, required=False, allow_null=True)
@@ -0,0 +1,86 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .models import Indicator, Result, ResultRollup
+from .models.result_rollup import BUCKET_FIELDS, bucket_key
+
+# Campos de Result (con y sin _id) que forman la llave de agregación
+CAMPOS_LLAVE = set(BUCKET_FIELDS) | {field.removesuffix('_id') for field in BUCKET_FIELDS}
+# Campos del indicador de los que dependen los valores calculados de sus resultados y el
+# cumplimiento de la meta guardado en los agregados (met_count)
+CAMPOS_CALCULO = ('calculationMethod', 'target', 'trend')
+
+
+@receiver(pre_save, sender=Result)
+def recordar_llave_rollup(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Lee la llave de agregación guardada antes de actualizar un resultado, para poder
+    actualizar también el período anterior si el resultado cambia de período. Solo
+    consulta en actualizaciones que pueden cambiar la llave; las lecturas no pagan nada.
+    """
+    instance._rollup_key = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & CAMPOS_LLAVE:
+        return
+    row = Result.objects.filter(pk=instance.pk).values_list(*BUCKET_FIELDS).first()
+    if row:
+        instance._rollup_key = tuple(row[:3]) + tuple(value or 0 for value in row[3:])
+
+
+@receiver(post_save, sender=Result)
+def actualizar_rollup_al_guardar(sender, instance, raw=False, **kwargs):
+    """
+    Mantiene ResultRollup en la misma transacción del guardado del resultado.
+    """
+    if raw:
+        return
+    keys = [bucket_key(instance)]
+    anterior = getattr(instance, '_rollup_key', None)
+    if anterior and anterior != keys[0]:
+        keys.append(anterior)
+    ResultRollup.refresh_buckets(keys)
+    instance._rollup_key = None
+
+
+@receiver(post_delete, sender=Result)
+def actualizar_rollup_al_eliminar(sender, instance, **kwargs):
+    """
+    Recalcula el período del resultado eliminado.
+    """
+    ResultRollup.refresh_buckets([bucket_key(instance)])
+
+
+@receiver(pre_save, sender=Indicator)
+def recordar_calculo_indicador(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Lee los campos de cálculo guardados antes de actualizar un indicador, para recalcular
+    sus resultados y agregados solo si cambian. Es una consulta y solo en actualizaciones
+    que pueden tocar esos campos, sea desde la API, el admin o el ORM.
+    """
+    instance._calculo_anterior = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(CAMPOS_CALCULO):
+        return
+    instance._calculo_anterior = Indicator.objects.filter(pk=instance.pk).values_list(*CAMPOS_CALCULO).first()
+
+
+@receiver(post_save, sender=Indicator)
+def recalcular_resultados_del_indicador(sender, instance, created, raw=False, **kwargs):
+    """
+    Si cambió el método de cálculo, recalcula en la base de datos los valores de los
+    resultados del indicador. Si cambió el método, la meta o la tendencia, reconstruye
+    sus agregados (valores y cumplimiento). Todo en la transacción del guardado.
+    """
+    anterior = getattr(instance, '_calculo_anterior', None)
+    if raw or created or anterior is None:
+        return
+    instance._calculo_anterior = None
+    if anterior == tuple(getattr(instance, campo) for campo in CAMPOS_CALCULO):
+        return
+    results = Result.objects.filter(indicator=instance)
+    with transaction.atomic():
+        if anterior[0] != instance.calculationMethod:
+            Result.recalculate(results)
+        ResultRollup.rebuild(results)
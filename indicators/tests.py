@@ -1,3 +1,334 @@
+import csv
+import json
+from django.db import connection
+from django.http import StreamingHttpResponse
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from companies.models import Company, Department, Headquarters, Process, ProcessType
+from users.models import User
+from .formulas import DEFAULT_FORMULA, FORMULAS, Formula, get_formula, register
+from .models import Indicator, Result, ResultRollup
+from .views.result_view import ResultViewSet
 
-# Create your tests here.
+
+class IndicatorTestCase(TestCase):
+    """Indicador de porcentaje con meta creciente de 50 y dos sedes."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('analista', 'analista@example.com', 'clave')
+        company = Company.objects.create(
+            name='Empresa', nit='900', legalRepresentative='-', phone='-', address='-',
+            contactEmail='empresa@example.com', foundationDate='2020-01-01',
+        )
+        department = Department.objects.create(name='Área', departmentCode='A', company=company, description='-')
+        process_type = ProcessType.objects.create(name='Misional', description='-', company=company, user=cls.user)
+        process = Process.objects.create(
+            name='Proceso', description='-', code='P', version='1', processType=process_type,
+            department=department, user=cls.user,
+        )
+        cls.headquarters = [
+            Headquarters.objects.create(habilitationCode=f'H{index}', name=f'Sede {index}', company=company, city='Pasto')
+            for index in range(2)
+        ]
+        cls.indicator = Indicator.objects.create(
+            name='Indicador', description='-', code='I1', version='1', calculationMethod='percentage',
+            measurementUnit='%', numerator='-', numeratorResponsible='-', numeratorSource='-',
+            numeratorDescription='-', denominator='-', denominatorResponsible='-', denominatorSource='-',
+            denominatorDescription='-', trend='increasing', target=50, author='-', process=process,
+            measurementFrequency='monthly', user=cls.user,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def crear_resultado(self, numerator, month=1, headquarters=0, denominator=100):
+        return Result.objects.create(
+            indicator=self.indicator, headquarters=self.headquarters[headquarters], user=self.user,
+            numerator=numerator, denominator=denominator, year=2025, month=month,
+        )
+
+
+class DetailedResultsTests(IndicatorTestCase):
+
+    def test_unpaginated_unless_requested(self):
+        for month in (1, 2, 3):
+            self.crear_resultado(40 + month, month=month)
+        response = self.client.get('/api/indicators/results/detailed/')
+        self.assertEqual(len(response.data['results']), 3)
+        self.assertNotIn('next', response.data)
+
+        response = self.client.get('/api/indicators/results/detailed/', {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['statistics']['total_results'], 3)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+        self.assertIsNone(response.data['next'])
+        self.assertIsNotNone(response.data['previous'])
+
+    def test_filtered_statistics_match_the_rollups(self):
+        for month in (1, 2):
+            self.crear_resultado(40 + month, month=month)
+        self.crear_resultado(70, headquarters=1)
+        todos = self.client.get('/api/indicators/results/detailed/').data
+        filtrados = self.client.get('/api/indicators/results/detailed/', {'year': 2025}).data
+        self.assertEqual(filtrados['statistics'], todos['statistics'])
+        self.assertEqual(filtrados['indicators_summary'], todos['indicators_summary'])
+        self.assertEqual(todos['statistics']['total_headquarters'], 2)
+
+        response = self.client.get('/api/indicators/results/detailed/', {'headquarters': self.headquarters[1].pk})
+        self.assertEqual(response.data['statistics']['total_results'], 1)
+        self.assertEqual(response.data['indicators_summary'][0]['avg_value'], 70)
+        self.assertEqual(self.client.get('/api/indicators/results/detailed/', {'year': 'x'}).status_code, 400)
+
+
+class ResultListTests(IndicatorTestCase):
+
+    def test_keyset_pagination_is_opt_in(self):
+        for month in (1, 2, 3):
+            self.crear_resultado(40 + month, month=month)
+        response = self.client.get('/api/indicators/results/')
+        self.assertEqual(len(response.data), 3)
+
+        response = self.client.get('/api/indicators/results/', {'page_size': 2})
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual((len(response.data['results']), response.data['next']), (1, None))
+
+    def test_malformed_cursor_is_rejected(self):
+        self.crear_resultado(40)
+        for cursor in ('basura', 'eyJ2IjogWyJ4IiwgInkiXX0='):  # El segundo: {"v": ["x", "y"]}
+            response = self.client.get('/api/indicators/results/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 400, cursor)
+            self.assertIn('cursor', response.data)
+
+
+class ExportTests(IndicatorTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.resultados = [self.crear_resultado(40), self.crear_resultado(60, month=2, headquarters=1)]
+
+    def exportar(self, **params):
+        response = self.client.get('/api/indicators/results/export/', params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, content = self.exportar()
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('resultados.csv', response['Content-Disposition'])
+        rows = list(csv.reader(content.splitlines()))
+        self.assertEqual(rows[0], list(ResultViewSet.export_fields))
+        self.assertEqual(len(rows), 3)
+        row = dict(zip(rows[0], rows[1]))
+        self.assertEqual(
+            (row['id'], row['indicator__code'], row['headquarters__name'], row['month'], row['calculatedValue']),
+            (str(self.resultados[0].pk), 'I1', 'Sede 0', '1', '40.0'),
+        )
+
+    def test_ndjson(self):
+        response, content = self.exportar(export_format='ndjson')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual([row['id'] for row in rows], [result.pk for result in self.resultados])
+        self.assertEqual((rows[1]['headquarters__name'], rows[1]['calculatedValue']), ('Sede 1', 60.0))
+        self.assertEqual(set(rows[0]), set(ResultViewSet.export_fields))
+
+    def test_filters_and_format(self):
+        _, content = self.exportar(export_format='ndjson', headquarters=self.headquarters[1].pk)
+        self.assertEqual([json.loads(line)['id'] for line in content.splitlines()], [self.resultados[1].pk])
+        _, content = self.exportar(month=3)
+        self.assertEqual(len(content.splitlines()), 1)  # Solo el encabezado
+        self.assertEqual(self.client.get('/api/indicators/results/export/', {'export_format': 'xml'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/indicators/results/export/', {'year': 'x'}).status_code, 400)
+
+
+class TimeseriesTests(IndicatorTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.trimestral = Indicator.objects.get(pk=self.indicator.pk)
+        self.trimestral.pk = None
+        self.trimestral.code, self.trimestral.measurementFrequency = 'I2', 'quarterly'
+        self.trimestral.save()
+        for headquarters, numerator in enumerate((20, 40)):
+            self.crear_resultado(numerator, headquarters=headquarters)
+            Result.objects.create(
+                indicator=self.trimestral, headquarters=self.headquarters[headquarters], user=self.user,
+                numerator=numerator + 10, denominator=100, year=2025, quarter=2,
+            )
+        self.crear_resultado(50, month=2)
+
+    def get(self, **params):
+        return self.client.get('/api/indicators/indicators/timeseries/', {
+            'indicators': f'{self.indicator.pk},{self.trimestral.pk}', **params,
+        })
+
+    def test_points_follow_each_frequency(self):
+        with self.assertNumQueries(3):  # Los indicadores y una consulta por periodicidad
+            response = self.get()
+        self.assertEqual(response.status_code, 200)
+        mensual, trimestral = response.data
+        self.assertEqual((mensual['frequency'], trimestral['frequency']), ('monthly', 'quarterly'))
+        self.assertEqual(mensual['series'], [{'headquarters': None, 'points': [[2025, 1, 30.0, 2], [2025, 2, 50.0, 1]]}])
+        self.assertEqual(trimestral['series'], [{'headquarters': None, 'points': [[2025, 2, 40.0, 2]]}])
+
+    def test_by_headquarters(self):
+        mensual, trimestral = self.get(by_headquarters='true').data
+        self.assertEqual(mensual['series'], [
+            {'headquarters': self.headquarters[0].pk, 'points': [[2025, 1, 20.0, 1], [2025, 2, 50.0, 1]]},
+            {'headquarters': self.headquarters[1].pk, 'points': [[2025, 1, 40.0, 1]]},
+        ])
+        self.assertEqual([serie['points'] for serie in trimestral['series']], [[[2025, 2, 30.0, 1]], [[2025, 2, 50.0, 1]]])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get('/api/indicators/indicators/timeseries/', {'indicators': 'a,b'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/indicators/indicators/timeseries/').status_code, 400)
+        self.assertEqual(self.get(year_from='x').status_code, 400)
+        self.assertEqual(self.get(year_from=2026).data[0]['series'], [])
+
+
+class FormulaTests(IndicatorTestCase):
+
+    valores = ((37, 100), (3, 7), (5, 0), (0, 0), (12.5, 4))
+
+    def test_registry(self):
+        self.assertEqual(set(FORMULAS), {method for method, _ in Indicator.CALCULATION_CHOICES})
+        self.assertIs(get_formula('Percentage'), FORMULAS['percentage'])
+        self.assertIs(get_formula('desconocido'), DEFAULT_FORMULA)
+        self.addCleanup(FORMULAS.pop, 'por_mil_doble')
+        formula = register('por_mil_doble', Formula(2000))
+        self.assertIs(get_formula('POR_MIL_DOBLE'), formula)
+
+    def test_compute_many_matches_compute(self):
+        numerators, denominators = zip(*self.valores)
+        for method, formula in FORMULAS.items():
+            with self.subTest(method=method):
+                self.assertEqual(
+                    formula.compute_many(numerators, denominators),
+                    [formula.compute(numerator, denominator) for numerator, denominator in self.valores],
+                )
+        self.assertEqual(FORMULAS['rate_per_1000'].compute(3, 4), 750)
+        self.assertEqual(FORMULAS['percentage'].compute(3, 0), 0)
+
+    def test_recalculate_matches_compute_value(self):
+        results = [
+            self.crear_resultado(numerator, month=month, denominator=denominator)
+            for month, (numerator, denominator) in enumerate(self.valores, start=1)
+        ]
+        for method in FORMULAS:
+            with self.subTest(method=method):
+                Indicator.objects.filter(pk=self.indicator.pk).update(calculationMethod=method)
+                Result.objects.update(calculatedValue=-1)
+                self.assertEqual(Result.recalculate(), len(results))
+                for result in Result.objects.select_related('indicator').order_by('month'):
+                    self.assertAlmostEqual(result.calculatedValue, result.compute_value())
+
+
+class ResultRollupTests(IndicatorTestCase):
+
+    def rollups(self):
+        return sorted(ResultRollup.objects.values_list(
+            'headquarters_id', 'year', 'month', 'results_count', 'values_sum', 'last_value', 'met_count',
+        ))
+
+    def cargar(self, year, months):
+        rows = [
+            {'indicator': self.indicator.pk, 'headquarters': sede.pk, 'year': year, 'month': month,
+             'numerator': 30 + month, 'denominator': 100}
+            for sede in self.headquarters for month in months
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/indicators/results/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return len(queries)
+
+    def test_bulk_refresh_does_not_grow_with_buckets(self):
+        self.assertEqual(self.cargar(2024, [1, 2]), self.cargar(2025, range(1, 13)))
+        refreshed = self.rollups()
+        self.assertEqual(len(refreshed), 28)
+        ResultRollup.rebuild()
+        self.assertEqual(self.rollups(), refreshed)
+
+    def test_mixed_rows_create_only_the_valid_ones(self):
+        fila = {'indicator': self.indicator.pk, 'headquarters': self.headquarters[0].pk, 'year': 2025, 'numerator': 30}
+        rows = [
+            {**fila, 'month': 1, 'denominator': 100},
+            {**fila, 'month': 2, 'denominator': 100, 'indicator': 0},
+            {**fila, 'month': 3, 'denominator': 100, 'year': 'dos mil'},
+            {**fila, 'month': 4, 'denominator': 0},  # Válida: como en create, el valor calculado es 0
+        ]
+        response = self.client.post('/api/indicators/results/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        self.assertIn('indicator', response.data['errors'][0]['errors'])
+        self.assertIn('year', response.data['errors'][1]['errors'])
+        self.assertEqual(
+            list(Result.objects.filter(pk__in=response.data['ids']).order_by('month').values_list('month', 'calculatedValue')),
+            [(1, 30.0), (4, 0.0)],
+        )
+        self.assertEqual([row[2:5] for row in self.rollups()], [(1, 1, 30.0), (4, 1, 0.0)])
+
+        response = self.client.post('/api/indicators/results/bulk/', rows[1:3], format='json')
+        self.assertEqual((response.status_code, response.data['created']), (400, 0))
+
+    def test_empty_buckets_are_removed(self):
+        result = self.crear_resultado(60)
+        otro = self.crear_resultado(20, month=2)
+        result.month = 3
+        result.save()
+        self.assertEqual([row[2] for row in self.rollups()], [2, 3])
+        otro = Result.objects.get(pk=otro.pk)
+        self.assertNotIn('_rollup_key', otro.__dict__)  # Leer un resultado no calcula su llave
+        otro.delete()
+        self.assertEqual([row[2:] for row in self.rollups()], [(3, 1, 60.0, 60.0, 1)])
+
+
+class ConditionalResultsTests(IndicatorTestCase):
+
+    def test_same_day_edit_changes_fingerprint(self):
+        result = self.crear_resultado(40)
+        results = Result.objects.filter(indicator=self.indicator)
+        etag = ResultViewSet().get_fingerprint(results)
+        result.numerator = 45
+        result.save(update_fields=['numerator'])
+        self.assertNotEqual(ResultViewSet().get_fingerprint(results), etag)
+
+        response = self.client.get('/api/indicators/results/detailed/')
+        self.assertNotIn('Last-Modified', response)
+        self.assertEqual(
+            self.client.get('/api/indicators/results/detailed/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304
+        )
+        self.client.patch(f'/api/indicators/results/{result.pk}/', {'numerator': 50}, format='json')
+        self.assertEqual(
+            self.client.get('/api/indicators/results/detailed/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200
+        )
+
+
+class IndicatorChangeTests(IndicatorTestCase):
+
+    def test_method_change_outside_the_api_recalculates(self):
+        result = self.crear_resultado(40)
+        indicator = Indicator.objects.get(pk=self.indicator.pk)
+        indicator.calculationMethod = 'rate_per_1000'
+        indicator.save()
+        result.refresh_from_db()
+        self.assertEqual(result.calculatedValue, 400)
+        self.assertEqual(ResultRollup.objects.get().last_value, 400)
+
+    def test_target_change_outside_the_api_refreshes_compliance(self):
+        self.crear_resultado(40)
+        self.crear_resultado(60, month=2)
+        self.assertEqual(sum(ResultRollup.objects.values_list('met_count', flat=True)), 1)
+        indicator = Indicator.objects.get(pk=self.indicator.pk)
+        indicator.target = 30
+        indicator.save()
+        self.assertEqual(sum(ResultRollup.objects.values_list('met_count', flat=True)), 2)
+        indicator.trend = 'decreasing'
+        indicator.save(update_fields=['trend'])
+        response = self.client.get('/api/indicators/indicators/compliance/')
+        self.assertEqual((response.data[0]['met_count'], response.data[0]['rate']), (0, 0))
@@ -4,14 +4,23 @@ from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
 
 from rest_framework import viewsets
-from ..models import Indicator
+from django.db import transaction
+from django.db.models import Avg, Count, Value
+from django.db.models.functions import Coalesce
+from ..compliance import GROUPS, compliance_rates
+from ..models import Indicator, Result, ResultRollup
 from ..serializers.indicator_serializer import IndicatorSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from backend.conditional import ConditionalGetMixin
 
-class IndicatorViewSet(viewsets.ModelViewSet):
+class IndicatorViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     #permission_classes = [IsAuthenticated]
     queryset = Indicator.objects.all()
     serializer_class = IndicatorSerializer
+    conditional_fields = ('updateTimestamp',)
+
+    # Campo de Result que identifica el período según la periodicidad del indicador
+    PERIOD_FIELDS = {'monthly': 'month', 'quarterly': 'quarter', 'semiannual': 'semester', 'annual': None}
     
     #asignar el usuario que crea el indicador
     def perform_create(self, serializer):
@@ -20,8 +29,9 @@ class IndicatorViewSet(viewsets.ModelViewSet):
     # Método para listar todas las compañías (GET)
     def list(self, request, *args, **kwargs):
         queryset = self.get_queryset()
-        serializer = self.get_serializer(queryset, many=True)
-        return Response(serializer.data)
+        return self.conditional_get(
+            request, queryset, lambda: Response(self.get_serializer(queryset, many=True).data)
+        )
 
     # Método para obtener una compañía específica (GET)
     def retrieve(self, request, *args, **kwargs):
@@ -38,11 +48,13 @@ class IndicatorViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     # Método para actualizar una compañía existente (PUT/PATCH)
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
+        # Un cambio del método, la meta o la tendencia recalcula los resultados y agregados al guardar (indicators/signals.py)
         self.perform_update(serializer)
         return Response(serializer.data)
 
@@ -50,4 +62,99 @@ class IndicatorViewSet(viewsets.ModelViewSet):
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['get'])
+    def timeseries(self, request):
+        """
+        Series de tiempo de uno o varios indicadores (?indicators=1,2), agrupadas en la base
+        de datos según la periodicidad de cada indicador. Con ?by_headquarters=true se separa
+        una serie por sede; ?year_from y ?year_to limitan el rango de años.
+        Cada punto es [año, período, promedio, cantidad de resultados].
+        """
+        try:
+            indicator_ids = [int(value) for value in request.query_params.get('indicators', '').split(',') if value]
+            year_from = request.query_params.get('year_from')
+            year_to = request.query_params.get('year_to')
+            year_from = int(year_from) if year_from else None
+            year_to = int(year_to) if year_to else None
+        except ValueError:
+            return Response({'error': 'Parámetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        if not indicator_ids:
+            return Response({'error': 'Debe indicar al menos un indicador'}, status=status.HTTP_400_BAD_REQUEST)
+        by_headquarters = request.query_params.get('by_headquarters', '').lower() in ('1', 'true')
+
+        indicators = list(
+            self.get_queryset().filter(id__in=indicator_ids)
+            .values('id', 'code', 'name', 'measurementFrequency')
+            .order_by('id')
+        )
+        results = Result.objects.order_by()
+        if year_from is not None:
+            results = results.filter(year__gte=year_from)
+        if year_to is not None:
+            results = results.filter(year__lte=year_to)
+
+        # Una consulta agrupada por periodicidad
+        by_frequency = {}
+        for indicator in indicators:
+            by_frequency.setdefault(indicator['measurementFrequency'], []).append(indicator['id'])
+        series = {}
+        for frequency, ids in by_frequency.items():
+            period_field = self.PERIOD_FIELDS.get(frequency)
+            group_fields = ['indicator_id'] + (['headquarters_id'] if by_headquarters else []) + ['year']
+            if period_field:
+                group_fields.append(period_field)
+            rows = (
+                results.filter(indicator_id__in=ids)
+                .values(*group_fields)
+                .annotate(value=Avg(Coalesce('calculatedValue', Value(0.0))), count=Count('id'))
+                .order_by(*group_fields)
+            )
+            for row in rows:
+                key = (row['indicator_id'], row.get('headquarters_id'))
+                series.setdefault(key, []).append(
+                    [row['year'], row.get(period_field) if period_field else None, row['value'], row['count']]
+                )
+
+        data = []
+        for indicator in indicators:
+            indicator_series = [
+                {'headquarters': headquarters_id, 'points': points}
+                for (indicator_id, headquarters_id), points in series.items()
+                if indicator_id == indicator['id']
+            ]
+            data.append({
+                'id': indicator['id'],
+                'code': indicator['code'],
+                'name': indicator['name'],
+                'frequency': indicator['measurementFrequency'],
+                'series': indicator_series,
+            })
+        return Response(data, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'])
+    def compliance(self, request):
+        """
+        Tasas de cumplimiento de metas leídas de los agregados por período.
+        ?group_by=indicator|process|headquarters (por defecto indicator); filtros opcionales
+        ?year, ?month, ?quarter, ?semester, ?indicators=1,2 y ?headquarters=1,2.
+        """
+        group_by = request.query_params.get('group_by', 'indicator')
+        if group_by not in GROUPS:
+            return Response(
+                {'error': f'group_by debe ser uno de: {", ".join(GROUPS)}'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        rollups = ResultRollup.objects.filter(indicator__in=self.get_queryset())
+        try:
+            for field in ('year', 'month', 'quarter', 'semester'):
+                value = request.query_params.get(field)
+                if value:
+                    rollups = rollups.filter(**{field: int(value)})
+            for param, field in (('indicators', 'indicator_id__in'), ('headquarters', 'headquarters_id__in')):
+                value = request.query_params.get(param)
+                if value:
+                    rollups = rollups.filter(**{field: [int(item) for item in value.split(',') if item]})
+        except ValueError:
+            return Response({'error': 'Parámetros inválidos'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(compliance_rates(rollups, group_by), status=status.HTTP_200_OK)
@@ -2,17 +2,58 @@ from rest_framework import status
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 
 from rest_framework import viewsets
-from ..models import Result
-from ..serializers.result_serializer import ResultSerializer
+import csv
+import json
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.db.models import Avg, Count, Value
+from django.db.models.functions import Coalesce
+from companies.models.headquarters import Headquarters
+from users.models import User
+from ..models import Indicator, Result, ResultRollup
+from ..models.result_rollup import bucket_key
+from ..pagination import ResultPagination
+from ..serializers.result_serializer import ResultSerializer, ResultBulkItemSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from backend.conditional import ConditionalGetMixin
 
-class ResultViewSet(viewsets.ModelViewSet):
+class ResultViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     #permission_classes = [IsAuthenticated]
     queryset = Result.objects.all()
     serializer_class = ResultSerializer
-    
+    pagination_class = ResultPagination
+    conditional_fields = ('updateTimestamp', 'indicator__updateTimestamp')
+    bulk_max_rows = 10000
+    export_chunk_size = 2000
+    export_fields = (
+        'id', 'indicator_id', 'indicator__code', 'indicator__name', 'headquarters_id', 'headquarters__name',
+        'user_id', 'year', 'month', 'quarter', 'semester', 'numerator', 'denominator', 'calculatedValue',
+        'creationDate', 'updateDate',
+    )
+    period_filters = ('year', 'month', 'quarter', 'semester')
+    list_filters = (('indicators', 'indicator_id__in'), ('headquarters', 'headquarters_id__in'))
+
+    def filter_queryset(self, queryset):
+        """
+        Filtros opcionales de la consulta, los mismos de IndicatorViewSet.compliance:
+        ?year, ?month, ?quarter, ?semester, ?indicators=1,2 y ?headquarters=1,2.
+        """
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        try:
+            for field in self.period_filters:
+                if params.get(field):
+                    queryset = queryset.filter(**{field: int(params[field])})
+            for param, field in self.list_filters:
+                if params.get(param):
+                    queryset = queryset.filter(**{field: [int(item) for item in params[param].split(',') if item]})
+        except ValueError:
+            raise ValidationError({'error': 'Parámetros inválidos'})
+        return queryset
+
     # Método para listar todos los resultados (GET) con soporte de paginación y filtros
     def list(self, request, *args, **kwargs):
         qs = self.filter_queryset(self.get_queryset())
@@ -30,102 +71,221 @@ class ResultViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
     # Método para crear un nuevo resultado (POST)
+    @transaction.atomic
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        instance = serializer.save()  # guarda y devuelve la instancia
-        # recalcula y guarda (calculate_indicator puede hacer save internamente)
-        try:
-            instance.calculate_indicator()
-        except Exception:
-            # no impedir la creación si el cálculo falla; reportarlo en la respuesta
-            pass
-        # re-serializar la instancia actualizada
-        out_serializer = self.get_serializer(instance)
-        headers = self.get_success_headers(out_serializer.data)
-        return Response(out_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+        serializer.save()  # calcula el valor y guarda en una sola escritura
+        headers = self.get_success_headers(serializer.data)
+        return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     # Método para actualizar un resultado existente (PUT/PATCH)
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
         instance = self.get_object()
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
-        instance = serializer.save()
-        try:
-            instance.calculate_indicator()
-        except Exception:
-            pass
-        out_serializer = self.get_serializer(instance)
-        return Response(out_serializer.data)
+        serializer.save()
+        return Response(serializer.data)
 
     # Método para eliminar un resultado (DELETE)
+    @transaction.atomic
     def destroy(self, request, *args, **kwargs):
         instance = self.get_object()
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
     
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Carga masiva de resultados. Recibe una lista de filas (o {"results": [...]}),
+        valida todas en una pasada, calcula sus valores y las inserta con bulk_create
+        en una sola transacción. Las filas inválidas se reportan sin abortar las válidas.
+        """
+        rows = request.data.get('results') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Se espera una lista de resultados'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > self.bulk_max_rows:
+            return Response(
+                {'error': f'Se permiten máximo {self.bulk_max_rows} resultados por carga'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        errors = []
+        valid = []
+        for index, row in enumerate(rows):
+            item = ResultBulkItemSerializer(data=row)
+            if item.is_valid():
+                valid.append((index, item.validated_data))
+            else:
+                errors.append({'index': index, 'errors': item.errors})
+
+        # Una consulta por modelo relacionado para toda la carga
+        indicators = Indicator.objects.in_bulk({data['indicator'] for _, data in valid})
+        headquarters_ids = set(
+            Headquarters.objects.filter(id__in={data['headquarters'] for _, data in valid}).values_list('id', flat=True)
+        )
+        default_user_id = request.user.pk if request.user.is_authenticated else None
+        user_ids = set(
+            User.objects.filter(id__in={data['user'] for _, data in valid if 'user' in data}).values_list('id', flat=True)
+        )
+
+        to_create = []
+        for index, data in valid:
+            row_errors = {}
+            if data['indicator'] not in indicators:
+                row_errors['indicator'] = ['El indicador no existe.']
+            if data['headquarters'] not in headquarters_ids:
+                row_errors['headquarters'] = ['La sede no existe.']
+            user_id = data.get('user', default_user_id)
+            if user_id is None:
+                row_errors['user'] = ['Este campo es requerido.']
+            elif 'user' in data and user_id not in user_ids:
+                row_errors['user'] = ['El usuario no existe.']
+            if row_errors:
+                errors.append({'index': index, 'errors': row_errors})
+                continue
+            to_create.append(Result(
+                indicator=indicators[data['indicator']],
+                headquarters_id=data['headquarters'],
+                user_id=user_id,
+                numerator=data['numerator'],
+                denominator=data['denominator'],
+                year=data['year'],
+                month=data.get('month'),
+                quarter=data.get('quarter'),
+                semester=data.get('semester'),
+            ))
+
+        Result.calculate_batch(to_create)
+        with transaction.atomic():
+            created = Result.objects.bulk_create(to_create, batch_size=1000)
+            # bulk_create no dispara señales: se actualizan los agregados afectados
+            ResultRollup.refresh_buckets(bucket_key(result) for result in created)
+
+        errors.sort(key=lambda error: error['index'])
+        response_status = status.HTTP_201_CREATED if created or not errors else status.HTTP_400_BAD_REQUEST
+        return Response({
+            'created': len(created),
+            'ids': [result.pk for result in created],
+            'errors': errors,
+        }, status=response_status)
+
+    @action(detail=False, methods=['get'])
+    def export(self, request):
+        """
+        Exporta los resultados filtrados en CSV (por defecto) o NDJSON (?export_format=ndjson),
+        enviando las filas a medida que se leen de la base de datos.
+        """
+        export_format = request.query_params.get('export_format', 'csv').lower()
+        if export_format not in ('csv', 'ndjson'):
+            return Response({'error': 'Formato no soportado, use csv o ndjson'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = (
+            self.filter_queryset(self.get_queryset())
+            .order_by('id')
+            .values_list(*self.export_fields)
+            .iterator(chunk_size=self.export_chunk_size)
+        )
+        if export_format == 'csv':
+            content, content_type = self._export_csv(rows), 'text/csv; charset=utf-8'
+        else:
+            content, content_type = self._export_ndjson(rows), 'application/x-ndjson'
+
+        response = StreamingHttpResponse(content, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="resultados.{export_format}"'
+        return response
+
+    def _export_csv(self, rows):
+        class Echo:
+            def write(self, value):
+                return value
+
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.export_fields)
+        for row in rows:
+            yield writer.writerow(row)
+
+    def _export_ndjson(self, rows):
+        for row in rows:
+            yield json.dumps(dict(zip(self.export_fields, row)), default=str, ensure_ascii=False) + '\n'
+
     @action(detail=False, methods=['get'])
     def detailed(self, request):
         """
         Endpoint personalizado que retorna datos detallados de los resultados
-        para el dashboard del frontend, manteniendo paginación si se solicita.
+        para el dashboard del frontend, manteniendo paginación si se solicita
+        (?page_size o ?cursor): en ese caso la respuesta incluye los enlaces next y previous.
+        Acepta los filtros de filter_queryset; las estadísticas siempre cubren el conjunto
+        filtrado completo (sin filtros se leen de los agregados por período).
         """
+        # Obtener queryset filtrado y optimizar con select_related para relaciones frecuentes
+        qs = self.filter_queryset(self.get_queryset().select_related('indicator', 'headquarters', 'user'))
         try:
-            # Obtener queryset filtrado y optimizar con select_related para relaciones frecuentes
-            qs = self.filter_queryset(self.get_queryset().select_related('indicator', 'headquarters', 'user'))
-            page = self.paginate_queryset(qs)
-            if page is not None:
-                serializer = self.get_serializer(page, many=True)
-                results_data = serializer.data
-            else:
-                serializer = self.get_serializer(qs, many=True)
-                results_data = serializer.data
-
-            # Estadísticas sobre el conjunto filtrado completo (no sólo la página)
-            results_all = qs
-            total_results = results_all.count()
-            total_indicators = results_all.values('indicator').distinct().count()
-            total_headquarters = results_all.values('headquarters').distinct().count()
-
-            # Agrupar por indicador y calcular sumas para promedio
-            indicators_data = {}
-            for r in results_all:
-                ind = r.indicator
-                key = ind.id
-                if key not in indicators_data:
-                    indicators_data[key] = {
-                        'id': ind.id,
-                        'name': getattr(ind, 'name', None),
-                        'code': getattr(ind, 'code', None),
-                        'results_count': 0,
-                        'values_sum': 0
-                    }
-                indicators_data[key]['results_count'] += 1
-                indicators_data[key]['values_sum'] += (getattr(r, 'calculatedValue', 0) or 0)
-
-            # Calcular promedios y formar el resumen
-            indicators_summary = []
-            for ind in indicators_data.values():
-                count = ind['results_count']
-                avg = (ind['values_sum'] / count) if count else 0
-                indicators_summary.append({
-                    'id': ind['id'],
-                    'name': ind['name'],
-                    'code': ind['code'],
-                    'results_count': ind['results_count'],
-                    'avg_value': avg
-                })
-
-            response_data = {
+            # Huella para el GET condicional: sin filtros basta con los agregados, que se
+            # actualizan con cada escritura de resultados
+            if not qs.query.where:
+                return self.conditional_get(
+                    request, ResultRollup.objects.all(), lambda: self._detailed_response(qs),
+                    fields=('updateDate', 'indicator__updateTimestamp'),
+                )
+            return self.conditional_get(request, qs, lambda: self._detailed_response(qs))
+        except Exception as e:
+            return Response({'error': 'Error al obtener datos detallados', 'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def _detailed_page(self, qs):
+        """Página pedida y sus enlaces, o todos los resultados si el cliente no pidió paginar."""
+        page = self.paginate_queryset(qs)
+        if page is None:
+            return self.get_serializer(qs, many=True).data, {}
+        links = {'next': self.paginator.get_next_link(), 'previous': self.paginator.get_previous_link()}
+        return self.get_serializer(page, many=True).data, links
+
+    def _detailed_response(self, qs):
+        """Construye la respuesta de detailed; solo se llama si el cliente no tiene la versión actual."""
+        results_data, links = self._detailed_page(qs)
+
+        # Sin filtros, las estadísticas se leen de los agregados precalculados
+        if not qs.query.where:
+            statistics, indicators_summary = ResultRollup.summary()
+            return Response({
+                **links,
                 'results': results_data,
-                'statistics': {
-                    'total_results': total_results,
-                    'total_indicators': total_indicators,
-                    'total_headquarters': total_headquarters,
-                },
+                'statistics': statistics,
                 'indicators_summary': indicators_summary
+            }, status=status.HTTP_200_OK)
+
+        # Estadísticas sobre el conjunto filtrado completo (no sólo la página),
+        # calculadas en la base de datos sin materializar los resultados
+        base_qs = qs.order_by()
+        statistics = base_qs.aggregate(
+            total_results=Count('id'),
+            total_indicators=Count('indicator', distinct=True),
+            total_headquarters=Count('headquarters', distinct=True),
+        )
+
+        # Agrupar por indicador y calcular conteo y promedio en una sola consulta
+        indicators_summary = [
+            {
+                'id': row['indicator'],
+                'name': row['indicator__name'],
+                'code': row['indicator__code'],
+                'results_count': row['results_count'],
+                'avg_value': row['avg_value'] or 0,
             }
-            return Response(response_data, status=status.HTTP_200_OK)
-        except Exception as e:
-            return Response({'error': 'Error al obtener datos detallados', 'detail': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+            for row in base_qs.values('indicator', 'indicator__name', 'indicator__code')
+            .annotate(
+                results_count=Count('id'),
+                avg_value=Avg(Coalesce('calculatedValue', Value(0.0))),
+            )
+            .order_by('indicator')
+        ]
+
+        response_data = {
+            **links,
+            'results': results_data,
+            'statistics': statistics,
+            'indicators_summary': indicators_summary
+        }
+        return Response(response_data, status=status.HTTP_200_OK)
@@ -0,0 +1,301 @@
+import datetime
+import io
+import random
+import time
+from collections import Counter
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from companies.models import Company, Department, Headquarters, Process, ProcessType
+from indicators.models import Indicator, Result, ResultRollup
+from main.models import ContenidoInformativo, Evento, FelicitacionCumpleanios, Funcionario, Reconocimiento
+from processes.models import Blob, Documento
+from processes.search import get_backend
+from processes.storage import blob_hash
+from users.models import App, Role, User
+
+FREQUENCY_PERIODS = {
+    'monthly': [{'month': month} for month in range(1, 13)],
+    'quarterly': [{'quarter': quarter} for quarter in range(1, 5)],
+    'semiannual': [{'semester': semester} for semester in range(1, 3)],
+    'annual': [{}],
+}
+CALCULATION_METHODS = [choice for choice, _ in Indicator.CALCULATION_CHOICES]
+DOCUMENT_TYPES = ['FC', 'MA', 'PR', 'DI', 'GU', 'PT', 'PL', 'IN', 'FR', 'DE', 'RG']
+
+
+class Command(BaseCommand):
+    help = (
+        'Genera un volumen configurable de datos sintéticos del portal (empresas, sedes, procesos, '
+        'indicadores con historia de resultados, documentos versionados, funcionarios y auditorías). '
+        'Inserta con bulk_create por lotes, sin disparar señales post_save: los archivos de documentos se '
+        'guardan en blobs con sus referencias, pero quedan sin texto extraído ni miniatura '
+        '(extract_document_text extrae el texto después).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1, help='Factor de volumen (scale=8 ≈ 1 millón de resultados).')
+        parser.add_argument('--years', type=int, default=5, help='Años de historia de resultados.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=None, help='Semilla aleatoria para repetir el mismo conjunto.')
+        parser.add_argument('--no-files', action='store_true', help='No escribe archivos de documentos ni fotos.')
+
+    def handle(self, *args, **options):
+        self.scale = max(1, options['scale'])
+        self.batch_size = options['batch_size']
+        self.write_files = not options['no_files']
+        self.random = random.Random(options['seed'])
+        # Prefijo de la corrida para no chocar con campos únicos de corridas anteriores
+        self.run = timezone.now().strftime('%y%m%d%H%M%S')
+        started = time.monotonic()
+
+        with transaction.atomic():
+            users = self.step('usuarios', self.seed_users)
+            companies, departments, headquarters = self.step('empresas y sedes', self.seed_companies)
+            processes = self.step('procesos', self.seed_processes, companies, departments, users)
+            indicators = self.step('indicadores', self.seed_indicators, processes, users)
+            self.step('resultados', self.seed_results, indicators, headquarters, users, options['years'])
+            self.step('agregados de resultados', ResultRollup.rebuild)
+            self.step('documentos', self.seed_documents, processes)
+            self.step('índice de búsqueda', get_backend().rebuild)
+            self.step('funcionarios', self.seed_funcionarios, headquarters)
+            if apps.is_installed('audit'):
+                self.step('auditorías', self.seed_audits, processes)
+            else:
+                self.stdout.write('La app audit no está instalada: se omiten las auditorías.')
+
+        self.stdout.write(self.style.SUCCESS(f'Datos generados en {time.monotonic() - started:.1f} s'))
+
+    def step(self, label, function, *args):
+        started = time.monotonic()
+        value = function(*args)
+        self.stdout.write(f'  {label}: {time.monotonic() - started:.1f} s')
+        return value
+
+    def bulk(self, model, objects):
+        """Inserta un iterable de objetos por lotes y retorna los creados."""
+        created = []
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                created.extend(model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            created.extend(model.objects.bulk_create(batch))
+        return created
+
+    def bulk_count(self, model, objects):
+        """Como bulk, pero sin conservar los objetos creados (para tablas grandes)."""
+        total = 0
+        batch = []
+        for obj in objects:
+            batch.append(obj)
+            if len(batch) >= self.batch_size:
+                total += len(model.objects.bulk_create(batch))
+                batch = []
+        if batch:
+            total += len(model.objects.bulk_create(batch))
+        return total
+
+    def seed_users(self):
+        app = App.objects.get_or_create(name='indicadores')[0]
+        self.bulk(Role, (Role(name=f'Rol {index}', app=app) for index in range(5)))
+        return self.bulk(User, (
+            User(
+                username=f'seed{self.run}_{index}', email=f'seed{self.run}_{index}@example.com',
+                first_name='Usuario', last_name=str(index), password='!',  # contraseña inutilizable
+            )
+            for index in range(20 * self.scale)
+        ))
+
+    def seed_companies(self):
+        today = datetime.date.today()
+        companies = self.bulk(Company, (
+            Company(
+                name=f'Empresa {index}', nit=f'900{index:06d}', legalRepresentative='Representante legal',
+                phone='3000000000', address=f'Calle {index}', contactEmail=f'empresa{index}@example.com',
+                foundationDate=today - datetime.timedelta(days=365 * 10),
+            )
+            for index in range(2 * self.scale)
+        ))
+        departments = self.bulk(Department, (
+            Department(
+                name=f'Área {index}', departmentCode=f'A{index}', company=company, description='Área generada',
+            )
+            for company in companies for index in range(5)
+        ))
+        headquarters = self.bulk(Headquarters, (
+            Headquarters(
+                habilitationCode=f'S{self.run}{company.pk}-{index}', name=f'Sede {company.pk}-{index}',
+                company=company, departament='Nariño', city='Pasto', address=f'Carrera {index}',
+            )
+            for company in companies for index in range(5)
+        ))
+        return companies, departments, headquarters
+
+    def seed_processes(self, companies, departments, users):
+        process_types = self.bulk(ProcessType, (
+            ProcessType(name=name, description=name, company=company, user=users[0])
+            for company in companies for name in ('Estratégico', 'Misional', 'Apoyo', 'Evaluación')
+        ))
+        return self.bulk(Process, (
+            Process(
+                name=f'Proceso {department.pk}-{index}', description='Proceso generado', code=f'P{department.pk}{index}',
+                version='1', processType=self.random.choice(process_types), department=department,
+                user=self.random.choice(users),
+            )
+            for department in departments for index in range(3)
+        ))
+
+    def seed_indicators(self, processes, users):
+        return self.bulk(Indicator, (
+            Indicator(
+                name=f'Indicador {process.pk}-{index}', description='Indicador generado', code=f'IND-{process.pk}-{index}',
+                version='1', calculationMethod=self.random.choice(CALCULATION_METHODS), measurementUnit='%',
+                numerator='Casos', numeratorResponsible='Líder', numeratorSource='Sistema', numeratorDescription='-',
+                denominator='Total', denominatorResponsible='Líder', denominatorSource='Sistema',
+                denominatorDescription='-', trend=self.random.choice(['increasing', 'decreasing']),
+                target=self.random.choice([50, 80, 90, 95]), author='Generador', process=process,
+                measurementFrequency=self.random.choice(list(FREQUENCY_PERIODS)), user=self.random.choice(users),
+            )
+            for process in processes for index in range(2)
+        ))
+
+    def seed_results(self, indicators, headquarters, users, years):
+        current_year = datetime.date.today().year
+
+        def results():
+            batch = []
+            for indicator in indicators:
+                for sede in headquarters:
+                    for year in range(current_year - years, current_year):
+                        for period in FREQUENCY_PERIODS[indicator.measurementFrequency]:
+                            denominator = self.random.randint(50, 500)
+                            batch.append(Result(
+                                indicator=indicator, headquarters=sede, user=self.random.choice(users), year=year,
+                                numerator=self.random.randint(0, denominator), denominator=denominator, **period,
+                            ))
+                            if len(batch) >= self.batch_size:
+                                yield from Result.calculate_batch(batch)
+                                batch = []
+            yield from Result.calculate_batch(batch)
+
+        total = self.bulk_count(Result, results())
+        self.stdout.write(f'  resultados creados: {total}')
+        return total
+
+    def seed_documents(self, processes):
+        """Cadenas de versiones: la última vigente y las anteriores obsoletas."""
+        pdf = b'%PDF-1.4\n% documento generado\n' + b'0' * 2048
+        chains = [
+            (f'DOC-{self.run}-{index}', self.random.choice(processes), self.random.choice(DOCUMENT_TYPES),
+             self.random.randint(1, 4))
+            for index in range(100 * self.scale)
+        ]
+        field = Documento._meta.get_field('archivo_oficial')
+        parents = {}
+        roots = {}
+        names = []
+        for version in range(1, 5):
+            level = [chain for chain in chains if chain[3] >= version]
+            if not level:
+                break
+            created = self.bulk(Documento, (
+                Documento(
+                    documento_padre=parents.get(code), linaje=roots.get(code), codigo_documento=code, nombre_documento=f'Documento {code}',
+                    proceso=process, tipo_documento=tipo, version=version,
+                    estado='VIG' if version == versions else 'OBS',
+                    archivo_oficial=self.save_file(f'{code}-v{version}.pdf', pdf + f'{code}-v{version}'.encode(), field),
+                )
+                for code, process, tipo, versions in level
+            ))
+            names.extend(documento.archivo_oficial.name for documento in created)
+            parents = {documento.codigo_documento: documento for documento in created}
+            roots = roots or {code: documento.pk for code, documento in parents.items()}
+        self.seed_blobs(field.storage, names)
+
+    def seed_blobs(self, storage, names):
+        """Registros Blob de los archivos guardados, que las señales de Documento no crearon."""
+        blobs = {blob_hash(name): name for name in names if blob_hash(name)}
+        references = Counter(blob_hash(name) for name in names)
+        self.bulk(Blob, (
+            Blob(hash=file_hash, nombre=name, tamano=storage.size(name), referencias=references[file_hash])
+            for file_hash, name in blobs.items()
+        ))
+
+    def seed_funcionarios(self, headquarters):
+        photo = self.placeholder_photo()
+        today = datetime.date.today()
+        funcionarios = self.bulk(Funcionario, (
+            Funcionario(
+                documento=f'{self.run}{index}', nombres=f'Nombre {index}', apellidos='Generado',
+                fecha_nacimiento=datetime.date(1960 + index % 40, index % 12 + 1, index % 28 + 1),
+                cargo='Profesional', sede=self.random.choice(headquarters), telefono='3000000000',
+                correo=f'funcionario{self.run}_{index}@example.com',
+                foto=self.save_file(f'fotosFuncionarios/{self.run}-{index}.png', photo) if photo else None,
+            )
+            for index in range(100 * self.scale)
+        ))
+        # bulk_create no dispara la señal que crea la felicitación de cada funcionario
+        self.bulk(FelicitacionCumpleanios, (
+            FelicitacionCumpleanios(funcionario=funcionario, mensaje='Feliz Cumpleaños') for funcionario in funcionarios
+        ))
+        self.bulk(Reconocimiento, (
+            Reconocimiento(
+                funcionario=funcionario, titulo='Reconocimiento', descripcion='Reconocimiento generado',
+                fecha=today, publicar=self.random.random() < 0.8,
+            )
+            for funcionario in self.random.sample(funcionarios, len(funcionarios) // 5)
+        ))
+        self.bulk(ContenidoInformativo, (
+            ContenidoInformativo(
+                titulo=f'Noticia {index}', fecha=today - datetime.timedelta(days=index), contenido='Contenido generado',
+                tipo=self.random.choice(['noticia', 'comunicado']),
+            )
+            for index in range(20 * self.scale)
+        ))
+        self.bulk(Evento, (
+            Evento(
+                titulo=f'Evento {index}', fecha=today + datetime.timedelta(days=index), hora=datetime.time(8, 0),
+                detalles='Evento generado', lugar='Auditorio',
+            )
+            for index in range(20 * self.scale)
+        ))
+
+    def seed_audits(self, processes):
+        from audit.models import Auditoria, EntidadAuditoria, TipoAuditoria
+
+        tipos = self.bulk(TipoAuditoria, (TipoAuditoria(nombre=name) for name in ('Interna', 'Externa')))
+        entidades = self.bulk(EntidadAuditoria, (EntidadAuditoria(nombre=f'Entidad {index}') for index in range(5)))
+        today = datetime.date.today()
+        self.bulk(Auditoria, (
+            Auditoria(
+                auditoria_nombre=f'Auditoría {index}', auditoria_fecha_auditoria=today - datetime.timedelta(days=index),
+                auditoria_tipo=self.random.choice(tipos), auditoria_entidad=self.random.choice(entidades),
+                auditoria_proceso=self.random.choice(processes),
+            )
+            for index in range(50 * self.scale)
+        ))
+
+    def save_file(self, name, content, field=None):
+        """Guarda el archivo en el almacenamiento del campo (por defecto, default_storage)."""
+        if field is not None:
+            name = field.generate_filename(None, name)
+        if not self.write_files:
+            return name
+        if field is None:
+            return default_storage.save(name, ContentFile(content))
+        return field.storage.save(name, ContentFile(content), max_length=field.max_length)
+
+    def placeholder_photo(self):
+        if not self.write_files:
+            return None
+        from PIL import Image
+
+        buffer = io.BytesIO()
+        Image.new('RGB', (64, 64), (46, 125, 50)).save(buffer, format='PNG')
+        return buffer.getvalue()
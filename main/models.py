@@ -1,4 +1,7 @@
+import calendar
+from datetime import date
 from django.db import models
+from django.db.models.functions import ExtractDay, ExtractMonth
 from companies.models.headquarters import Headquarters
 
 class TimeStampedModel(models.Model):
@@ -8,6 +11,16 @@ class TimeStampedModel(models.Model):
     class Meta:
         abstract = True
 
+def clave_cumpleanos(fecha):
+    """Valor de Funcionario.cumpleanos para una fecha: mes * 100 + día."""
+    return fecha.month * 100 + fecha.day
+
+def fecha_cumpleanos(fecha_nacimiento, anio):
+    """Cumpleaños en el año dado; el 29 de febrero se celebra el 28 en los años no bisiestos."""
+    if (fecha_nacimiento.month, fecha_nacimiento.day) == (2, 29) and not calendar.isleap(anio):
+        return date(anio, 2, 28)
+    return fecha_nacimiento.replace(year=anio)
+
 class Funcionario(TimeStampedModel):
     documento = models.CharField(max_length=20, unique=True)
     nombres = models.CharField(max_length=100)
@@ -18,6 +31,15 @@ class Funcionario(TimeStampedModel):
     telefono = models.CharField(max_length=20)
     correo = models.EmailField(unique=True)
     foto = models.ImageField(upload_to='fotosFuncionarios/', null=True, blank=True)
+    # Mes y día de nacimiento como MMDD (por ejemplo 315 para el 15 de marzo). Lo calcula la
+    # base de datos en cada escritura, incluso en bulk_create y update, y está indexado para
+    # buscar cumpleaños por rangos en lugar de extraer el mes y el día de cada fila
+    cumpleanos = models.GeneratedField(
+        expression=ExtractMonth('fecha_nacimiento') * 100 + ExtractDay('fecha_nacimiento'),
+        output_field=models.SmallIntegerField(),
+        db_persist=True,
+        db_index=True,
+    )
 
     def __str__(self):
         return f"{self.nombres} {self.apellidos}"
@@ -1,5 +1,6 @@
+from django.utils import timezone
 from rest_framework import serializers
-from .models import Funcionario, ContenidoInformativo, Evento, FelicitacionCumpleanios, Reconocimiento
+from .models import Funcionario, ContenidoInformativo, Evento, FelicitacionCumpleanios, Reconocimiento, fecha_cumpleanos
 from companies.models.headquarters import Headquarters
 
 class HeadquartersSerializer(serializers.ModelSerializer):
@@ -15,7 +16,7 @@ class FuncionarioSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Funcionario
-        fields = '__all__'
+        exclude = ['cumpleanos']
 
 class ContenidoInformativoSerializer(serializers.ModelSerializer):
     class Meta:
@@ -47,16 +48,15 @@ class FelicitacionCumpleaniosSerializer(serializers.ModelSerializer):
     
     def get_dias_hasta_cumpleanos(self, obj):
         """Calcula cuántos días faltan para el cumpleaños"""
-        from datetime import date
-        today = date.today()
+        today = timezone.localdate()
         fecha_nac = obj.funcionario.fecha_nacimiento
         
         # Crear la fecha de cumpleaños de este año
-        cumpleanos_este_ano = date(today.year, fecha_nac.month, fecha_nac.day)
+        cumpleanos_este_ano = fecha_cumpleanos(fecha_nac, today.year)
         
         # Si ya pasó el cumpleaños este año, calcular para el próximo año
         if cumpleanos_este_ano < today:
-            cumpleanos_este_ano = date(today.year + 1, fecha_nac.month, fecha_nac.day)
+            cumpleanos_este_ano = fecha_cumpleanos(fecha_nac, today.year + 1)
         
         # Calcular diferencia en días
         diferencia = cumpleanos_este_ano - today
@@ -1,3 +1,94 @@
+import datetime
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db.models import Sum
 from django.test import TestCase
+from rest_framework.test import APIClient
+from companies.models import Company, Headquarters, Process
+from indicators.models import Indicator, Result, ResultRollup
+from processes.models import Blob, Documento
+from processes.search import get_backend
+from .models import FelicitacionCumpleanios, Funcionario
 
-# Create your tests here.
+
+class CumpleanosTests(TestCase):
+    """Búsquedas de cumpleaños sobre la clave indexada Funcionario.cumpleanos."""
+
+    @classmethod
+    def setUpTestData(cls):
+        company = Company.objects.create(
+            name='Empresa', nit='900', legalRepresentative='Representante', phone='3000000',
+            address='Calle 1', contactEmail='empresa@example.com', foundationDate=datetime.date(2000, 1, 1),
+        )
+        sede = Headquarters.objects.create(habilitationCode='H1', name='Sede', company=company, city='Pasto')
+        fechas = {
+            'diciembre': datetime.date(1990, 12, 30), 'enero': datetime.date(1985, 1, 3),
+            'bisiesto': datetime.date(1992, 2, 29), 'marzo': datetime.date(1980, 3, 1),
+            'junio': datetime.date(1975, 6, 15),
+        }
+        for nombre, fecha in fechas.items():
+            # save() individual: la señal crea la felicitación de cada funcionario
+            Funcionario.objects.create(
+                documento=nombre, nombres=nombre, apellidos='Prueba', fecha_nacimiento=fecha, cargo='Profesional',
+                sede=sede, telefono='3000000', correo=f'{nombre}@example.com',
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def get(self, path, hoy, **params):
+        with mock.patch('main.views.timezone.localdate', return_value=hoy):
+            return self.client.get(f'/api/main/felicitaciones/{path}/', params)
+
+    def nombres(self, response):
+        return [felicitacion['funcionario']['nombres'] for felicitacion in response.data['felicitaciones']]
+
+    def test_clave_se_actualiza_con_la_fecha(self):
+        Funcionario.objects.filter(documento='junio').update(fecha_nacimiento=datetime.date(1975, 7, 4))
+        self.assertEqual(Funcionario.objects.get(documento='junio').cumpleanos, 704)
+
+    def test_proximos_pasa_por_fin_de_anio(self):
+        response = self.get('proximos', datetime.date(2025, 12, 28), dias=10)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.nombres(response), ['diciembre', 'enero'])
+        self.assertEqual(response.data['hasta'], datetime.date(2026, 1, 7))
+
+    def test_proximos_hasta_el_28_incluye_bisiestos(self):
+        self.assertEqual(self.nombres(self.get('proximos', datetime.date(2025, 2, 20), dias=8)), ['bisiesto'])
+        self.assertEqual(self.nombres(self.get('proximos', datetime.date(2024, 2, 20), dias=8)), [])
+        self.assertEqual(self.nombres(self.get('proximos', datetime.date(2024, 2, 20), dias=9)), ['bisiesto'])
+
+    def test_proximos_sin_limite_ordena_desde_hoy(self):
+        response = self.get('proximos', datetime.date(2025, 3, 1), dias=400)
+        self.assertEqual(self.nombres(response), ['marzo', 'junio', 'diciembre', 'enero', 'bisiesto'])
+        self.assertEqual(self.get('proximos', datetime.date(2025, 3, 1), dias='x').status_code, 400)
+
+    def test_cumpleanos_hoy_y_del_mes(self):
+        # En un año no bisiesto el 29 de febrero se felicita el 28
+        self.assertEqual(self.nombres(self.get('cumpleanos_hoy', datetime.date(2025, 2, 28))), ['bisiesto'])
+        self.assertEqual(self.nombres(self.get('cumpleanos_hoy', datetime.date(2024, 2, 28))), [])
+        response = self.get('cumpleanos_mes_actual', datetime.date(2025, 12, 1))
+        self.assertEqual((response.data['mes'], self.nombres(response)), (12, ['diciembre']))
+        response = self.client.get('/api/main/felicitaciones/', {'mes': 1})
+        self.assertEqual([felicitacion['funcionario']['nombres'] for felicitacion in response.data], ['enero'])
+
+
+class SeedPortalTests(TestCase):
+    """Generación de datos sintéticos con seed_portal a escala mínima."""
+
+    def test_seed_without_files(self):
+        call_command('seed_portal', scale=1, years=1, seed=7, no_files=True, stdout=StringIO())
+        self.assertEqual(
+            (Headquarters.objects.count(), Process.objects.count(), Indicator.objects.count()), (10, 30, 60),
+        )
+        self.assertEqual((Funcionario.objects.count(), FelicitacionCumpleanios.objects.count()), (100, 100))
+        self.assertEqual(Documento.objects.filter(version=1).count(), 100)
+        self.assertEqual(Documento.objects.filter(estado='VIG').count(), 100)
+        self.assertFalse(Blob.objects.exists())
+
+        # Agregados e índice de búsqueda reconstruidos después de los bulk_create
+        self.assertTrue(Result.objects.exists())
+        self.assertEqual(ResultRollup.objects.aggregate(total=Sum('results_count'))['total'], Result.objects.count())
+        call_command('rebuild_result_rollups', check=True, stdout=StringIO())
+        self.assertEqual(get_backend().search('documento').count(), Documento.objects.count())
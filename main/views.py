@@ -1,12 +1,14 @@
 from django.shortcuts import render
 from django.utils import timezone
-from datetime import datetime
+from datetime import date, datetime, timedelta
 
 # Create your views here.
-from rest_framework import viewsets
+from django.db.models import Case, IntegerField, Q, Value, When
+from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from .models import Funcionario, ContenidoInformativo, Evento, FelicitacionCumpleanios, Reconocimiento
+from backend.conditional import ConditionalGetMixin
+from .models import Funcionario, ContenidoInformativo, Evento, FelicitacionCumpleanios, Reconocimiento, clave_cumpleanos, fecha_cumpleanos
 from .serializers import (
     FuncionarioSerializer,
     ContenidoInformativoSerializer,
@@ -15,22 +17,34 @@ from .serializers import (
     ReconocimientoSerializer
 )
 
-class FuncionarioViewSet(viewsets.ModelViewSet):
-    queryset = Funcionario.objects.all()
+class FuncionarioViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
+    queryset = Funcionario.objects.select_related('sede')
     serializer_class = FuncionarioSerializer
 
-class ContenidoInformativoViewSet(viewsets.ModelViewSet):
+class ContenidoInformativoViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = ContenidoInformativo.objects.all()
     serializer_class = ContenidoInformativoSerializer
 
-class EventoViewSet(viewsets.ModelViewSet):
+class EventoViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Evento.objects.all()
     serializer_class = EventoSerializer
 
-class FelicitacionCumpleaniosViewSet(viewsets.ModelViewSet):
+class FelicitacionCumpleaniosViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = FelicitacionCumpleanios.objects.all()
     serializer_class = FelicitacionCumpleaniosSerializer
+    conditional_fields = ('updated_at', 'funcionario__updated_at')
+
+    def get_fingerprint_extra(self):
+        # dias_hasta_cumpleanos y el filtro mes=actual cambian con la fecha
+        return timezone.localdate().isoformat()
     
+    # Días máximos que se pueden pedir en proximos (con 365 o más entran todos los funcionarios)
+    proximos_max_dias = 365
+
+    def filtrar_mes(self, queryset, mes):
+        """Cumpleaños del mes como rango sobre el índice de Funcionario.cumpleanos."""
+        return queryset.filter(funcionario__cumpleanos__range=(mes * 100 + 1, mes * 100 + 31))
+
     def get_queryset(self):
         """
         Filtra las felicitaciones basado en los parámetros de la query.
@@ -42,17 +56,15 @@ class FelicitacionCumpleaniosViewSet(viewsets.ModelViewSet):
         
         if mes_param:
             if mes_param == 'actual':
-                # Obtener el mes actual
-                mes_actual = timezone.now().month
                 # Filtrar por funcionarios que cumplen años en el mes actual
-                queryset = queryset.filter(funcionario__fecha_nacimiento__month=mes_actual)
+                queryset = self.filtrar_mes(queryset, timezone.localdate().month)
             elif mes_param.isdigit():
                 # Filtrar por mes específico (1-12)
                 mes = int(mes_param)
                 if 1 <= mes <= 12:
-                    queryset = queryset.filter(funcionario__fecha_nacimiento__month=mes)
+                    queryset = self.filtrar_mes(queryset, mes)
         
-        return queryset.select_related('funcionario')
+        return queryset.select_related('funcionario__sede')
     
     @action(detail=False, methods=['get'])
     def cumpleanos_mes_actual(self, request):
@@ -60,15 +72,15 @@ class FelicitacionCumpleaniosViewSet(viewsets.ModelViewSet):
         Endpoint personalizado para obtener todos los cumpleaños del mes actual
         URL: /api/main/felicitaciones/cumpleanos_mes_actual/
         """
-        mes_actual = timezone.now().month
-        felicitaciones = FelicitacionCumpleanios.objects.filter(
-            funcionario__fecha_nacimiento__month=mes_actual
-        ).select_related('funcionario')
+        mes_actual = timezone.localdate().month
+        felicitaciones = self.filtrar_mes(
+            FelicitacionCumpleanios.objects.all(), mes_actual
+        ).select_related('funcionario__sede')
         
         serializer = self.get_serializer(felicitaciones, many=True)
         return Response({
             'mes': mes_actual,
-            'total_cumpleanos': felicitaciones.count(),
+            'total_cumpleanos': len(serializer.data),
             'felicitaciones': serializer.data
         })
     
@@ -78,22 +90,66 @@ class FelicitacionCumpleaniosViewSet(viewsets.ModelViewSet):
         Endpoint personalizado para obtener los cumpleaños de hoy
         URL: /api/main/felicitaciones/cumpleanos_hoy/
         """
-        hoy = timezone.now()
+        hoy = timezone.localdate()
+        claves = [clave_cumpleanos(hoy)]
+        if fecha_cumpleanos(date(2000, 2, 29), hoy.year) == hoy:
+            # En los años no bisiestos los nacidos el 29 de febrero se felicitan el 28
+            claves.append(229)
         felicitaciones = FelicitacionCumpleanios.objects.filter(
-            funcionario__fecha_nacimiento__month=hoy.month,
-            funcionario__fecha_nacimiento__day=hoy.day
-        ).select_related('funcionario')
+            funcionario__cumpleanos__in=claves
+        ).select_related('funcionario__sede')
         
         serializer = self.get_serializer(felicitaciones, many=True)
         return Response({
-            'fecha': hoy.date(),
-            'total_cumpleanos_hoy': felicitaciones.count(),
+            'fecha': hoy,
+            'total_cumpleanos_hoy': len(serializer.data),
+            'felicitaciones': serializer.data
+        })
+
+    @action(detail=False, methods=['get'])
+    def proximos(self, request):
+        """
+        Cumpleaños de hoy y de los próximos N días (?dias=N, por defecto 30), en orden de fecha.
+        URL: /api/main/felicitaciones/proximos/?dias=N
+        """
+        dias_param = request.query_params.get('dias', '30')
+        if not dias_param.isdigit():
+            return Response({'detail': 'dias debe ser un número entero positivo.'}, status=status.HTTP_400_BAD_REQUEST)
+        dias = min(int(dias_param), self.proximos_max_dias)
+        hoy = timezone.localdate()
+        hasta = hoy + timedelta(days=dias)
+        desde_clave, hasta_clave = clave_cumpleanos(hoy), clave_cumpleanos(hasta)
+        if fecha_cumpleanos(date(2000, 2, 29), hasta.year) == hasta:
+            # Como en cumpleanos_hoy: el 28 de un año no bisiesto incluye a los nacidos el 29
+            hasta_clave = 229
+
+        felicitaciones = FelicitacionCumpleanios.objects.select_related('funcionario__sede')
+        if dias < self.proximos_max_dias:
+            if desde_clave <= hasta_clave:
+                felicitaciones = felicitaciones.filter(funcionario__cumpleanos__range=(desde_clave, hasta_clave))
+            else:
+                # El rango pasa por el fin de año: dos rangos sobre el mismo índice
+                felicitaciones = felicitaciones.filter(
+                    Q(funcionario__cumpleanos__gte=desde_clave) | Q(funcionario__cumpleanos__lte=hasta_clave)
+                )
+        # Primero los que faltan este año y luego los de enero en adelante
+        felicitaciones = felicitaciones.order_by(
+            Case(When(funcionario__cumpleanos__gte=desde_clave, then=Value(0)), default=Value(1), output_field=IntegerField()),
+            'funcionario__cumpleanos', 'funcionario__apellidos', 'funcionario__nombres',
+        )
+
+        serializer = self.get_serializer(felicitaciones, many=True)
+        return Response({
+            'desde': hoy,
+            'hasta': hasta,
+            'total_cumpleanos': len(serializer.data),
             'felicitaciones': serializer.data
         })
 
-class ReconocimientoViewSet(viewsets.ModelViewSet):
+class ReconocimientoViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Reconocimiento.objects.all().order_by('-fecha')
     serializer_class = ReconocimientoSerializer
+    conditional_fields = ('updated_at', 'funcionario__updated_at')
     
     def get_queryset(self):
         """
@@ -110,7 +166,7 @@ class ReconocimientoViewSet(viewsets.ModelViewSet):
             elif publicar_param.lower() == 'false':
                 queryset = queryset.filter(publicar=False)
         
-        return queryset.select_related('funcionario')
+        return queryset.select_related('funcionario__sede')
     
     @action(detail=False, methods=['get'])
     def publicados(self, request):
@@ -118,7 +174,7 @@ class ReconocimientoViewSet(viewsets.ModelViewSet):
         Endpoint personalizado para obtener solo los reconocimientos publicados
         URL: /api/main/reconocimientos/publicados/
         """
-        reconocimientos = Reconocimiento.objects.filter(publicar=True).order_by('-fecha')
+        reconocimientos = Reconocimiento.objects.filter(publicar=True).select_related('funcionario__sede').order_by('-fecha')
         serializer = self.get_serializer(reconocimientos, many=True)
         return Response({
             'total_publicados': reconocimientos.count(),
@@ -131,7 +187,7 @@ class ReconocimientoViewSet(viewsets.ModelViewSet):
         Endpoint personalizado para obtener solo los reconocimientos no publicados
         URL: /api/main/reconocimientos/no_publicados/
         """
-        reconocimientos = Reconocimiento.objects.filter(publicar=False).order_by('-fecha')
+        reconocimientos = Reconocimiento.objects.filter(publicar=False).select_related('funcionario__sede').order_by('-fecha')
         serializer = self.get_serializer(reconocimientos, many=True)
         return Response({
             'total_no_publicados': reconocimientos.count(),
@@ -1,8 +1,23 @@
 from django.contrib import admin
-from .models import Documento
+from .models import Blob, Documento, TextoExtraido
 
 @admin.register(Documento)
 class DocumentoAdmin(admin.ModelAdmin):
     list_display = ('codigo_documento', 'nombre_documento', 'version', 'tipo_documento', 'estado', 'activo', 'fecha_actualizacion')
     list_filter = ('tipo_documento', 'estado', 'activo')
     search_fields = ('codigo_documento', 'nombre_documento')
+
+
+@admin.register(TextoExtraido)
+class TextoExtraidoAdmin(admin.ModelAdmin):
+    list_display = ('documento', 'campo', 'hash_archivo', 'error', 'fecha_extraccion')
+    list_filter = ('campo',)
+    search_fields = ('documento__codigo_documento', 'documento__nombre_documento')
+    readonly_fields = ('documento', 'campo', 'hash_archivo', 'texto', 'error', 'fecha_extraccion')
+
+
+@admin.register(Blob)
+class BlobAdmin(admin.ModelAdmin):
+    list_display = ('hash', 'nombre', 'tamano', 'referencias', 'fecha_creacion')
+    search_fields = ('hash', 'nombre')
+    readonly_fields = ('hash', 'nombre', 'tamano', 'referencias', 'fecha_creacion')
@@ -1,6 +1,16 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class ProcessesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'processes'
+
+    def ready(self):
+        """
+        Importa las señales que mantienen el índice de búsqueda de documentos.
+        """
+        from processes.signals import completar_linajes, crear_indice_busqueda
+
+        post_migrate.connect(crear_indice_busqueda, sender=self)
+        post_migrate.connect(completar_linajes, sender=self)
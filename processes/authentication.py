@@ -0,0 +1,76 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+
+class TokenCache:
+    """
+    Caché en memoria, acotada en tamaño (LRU) y con vencimiento, de tokens ya validados.
+    Cada entrada vence a los `ttl` segundos o cuando vence el propio token, lo que ocurra antes.
+    """
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, expires_in=None):
+        ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+token_cache = TokenCache(
+    max_size=getattr(settings, 'QUERY_TOKEN_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'QUERY_TOKEN_CACHE_TTL', 60),
+)
+
+
+class QueryStringJWTAuthentication(JWTAuthentication):
+    """
+    Autenticación JWT con el token en ?token=, para visores embebidos (iframes, visores de PDF)
+    que no pueden enviar el encabezado Authorization. Las peticiones repetidas con el mismo
+    token (por ejemplo los Range de un visor) reutilizan el token ya validado sin decodificarlo
+    ni verificar la firma. El usuario se lee en cada petición (una consulta por llave primaria):
+    la caché no guarda instancias de User, así que un usuario desactivado o eliminado deja de
+    autenticarse de inmediato y los hilos no comparten el mismo objeto.
+    """
+    query_param = 'token'
+
+    def authenticate(self, request):
+        raw_token = request.query_params.get(self.query_param)
+        if not raw_token:
+            return None
+
+        key = hashlib.sha256(raw_token.encode()).hexdigest()
+        validated_token = token_cache.get(key)
+        if validated_token is None:
+            validated_token = self.get_validated_token(raw_token.encode())
+            expires_in = validated_token['exp'] - time.time() if 'exp' in validated_token else None
+            token_cache.set(key, validated_token, expires_in)
+        # get_user verifica que el usuario exista y siga activo
+        return self.get_user(validated_token), validated_token
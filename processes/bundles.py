@@ -0,0 +1,75 @@
+"""
+ZIP de varios documentos generado por bloques mientras se envía.
+
+El archivo ZIP se escribe sobre un flujo sin posicionamiento (zipfile usa entonces
+descriptores de datos), así que no se arma en disco ni en memoria: cada bloque escrito
+se entrega de inmediato al cliente. Los formatos que ya vienen comprimidos se guardan
+sin volver a comprimir.
+"""
+import os
+import zipfile
+from django.utils import timezone
+from .file_responses import iter_file
+
+# Formatos comprimidos (PDF con flujos comprimidos, OOXML y ZIP, imágenes)
+STORED_EXTENSIONS = {'.pdf', '.docx', '.xlsx', '.xlsm', '.xlsb', '.pptx', '.zip', '.jpg', '.jpeg', '.png'}
+
+
+class _StreamBuffer:
+    """Destino de zipfile que acumula lo escrito hasta que el generador lo entrega."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        """Lo escrito desde la última llamada, como un solo bloque (o nada)."""
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return [data] if data else []
+
+
+def zip_entry_name(documento, archivo):
+    """Nombre dentro del ZIP: código, versión y nombre original del archivo."""
+    filename = os.path.basename(archivo.name)
+    return f'{documento.codigo_documento} v{documento.version} - {filename}'.replace('/', '-')
+
+
+def _zip_info(name, archivo, modified):
+    info = zipfile.ZipInfo(name, date_time=timezone.localtime(modified).timetuple()[:6])
+    extension = os.path.splitext(name)[1].lower()
+    info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+    # Con el tamaño conocido zipfile decide si la entrada necesita ZIP64
+    info.file_size = archivo.size
+    return info
+
+
+def stream_zip(entries):
+    """
+    Genera el ZIP por bloques. `entries` es un iterable de (documento, archivo); los
+    archivos que no se pueden leer se listan en FALTANTES.txt al final del ZIP.
+    """
+    buffer = _StreamBuffer()
+    missing = []
+    with zipfile.ZipFile(buffer, 'w') as archive:
+        for documento, archivo in entries:
+            name = zip_entry_name(documento, archivo)
+            try:
+                info = _zip_info(name, archivo, documento.fecha_actualizacion)
+            except OSError:
+                missing.append(name)
+                continue
+            with archive.open(info, 'w') as entry:
+                for data in iter_file(archivo):
+                    entry.write(data)
+                    yield from buffer.drain()
+            yield from buffer.drain()
+        if missing:
+            archive.writestr('FALTANTES.txt', '\n'.join(missing) + '\n')
+    yield from buffer.drain()
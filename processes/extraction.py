@@ -0,0 +1,152 @@
+"""
+Procesamiento de los archivos de los documentos fuera del ciclo de la petición.
+
+Al confirmarse el guardado de un documento, sus archivos se envían a un grupo de procesos
+(ProcessPoolExecutor) que extrae el texto para la búsqueda por contenido y genera la
+miniatura de la primera página. Los procesos no tocan la base de datos: los resultados se
+guardan desde un hilo de escritura. Si el hash coincide con el de la última extracción,
+el archivo no se vuelve a leer (en los blobs el hash sale del nombre, sin leerlo); las miniaturas se guardan con el hash del archivo en la
+ruta, así que un archivo ya procesado tampoco se vuelve a dibujar.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from django.conf import settings
+from django.db import connection, transaction
+from .extractors import extract_file, render_thumbnail
+from .models import Documento, TextoExtraido
+from .search import get_backend
+from .storage import blob_hash
+
+logger = logging.getLogger(__name__)
+
+CAMPOS = [campo for campo, _ in TextoExtraido.CAMPOS]
+
+_pool = None
+_writer = None
+_lock = threading.Lock()
+
+
+def _executors():
+    global _pool, _writer
+    with _lock:
+        if _pool is None:
+            # spawn y no fork: el servidor tiene varios hilos y un fork puede copiar locks tomados
+            # (conexión, logging); extractors no importa Django, así que iniciar un proceso es barato
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.DOCUMENT_EXTRACTION_WORKERS, mp_context=multiprocessing.get_context('spawn'),
+            )
+            _writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='extraction-writer')
+    return _pool, _writer
+
+
+def wait():
+    """Espera a que terminen las extracciones en cola (comandos de gestión y pruebas)."""
+    global _pool, _writer
+    with _lock:
+        pool, writer, _pool, _writer = _pool, _writer, None, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+        writer.shutdown(wait=True)
+
+
+def refresh_content_index(documento_id):
+    """Copia al índice de búsqueda el texto extraído de todos los archivos del documento."""
+    texts = TextoExtraido.objects.filter(documento_id=documento_id).order_by('campo').values_list('texto', flat=True)
+    get_backend().set_content(documento_id, '\n'.join(texts))
+
+
+def store_result(documento_id, campo, name, result):
+    """
+    Guarda el resultado de la extracción, salvo que el documento ya no exista o su archivo
+    haya cambiado mientras se extraía (en ese caso hay otra extracción en cola).
+    """
+    file_hash, text, error = result
+    if text is None and not error:
+        return  # Sin cambios desde la última extracción
+    with transaction.atomic():
+        current = Documento.objects.filter(pk=documento_id).values_list(campo, flat=True).first()
+        if current != name:
+            return
+        TextoExtraido.objects.update_or_create(
+            documento_id=documento_id, campo=campo,
+            defaults={'hash_archivo': file_hash or '', 'texto': text or '', 'error': error},
+        )
+        refresh_content_index(documento_id)
+    if error:
+        logger.warning('Extracción de texto del documento %s (%s): %s', documento_id, campo, error)
+
+
+def store_thumbnail(documento_id, name, result):
+    """Asigna la miniatura generada si el archivo oficial del documento sigue siendo el mismo."""
+    thumbnail, error = result
+    if thumbnail:
+        Documento.objects.filter(pk=documento_id, archivo_oficial=name).update(miniatura=thumbnail)
+    elif error:
+        logger.info('Miniatura del documento %s: %s', documento_id, error)
+
+
+def _write(store, store_args, future):
+    try:
+        store(*store_args, future.result())
+    except Exception:
+        logger.exception('No se pudo guardar el resultado del procesamiento del documento %s', store_args[0])
+    finally:
+        connection.close()  # Conexión propia del hilo de escritura
+
+
+def _run(job, args, store, *store_args):
+    """
+    Ejecuta `job` en el grupo de procesos y guarda el resultado con `store` desde el hilo
+    de escritura. Con DOCUMENT_EXTRACTION_WORKERS = 0 todo corre en el mismo proceso.
+    """
+    if settings.DOCUMENT_EXTRACTION_WORKERS <= 0:
+        store(*store_args, job(*args))
+        return
+    pool, writer = _executors()
+    future = pool.submit(job, *args)
+    future.add_done_callback(lambda future: writer.submit(_write, store, store_args, future))
+
+
+def queue_documento(documento, campos=None, force=False):
+    """
+    Envía a extracción de texto los archivos del documento.
+    """
+    known = dict(TextoExtraido.objects.filter(documento=documento).values_list('campo', 'hash_archivo'))
+    max_chars = settings.DOCUMENT_EXTRACTION_MAX_CHARS
+    for campo in campos or CAMPOS:
+        archivo = getattr(documento, campo)
+        if not archivo:
+            if campo in known:
+                # Se quitó el archivo: su texto deja de ser buscable
+                TextoExtraido.objects.filter(documento=documento, campo=campo).delete()
+                refresh_content_index(documento.pk)
+            continue
+        known_hash = None if force else known.get(campo)
+        try:
+            path = archivo.path
+        except NotImplementedError:
+            continue  # Almacenamiento remoto: no hay archivo local que leer
+        _run(
+            extract_file, (path, known_hash, max_chars, blob_hash(archivo.name)),
+            store_result, documento.pk, campo, archivo.name,
+        )
+
+
+def queue_miniatura(documento):
+    """
+    Envía a generación la miniatura del archivo oficial. Si no se puede dibujar
+    (formato sin miniatura o archivo remoto) el documento queda sin miniatura.
+    """
+    archivo = documento.archivo_oficial
+    if not archivo:
+        return
+    try:
+        path = archivo.path
+    except NotImplementedError:
+        return
+    _run(
+        render_thumbnail, (path, settings.MEDIA_ROOT, settings.DOCUMENT_THUMBNAIL_SIZE, blob_hash(archivo.name)),
+        store_thumbnail, documento.pk, archivo.name,
+    )
@@ -0,0 +1,236 @@
+"""
+Extractores de texto de PDF, DOCX y XLSX y generador de miniaturas. Se ejecutan en los
+procesos del grupo de extracción, por eso este módulo no importa Django ni modelos.
+"""
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import zipfile
+import zlib
+from io import BytesIO
+from xml.etree import ElementTree
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _xml_text(data, tag):
+    """Texto de los elementos `tag` (sin importar el espacio de nombres) de un XML."""
+    return [
+        element.text for element in ElementTree.fromstring(data).iter()
+        if element.tag.rsplit('}', 1)[-1] == tag and element.text
+    ]
+
+
+def extract_docx(path):
+    with zipfile.ZipFile(path) as archive:
+        parts = sorted(name for name in archive.namelist() if re.match(r'word/(document|header\d*|footer\d*)\.xml$', name))
+        return '\n'.join(' '.join(_xml_text(archive.read(name), 't')) for name in parts)
+
+
+def extract_xlsx(path):
+    with zipfile.ZipFile(path) as archive:
+        names = archive.namelist()
+        texts = _xml_text(archive.read('xl/sharedStrings.xml'), 't') if 'xl/sharedStrings.xml' in names else []
+        # Celdas con texto en línea (inlineStr), que no pasan por sharedStrings
+        for name in names:
+            if name.startswith('xl/worksheets/') and name.endswith('.xml'):
+                texts.extend(_xml_text(archive.read(name), 't'))
+        return '\n'.join(texts)
+
+
+PDF_STREAM_RE = re.compile(rb'stream\r?\n(.*?)\r?\nendstream', re.S)
+PDF_TEXT_RE = re.compile(rb'\((?:\\.|[^\\)])*\)\s*Tj|\[(?:\\.|[^\]])*\]\s*TJ', re.S)
+PDF_STRING_RE = re.compile(rb'\(((?:\\.|[^\\)])*)\)', re.S)
+PDF_ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'', b'f': b''}
+
+
+def _pdf_string(raw):
+    return re.sub(rb'\\(\d{1,3}|.)', lambda m: (
+        bytes([int(m.group(1), 8) & 0xFF]) if m.group(1).isdigit() else PDF_ESCAPES.get(m.group(1), m.group(1))
+    ), raw, flags=re.S)
+
+
+def extract_pdf(path):
+    """
+    Usa pypdf si está instalado; si no, lee los operadores Tj/TJ de los flujos de contenido
+    (suficiente para los PDF generados por procesadores de texto con fuentes estándar).
+    """
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        pass
+    else:
+        return '\n'.join(page.extract_text() or '' for page in PdfReader(path).pages)
+
+    with open(path, 'rb') as file:
+        data = file.read()
+    lines = []
+    for match in PDF_STREAM_RE.finditer(data):
+        stream = match.group(1)
+        try:
+            stream = zlib.decompress(stream)
+        except zlib.error:
+            pass
+        for operator in PDF_TEXT_RE.finditer(stream):
+            text = b''.join(_pdf_string(raw) for raw in PDF_STRING_RE.findall(operator.group(0)))
+            if text.strip():
+                lines.append(text.decode('latin-1'))
+    return '\n'.join(lines)
+
+
+EXTRACTORS = {
+    '.pdf': extract_pdf,
+    '.docx': extract_docx,
+    '.xlsx': extract_xlsx,
+    '.xlsm': extract_xlsx,
+}
+
+
+def extract_file(path, known_hash=None, max_chars=None, file_hash=None):
+    """
+    Trabajo de un proceso del grupo. Retorna (hash, texto, error); el texto es None
+    cuando el hash coincide con `known_hash` y no hubo que extraer nada. `file_hash` es
+    el hash del archivo si ya se conoce (blobs): así no se lee el archivo para calcularlo.
+    """
+    try:
+        file_hash = file_hash or file_sha256(path)
+    except OSError as error:
+        return None, None, str(error)[:255]
+    if file_hash == known_hash:
+        return file_hash, None, ''
+    extractor = EXTRACTORS.get(os.path.splitext(path)[1].lower())
+    if extractor is None:
+        return file_hash, '', 'Formato sin extractor de texto'
+    try:
+        text = re.sub(r'[ \t]+', ' ', extractor(path)).strip()
+    except Exception as error:
+        return file_hash, '', f'{type(error).__name__}: {error}'[:255]
+    return file_hash, text[:max_chars], ''
+
+
+THUMBNAIL_DIR = 'documentos/miniaturas'
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.bmp', '.tif', '.tiff', '.webp')
+PDF_OBJECT_RE = re.compile(rb'\d+\s+\d+\s+obj\b(.*?)\bendobj\b', re.S)
+
+
+def thumbnail_name(file_hash):
+    """Ruta de la miniatura dentro de MEDIA_ROOT, derivada del contenido del archivo."""
+    return f'{THUMBNAIL_DIR}/{file_hash[:2]}/{file_hash}.jpg'
+
+
+def _pdf_first_page(path):
+    """
+    Primera página de un PDF como imagen de Pillow: con PyMuPDF si está instalado, con
+    pdftoppm (poppler) si está en el PATH o, en PDF escaneados, la primera imagen JPEG.
+    """
+    from PIL import Image
+
+    try:
+        import fitz
+    except ImportError:
+        pass
+    else:
+        with fitz.open(path) as pdf:
+            pixmap = pdf[0].get_pixmap(dpi=48)
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    if shutil.which('pdftoppm'):
+        with tempfile.TemporaryDirectory() as folder:
+            subprocess.run(
+                ['pdftoppm', '-f', '1', '-l', '1', '-r', '48', '-jpeg', '-singlefile', path, os.path.join(folder, 'page')],
+                check=True, capture_output=True, timeout=60,
+            )
+            with Image.open(os.path.join(folder, 'page.jpg')) as image:
+                image.load()
+                return image
+
+    _warn_without_renderer()
+    with open(path, 'rb') as file:
+        data = file.read()
+    jpeg = _pdf_first_jpeg(data)
+    if jpeg is None:
+        return None
+    image = Image.open(BytesIO(jpeg))
+    image.load()
+    return image
+
+
+_renderer_warned = False
+
+
+def _warn_without_renderer():
+    """Avisa una vez por proceso que no hay con qué dibujar PDF que no sean escaneados."""
+    global _renderer_warned
+    if not _renderer_warned:
+        _renderer_warned = True
+        logger.warning(
+            'Ni PyMuPDF ni pdftoppm (poppler) están disponibles: solo los PDF escaneados tendrán miniatura'
+        )
+
+
+def _pdf_first_jpeg(data):
+    """
+    Contenido de la primera imagen del PDF si es JPEG (/DCTDecode). El diccionario y el
+    stream se buscan dentro del mismo objeto para no mezclar imágenes distintas; si la
+    primera imagen tiene otro filtro no se usa una posterior (un logo, por ejemplo).
+    """
+    for match in PDF_OBJECT_RE.finditer(data):
+        body = match.group(1)
+        stream = PDF_STREAM_RE.search(body)
+        if not stream or not re.search(rb'/Subtype\s*/Image\b', body[:stream.start()]):
+            continue
+        if not re.search(rb'/DCTDecode\b', body[:stream.start()]):
+            return None
+        return stream.group(1)
+    return None
+
+
+def render_thumbnail(path, media_root, size, file_hash=None):
+    """
+    Trabajo de un proceso del grupo. Dibuja la miniatura de la primera página (PDF) o de la
+    imagen y la guarda en MEDIA_ROOT con el hash del archivo en la ruta; si ya existe no la
+    vuelve a dibujar. Retorna (ruta de la miniatura o None, error).
+    """
+    from PIL import Image
+
+    try:
+        name = thumbnail_name(file_hash or file_sha256(path))
+        destination = os.path.join(media_root, name)
+        if os.path.exists(destination):
+            return name, ''
+
+        extension = os.path.splitext(path)[1].lower()
+        if extension == '.pdf':
+            image = _pdf_first_page(path)
+        elif extension in IMAGE_EXTENSIONS:
+            image = Image.open(path)
+        else:
+            image = None
+        if image is None:
+            return None, 'Formato sin miniatura'
+
+        with image:
+            image.thumbnail((size, size))
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            # Se escribe en un archivo temporal y se renombra para no dejar miniaturas a medias
+            descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(destination), suffix='.jpg')
+            with os.fdopen(descriptor, 'wb') as file:
+                image.convert('RGB').save(file, format='JPEG', quality=80, optimize=True)
+            os.replace(temporary, destination)
+        return name, ''
+    except Exception as error:
+        return None, f'{type(error).__name__}: {error}'[:255]
@@ -0,0 +1,170 @@
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+# Directorios de MEDIA_ROOT que solo se entregan a través de las vistas con autorización
+PROTECTED_MEDIA_DIRS = ('documentos/',)
+
+
+def offload_headers(name, path):
+    """
+    Encabezados para que el proxy entregue el archivo según FILE_OFFLOAD_MODE.
+    Retorna un diccionario vacío si la entrega por el proxy está desactivada.
+    """
+    mode = getattr(settings, 'FILE_OFFLOAD_MODE', '')
+    if mode in ('x-accel', 'local'):
+        prefix = getattr(settings, 'FILE_OFFLOAD_ACCEL_PREFIX', '/protected-media/').rstrip('/')
+        return {'X-Accel-Redirect': quote(f"{prefix}/{name.replace(os.sep, '/').lstrip('/')}")}
+    if mode == 'x-sendfile':
+        return {'X-Sendfile': path}
+    return {}
+
+
+def offloaded_by_proxy():
+    """True si el proxy envía los bytes; en modo 'local' Django los sigue enviando."""
+    return getattr(settings, 'FILE_OFFLOAD_MODE', '') in ('x-accel', 'x-sendfile')
+
+
+def _storage_path(archivo):
+    try:
+        return archivo.path
+    except NotImplementedError:
+        # Almacenamiento remoto: no hay ruta local para el proxy
+        return None
+
+
+def iter_file(archivo, start=0, length=None, chunk_size=CHUNK_SIZE):
+    """Lee el archivo por bloques desde `start`, hasta `length` bytes, y lo cierra al terminar."""
+    archivo.open('rb')
+    try:
+        archivo.seek(start)
+        remaining = length
+        while remaining is None or remaining > 0:
+            data = archivo.read(chunk_size if remaining is None else min(chunk_size, remaining))
+            if not data:
+                break
+            if remaining is not None:
+                remaining -= len(data)
+            yield data
+    finally:
+        archivo.close()
+
+
+def parse_range(header, size):
+    """
+    Retorna (inicio, fin) inclusivos de un encabezado Range de un solo rango,
+    None si el encabezado no aplica, o False si el rango no se puede satisfacer.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        # bytes=-N: los últimos N bytes
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def if_range_matches(request, etag, last_modified):
+    """Un Range solo se respeta si If-Range (cuando viene) coincide con la versión actual."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return last_modified is not None and parse_http_date_safe(if_range) == last_modified
+
+
+def serve_file(request, archivo, content_type, disposition, last_modified=None, max_age=None):
+    """
+    Respuesta de archivo por bloques, con soporte de Range/If-Range (206 Partial Content),
+    ETag/Last-Modified (304) y encabezados de caché privada.
+    `last_modified` es la fecha de la versión del archivo (datetime) y forma parte del ETag.
+    `max_age` reemplaza a DOCUMENT_CACHE_MAX_AGE.
+    """
+    size = archivo.size
+    modified = int(last_modified.timestamp()) if last_modified else None
+    etag = quote_etag(hashlib.md5(f'{archivo.name}:{size}:{modified}'.encode()).hexdigest())
+
+    path = _storage_path(archivo)
+    headers = offload_headers(archivo.name, path) if path else {}
+
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is not None:
+        headers = {}  # 304/412: el proxy no debe enviar el archivo
+    elif headers and offloaded_by_proxy():
+        # El proxy envía los bytes y resuelve Range por su cuenta
+        response = HttpResponse(content_type=content_type)
+        response['Content-Disposition'] = disposition
+    else:
+        byte_range = parse_range(request.META.get('HTTP_RANGE'), size)
+        if byte_range is not None and not if_range_matches(request, etag, modified):
+            byte_range = None
+
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        if byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                iter_file(archivo, start, end - start + 1), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = StreamingHttpResponse(iter_file(archivo), content_type=content_type)
+            response['Content-Length'] = str(size)
+        response['Content-Disposition'] = disposition
+        response['Accept-Ranges'] = 'bytes'
+
+    for header, value in headers.items():
+        response[header] = value
+    response['ETag'] = etag
+    if modified is not None:
+        response['Last-Modified'] = http_date(modified)
+    if max_age is None:
+        max_age = getattr(settings, 'DOCUMENT_CACHE_MAX_AGE', 3600)
+    patch_cache_control(response, private=True, max_age=max_age)
+    return response
+
+
+def media_view(request, path):
+    """
+    Entrega de /media/ cuando FILE_OFFLOAD_MODE está activo: Django valida la ruta y el
+    proxy envía el archivo. Los documentos controlados no se sirven por aquí.
+    """
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404
+    path = os.path.relpath(full_path, settings.MEDIA_ROOT).replace(os.sep, '/')
+    if path.startswith(PROTECTED_MEDIA_DIRS) or not os.path.isfile(full_path):
+        raise Http404
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    headers = offload_headers(path, full_path)
+    if offloaded_by_proxy():
+        response = HttpResponse(content_type=content_type or 'application/octet-stream')
+    else:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type or 'application/octet-stream')
+    for header, value in headers.items():
+        response[header] = value
+    return response
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from processes import extraction
+from processes.models import Documento
+
+
+class Command(BaseCommand):
+    help = 'Extrae el texto de los archivos de los documentos y lo agrega al índice de búsqueda.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--documento', type=int, help='Limita la extracción a un documento.')
+        parser.add_argument('--force', action='store_true', help='Extrae aunque el hash del archivo no haya cambiado.')
+
+    def handle(self, *args, **options):
+        documentos = Documento.objects.order_by('id')
+        if options['documento']:
+            documentos = documentos.filter(pk=options['documento'])
+        total = 0
+        for documento in documentos.iterator():
+            extraction.queue_documento(documento, force=options['force'])
+            total += 1
+        extraction.wait()
+        self.stdout.write(self.style.SUCCESS(f'Documentos enviados a extracción: {total}'))
@@ -0,0 +1,164 @@
+import os
+import shutil
+import datetime
+import time
+from collections import Counter
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from processes import uploads
+from processes.extractors import THUMBNAIL_DIR
+from processes.models import Blob, CargaArchivo, Documento
+from processes.storage import BLOB_DIR, ContentAddressedStorage, blob_folder, blob_hash
+
+CAMPOS = ('archivo_oficial', 'archivo_editable')
+
+
+class Command(BaseCommand):
+    help = (
+        'Recalcula las referencias de los blobs de documentos y elimina los que ningún documento usa. '
+        'Con --import-existing mueve primero a blobs los archivos guardados antes de la deduplicación. '
+        'También elimina las miniaturas que ningún documento usa y las cargas por partes abandonadas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa lo que se eliminaría.')
+        parser.add_argument(
+            '--min-age', type=int, default=60,
+            help=(
+                'Minutos de antigüedad mínima de un blob o una miniatura sin referencias para eliminarlo '
+                '(subidas y miniaturas en curso).'
+            ),
+        )
+        parser.add_argument('--import-existing', action='store_true')
+
+    def handle(self, *args, **options):
+        self.storage = Documento._meta.get_field('archivo_oficial').storage
+        if not isinstance(self.storage, ContentAddressedStorage):
+            raise CommandError('DOCUMENT_DEDUP_STORAGE está desactivado.')
+        self.dry_run = options['dry_run']
+
+        if options['import_existing']:
+            self.import_existing()
+        with transaction.atomic():
+            references = self.sync_references()
+        self.collect(references, options['min_age'] * 60)
+        self.collect_thumbnails(options['min_age'] * 60)
+        self.purge_uploads()
+
+    def document_files(self):
+        for row in Documento.objects.values_list('id', *CAMPOS).iterator():
+            for campo, name in zip(CAMPOS, row[1:]):
+                if name:
+                    yield row[0], campo, name
+
+    def import_existing(self):
+        """Mueve a blobs los archivos que aún están en sus rutas originales."""
+        legacy = [(pk, campo, name) for pk, campo, name in self.document_files() if not blob_hash(name)]
+        remaining = Counter(name for _, _, name in legacy)
+        imported = 0
+        for pk, campo, name in legacy:
+            if not self.storage.exists(name):
+                self.stderr.write(f'No existe el archivo {name} (documento {pk})')
+                continue
+            if self.dry_run:
+                imported += 1
+                continue
+            with self.storage.open(name) as file:
+                max_length = Documento._meta.get_field(campo).max_length
+                blob_name = self.storage.save(os.path.basename(name), File(file), max_length=max_length)
+            Documento.objects.filter(pk=pk).update(**{campo: blob_name})
+            remaining[name] -= 1
+            if not remaining[name]:
+                self.storage.delete(name)
+            imported += 1
+        self.stdout.write(f'Archivos movidos a blobs: {imported}')
+
+    def sync_references(self):
+        """Recalcula Blob.referencias desde la tabla de documentos y retorna {hash: referencias}."""
+        names = {}
+        references = Counter()
+        for _, _, name in self.document_files():
+            file_hash = blob_hash(name)
+            if file_hash:
+                references[file_hash] += 1
+                names.setdefault(file_hash, name)
+
+        blobs = Blob.objects.in_bulk(list(references))
+        changed = [blob for blob in blobs.values() if blob.referencias != references[blob.hash]]
+        for blob in changed:
+            blob.referencias = references[blob.hash]
+        missing = [
+            Blob(
+                hash=file_hash, nombre=names[file_hash], referencias=count,
+                tamano=self.storage.size(names[file_hash]) if self.storage.exists(names[file_hash]) else 0,
+            )
+            for file_hash, count in references.items() if file_hash not in blobs
+        ]
+        if not self.dry_run:
+            Blob.objects.bulk_update(changed, ['referencias'])
+            Blob.objects.bulk_create(missing)
+            Blob.objects.exclude(hash__in=list(references)).update(referencias=0)
+        self.stdout.write(f'Blobs referenciados: {len(references)} ({len(changed) + len(missing)} corregidos)')
+        return references
+
+    def collect(self, references, min_age):
+        """Elimina los directorios de blobs sin referencias y los temporales abandonados."""
+        root = self.storage.path(BLOB_DIR)
+        if not os.path.isdir(root):
+            return
+        limit = time.time() - min_age
+        removed, freed = 0, 0
+        for prefix in os.listdir(root):
+            prefix_path = os.path.join(root, prefix)
+            if prefix == 'tmp':
+                for name in os.listdir(prefix_path):
+                    path = os.path.join(prefix_path, name)
+                    if os.path.getmtime(path) < limit and not self.dry_run:
+                        os.remove(path)
+                continue
+            for file_hash in os.listdir(prefix_path):
+                path = os.path.join(prefix_path, file_hash)
+                if file_hash in references or os.path.getmtime(path) >= limit:
+                    continue
+                size = sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+                self.stdout.write(f'{"Se eliminaría" if self.dry_run else "Eliminado"}: {blob_folder(file_hash)}')
+                if not self.dry_run:
+                    shutil.rmtree(path)
+                    Blob.objects.filter(hash=file_hash, referencias=0).delete()
+                removed += 1
+                freed += size
+        self.stdout.write(self.style.SUCCESS(f'Blobs sin referencias: {removed} ({freed / 1024 / 1024:.1f} MB)'))
+
+    def collect_thumbnails(self, min_age):
+        """Elimina las miniaturas que ya no tiene ningún documento, p. ej. las de archivos reemplazados."""
+        root = self.storage.path(THUMBNAIL_DIR)
+        if not os.path.isdir(root):
+            return
+        used = set(Documento.objects.exclude(miniatura='').values_list('miniatura', flat=True))
+        limit = time.time() - min_age
+        removed = 0
+        for prefix in os.listdir(root):
+            prefix_path = os.path.join(root, prefix)
+            if not os.path.isdir(prefix_path):
+                continue
+            for name in os.listdir(prefix_path):
+                path = os.path.join(prefix_path, name)
+                if f'{THUMBNAIL_DIR}/{prefix}/{name}' in used or os.path.getmtime(path) >= limit:
+                    continue
+                if not self.dry_run:
+                    os.remove(path)
+                removed += 1
+        self.stdout.write(f'Miniaturas sin documento: {removed}')
+
+    def purge_uploads(self):
+        """Elimina las cargas por partes sin actividad en DOCUMENT_UPLOAD_EXPIRATION_HOURS."""
+        limit = timezone.now() - datetime.timedelta(hours=settings.DOCUMENT_UPLOAD_EXPIRATION_HOURS)
+        abandoned = list(CargaArchivo.objects.filter(fecha_actualizacion__lt=limit))
+        if not self.dry_run:
+            for carga in abandoned:
+                uploads.discard_staging_file(carga)
+            CargaArchivo.objects.filter(pk__in=[carga.pk for carga in abandoned]).delete()
+        self.stdout.write(f'Cargas abandonadas: {len(abandoned)}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from processes.models import Documento
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el linaje (documento raíz) de todos los documentos a partir de documento_padre.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = Documento.reconstruir_linajes(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Documentos actualizados: {updated}'))
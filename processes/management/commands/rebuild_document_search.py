@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from processes.search import get_backend
+
+
+class Command(BaseCommand):
+    help = 'Crea si hace falta y reconstruye el índice de texto completo de los documentos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        with transaction.atomic():
+            backend.ensure_index()
+            indexed = backend.rebuild(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Documentos indexados: {indexed}'))
@@ -1,6 +1,13 @@
-from django.db import models
+import uuid
+from django.conf import settings
+from django.core.cache import cache
+from django.db import models, transaction
+from django.db.models import Count, F, Max, Q, Value
+from django.db.models.functions import Greatest
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 from companies.models.process import Process
+from .storage import blob_hash, get_document_storage
 
 # === Constantes para tipos y estados ===
 TIPOS_DOCUMENTO = [
@@ -22,6 +29,8 @@ ESTADOS = [
     ('OBS', 'Obsoleto'),
 ]
 
+CATALOGO_CACHE_KEY = 'processes:catalogo'
+
 # === Validaciones ===
 def validar_archivo_oficial(file):
     ext = file.name.lower().split('.')[-1]
@@ -43,6 +52,10 @@ class Documento(models.Model):
     documento_padre = models.ForeignKey(
         'self', null=True, blank=True, on_delete=models.SET_NULL, related_name='versiones'
     )
+    # Id del documento raíz de la cadena de versiones (nulo en la raíz): permite traer
+    # todo el historial en una sola consulta sin recorrer documento_padre nivel por nivel
+    # (mismo tipo que el id de Documento, BigAutoField)
+    linaje = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
     codigo_documento = models.CharField(max_length=50)
     nombre_documento = models.CharField(max_length=255)
     proceso = models.ForeignKey(Process, on_delete=models.PROTECT)
@@ -54,16 +67,23 @@ class Documento(models.Model):
     fecha_actualizacion = models.DateTimeField(auto_now=True)
     archivo_oficial = models.FileField(
         upload_to='documentos/oficiales/',
+        storage=get_document_storage,
+        max_length=255,
         validators=[validar_archivo_oficial],
         null=False,
         blank=False
     )
     archivo_editable = models.FileField(
         upload_to='documentos/editables/',
+        storage=get_document_storage,
+        max_length=255,
         validators=[validar_archivo_editable],
         null=True,
         blank=True
     )
+    # Miniatura de la primera página, generada en segundo plano (processes/extraction.py).
+    # La ruta incluye el hash del archivo oficial, así que cambia cuando cambia el archivo.
+    miniatura = models.FileField(upload_to='documentos/miniaturas/', blank=True, editable=False)
 
     class Meta:
         unique_together = ('codigo_documento', 'version')
@@ -71,6 +91,9 @@ class Documento(models.Model):
             models.Index(fields=['codigo_documento']),
             models.Index(fields=['tipo_documento']),
             models.Index(fields=['estado']),
+            models.Index(fields=['-fecha_actualizacion', 'id'], name='documento_actualizacion_idx'),  # Paginación por llave
+            # Catálogo por proceso: el conteo agrupado se resuelve solo con el índice
+            models.Index(fields=['proceso', 'estado', 'activo', 'tipo_documento'], name='documento_catalogo_idx'),
         ]
 
     def __str__(self):
@@ -78,32 +101,51 @@ class Documento(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Override del método save para manejar automáticamente el estado de documentos padre
+        Override del método save para manejar automáticamente el estado de documentos padre.
+        Una nueva versión se crea en una transacción con la cadena de versiones bloqueada
         """
         # Si es un documento nuevo (no tiene pk) y tiene documento_padre
         if not self.pk and self.documento_padre:
-            # Marcar el documento padre como obsoleto
-            self.documento_padre.estado = 'OBS'
-            self.documento_padre.save(update_fields=['estado', 'fecha_actualizacion'])
-            
-            # Asegurar que el nuevo documento esté vigente
-            self.estado = 'VIG'
-            
-            # Auto-incrementar la versión basada en el documento padre
-            if not self.version:
-                self.version = self.documento_padre.version + 1
+            with transaction.atomic():
+                self._preparar_nueva_version()
+                super().save(*args, **kwargs)
+            return
 
         # Si es un documento nuevo sin padre, asegurar que esté vigente
-        elif not self.pk and not self.documento_padre:
+        if not self.pk:
             self.estado = 'VIG'
             if not self.version:
                 self.version = 0
 
         super().save(*args, **kwargs)
 
+    def _preparar_nueva_version(self):
+        """
+        Bloquea la cadena de versiones, marca obsoletas todas las demás versiones con un
+        solo UPDATE y asigna el número de versión. Se ejecuta dentro de la transacción del
+        INSERT, así que dos versiones simultáneas del mismo documento se atienden en orden.
+        """
+        padre = self.documento_padre
+        # Heredar el linaje: todas las versiones apuntan a la misma raíz
+        self.linaje = padre.linaje or padre.pk
+        cadena = Documento.filtrar_linaje(self.linaje)
+        list(cadena.select_for_update().values_list('id', flat=True))
+
+        # Consulta aparte del bloqueo: ya con el bloqueo tomado ve las versiones que otra
+        # transacción haya confirmado mientras se esperaba
+        if not self.version:
+            self.version = (cadena.aggregate(ultima=Max('version'))['ultima'] or 0) + 1
+
+        cadena.exclude(estado='OBS').update(estado='OBS', fecha_actualizacion=timezone.now())
+        padre.estado = 'OBS'
+
+        # Asegurar que el nuevo documento esté vigente
+        self.estado = 'VIG'
+
     def crear_nueva_version(self, **datos_actualizados):
         """
-        Método helper para crear una nueva versión del documento
+        Método helper para crear una nueva versión del documento; el número de versión
+        es el siguiente a la última versión de la cadena
         """
         nueva_version = Documento(
             documento_padre=self,
@@ -111,7 +153,6 @@ class Documento(models.Model):
             nombre_documento=datos_actualizados.get('nombre_documento', self.nombre_documento),
             proceso=datos_actualizados.get('proceso', self.proceso),
             tipo_documento=datos_actualizados.get('tipo_documento', self.tipo_documento),
-            version=self.version + 1,
             estado='VIG',
             archivo_oficial=datos_actualizados.get('archivo_oficial'),
             archivo_editable=datos_actualizados.get('archivo_editable', self.archivo_editable),
@@ -119,17 +160,73 @@ class Documento(models.Model):
         nueva_version.save()
         return nueva_version
 
+    @property
+    def raiz_id(self):
+        """Id del documento raíz de la cadena de versiones"""
+        return self.linaje or self.pk
+
+    @classmethod
+    def filtrar_linaje(cls, raiz_id):
+        """
+        Todas las versiones de una cadena (la raíz y sus descendientes) en una sola consulta
+        """
+        return cls.objects.filter(Q(pk=raiz_id) | Q(linaje=raiz_id))
+
+    def get_historial(self):
+        """
+        Obtiene todas las versiones de la cadena del documento, de la más antigua a la más reciente
+        """
+        return Documento.filtrar_linaje(self.raiz_id).order_by('version', 'id')
+
     def get_ultima_version(self):
         """
-        Obtiene la última versión del documento
+        Obtiene la última versión de la cadena del documento
         """
-        return self.versiones.order_by('-version').first()
+        return self.get_historial().order_by('-version', '-id').first()
 
     def get_version_vigente(self):
         """
-        Obtiene la versión vigente del documento
+        Obtiene la versión vigente de la cadena del documento
         """
-        return self.versiones.filter(estado='VIG').first()
+        return self.get_historial().filter(estado='VIG').order_by('-version', '-id').first()
+
+    @classmethod
+    def reconstruir_linajes(cls, batch_size=1000):
+        """
+        Recalcula el linaje de todos los documentos a partir de documento_padre.
+        Lee la tabla una sola vez y actualiza solo los documentos cuyo linaje cambió.
+        Retorna la cantidad de documentos actualizados.
+        """
+        filas = {pk: (padre_id, linaje) for pk, padre_id, linaje in cls.objects.values_list('id', 'documento_padre_id', 'linaje')}
+        raices = {}
+
+        def raiz(pk):
+            camino = []
+            # Recorrido iterativo hacia arriba; un ciclo se corta en el primer documento repetido
+            while pk not in raices:
+                padre_id = filas[pk][0]
+                if padre_id is None or padre_id not in filas or pk in camino:
+                    raices[pk] = pk
+                    break
+                camino.append(pk)
+                pk = padre_id
+            for visitado in camino:
+                raices[visitado] = raices[pk]
+            return raices[pk]
+
+        cambios = []
+        for pk, (_, linaje) in filas.items():
+            esperado = raiz(pk)
+            esperado = None if esperado == pk else esperado
+            if linaje != esperado:
+                cambios.append(cls(pk=pk, linaje=esperado))
+        cls.objects.bulk_update(cambios, ['linaje'], batch_size=batch_size)
+        return len(cambios)
+
+    @classmethod
+    def linajes_pendientes(cls):
+        """Hay versiones sin linaje, p. ej. las creadas antes de que existiera el campo."""
+        return cls.objects.filter(documento_padre__isnull=False, linaje__isnull=True).exists()
 
     @classmethod
     def get_documentos_vigentes(cls):
@@ -138,3 +235,123 @@ class Documento(models.Model):
         """
         return cls.objects.filter(estado='VIG', activo=True)
 
+    @classmethod
+    def get_catalogo(cls):
+        """
+        Documentos activos de cada proceso, vigentes y obsoletos, contados por tipo.
+        Se calcula con una consulta agrupada y se guarda en caché hasta que cambie un documento.
+        """
+        catalogo = cache.get(CATALOGO_CACHE_KEY)
+        if catalogo is None:
+            catalogo = cls._calcular_catalogo()
+            cache.set(CATALOGO_CACHE_KEY, catalogo, settings.DOCUMENT_CATALOGUE_CACHE_TTL)
+        return catalogo
+
+    @classmethod
+    def _calcular_catalogo(cls):
+        procesos = {}
+        filas = (
+            cls.objects.filter(activo=True)
+            .values('proceso_id', 'proceso__name', 'estado', 'tipo_documento')
+            .annotate(total=Count('id'))
+            .order_by('proceso_id')
+        )
+        for fila in filas:
+            proceso = procesos.setdefault(fila['proceso_id'], {
+                'proceso': fila['proceso_id'], 'nombre': fila['proceso__name'],
+                'vigentes': {}, 'obsoletos': {}, 'total_vigentes': 0, 'total_obsoletos': 0,
+            })
+            grupo = 'vigentes' if fila['estado'] == 'VIG' else 'obsoletos'
+            proceso[grupo][fila['tipo_documento']] = fila['total']
+            proceso[f'total_{grupo}'] += fila['total']
+        return list(procesos.values())
+
+    @classmethod
+    def invalidar_catalogo(cls):
+        cache.delete(CATALOGO_CACHE_KEY)
+
+
+
+class TextoExtraido(models.Model):
+    """
+    Texto extraído del archivo oficial o editable de un documento, para la búsqueda por contenido.
+    El hash del archivo permite omitir la extracción cuando el archivo no cambió.
+    """
+    CAMPOS = [
+        ('archivo_oficial', 'Archivo oficial'),
+        ('archivo_editable', 'Archivo editable'),
+    ]
+
+    documento = models.ForeignKey(Documento, on_delete=models.CASCADE, related_name='textos')
+    campo = models.CharField(max_length=20, choices=CAMPOS)
+    hash_archivo = models.CharField(max_length=64)
+    texto = models.TextField(blank=True)
+    error = models.CharField(max_length=255, blank=True)
+    fecha_extraccion = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('documento', 'campo')
+
+    def __str__(self):
+        return f"{self.documento} - {self.get_campo_display()}"
+
+
+class Blob(models.Model):
+    """
+    Archivo guardado una sola vez por su contenido (processes/storage.py) y cuántos
+    campos de documentos lo usan. Los blobs sin referencias los elimina gc_document_blobs.
+    """
+    hash = models.CharField(max_length=64, primary_key=True)
+    nombre = models.CharField(max_length=255)
+    tamano = models.PositiveBigIntegerField(default=0)
+    referencias = models.PositiveIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.nombre} ({self.referencias} referencias)"
+
+    @classmethod
+    def ajustar_referencias(cls, cambios):
+        """
+        Suma a cada blob la diferencia de referencias indicada en `cambios` ({nombre: diferencia}).
+        Crea el registro del blob la primera vez que se referencia.
+        """
+        for nombre, diferencia in cambios.items():
+            file_hash = blob_hash(nombre)
+            if not file_hash or not diferencia:
+                continue
+            blob = cls.objects.filter(hash=file_hash)
+            sumar = {'referencias': Greatest(F('referencias') + diferencia, Value(0))}
+            if blob.update(**sumar) or diferencia < 0:
+                continue
+            storage = Documento._meta.get_field('archivo_oficial').storage
+            tamano = storage.size(nombre) if storage.exists(nombre) else 0
+            # Otra carga del mismo contenido puede crear el registro entre el UPDATE y el INSERT:
+            # get_or_create lo encuentra y la diferencia se suma a ese registro
+            _, created = cls.objects.get_or_create(
+                hash=file_hash, defaults={'nombre': nombre, 'tamano': tamano, 'referencias': diferencia},
+            )
+            if not created:
+                blob.update(**sumar)
+
+
+class CargaArchivo(models.Model):
+    """
+    Carga por partes de un archivo grande (processes/uploads.py). Las partes se escriben en
+    un archivo de preparación en su posición; `recibido` es la cantidad de bytes contiguos
+    confirmados desde el inicio, desde donde el cliente retoma si se corta la conexión.
+    """
+    CAMPOS = TextoExtraido.CAMPOS
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='cargas_archivo')
+    campo = models.CharField(max_length=20, choices=CAMPOS, default='archivo_oficial')
+    nombre_archivo = models.CharField(max_length=255)
+    tamano = models.PositiveBigIntegerField()
+    sha256 = models.CharField(max_length=64, blank=True)
+    recibido = models.PositiveBigIntegerField(default=0)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actualizacion = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.nombre_archivo} ({self.recibido}/{self.tamano})"
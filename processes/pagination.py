@@ -0,0 +1,16 @@
+from backend.pagination import KeysetPagination
+from rest_framework.pagination import PageNumberPagination
+
+
+class DocumentoPagination(KeysetPagination):
+    ordering = ('-fecha_actualizacion', 'id')
+
+
+class DocumentoSearchPagination(PageNumberPagination):
+    """
+    Paginación por número de página para la búsqueda: el orden por relevancia no es una
+    llave estable, así que cada página se pide al índice con LIMIT/OFFSET.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
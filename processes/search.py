@@ -0,0 +1,276 @@
+"""
+Índice de texto completo de los documentos controlados.
+
+En SQLite se usa una tabla virtual FTS5 y en PostgreSQL una tabla con un tsvector
+indexado con GIN. Ambas guardan una fila por documento con los metadatos (nombre,
+código, proceso y tipo) y el texto extraído del archivo, y se mantienen al día con
+las señales de processes/signals.py. Otros motores usan un filtro icontains sin índice.
+"""
+import re
+from collections import defaultdict
+from django.db import connection
+from django.db.models import Case, IntegerField, Q, When
+from .models import Documento, TextoExtraido
+
+TABLE = 'processes_documento_fts'
+MAX_TERMS = 10
+
+
+def search_terms(text):
+    """Palabras de la búsqueda, en minúsculas y sin signos (cada una se busca como prefijo)."""
+    return re.findall(r'\w+', (text or '').lower())[:MAX_TERMS]
+
+
+def scope_sql(queryset, column):
+    """
+    Cláusula SQL (y sus parámetros) que limita las filas del índice a los documentos de
+    `queryset`, como subconsulta. Sin filtros en el queryset no agrega nada.
+    """
+    if queryset is None or not queryset.query.where:
+        return '', []
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    return f' AND {column} IN ({sql})', list(params)
+
+
+def document_fields(documento):
+    """Textos indexados de un documento, en orden de peso."""
+    return (
+        documento.nombre_documento,
+        documento.codigo_documento,
+        documento.proceso.name if documento.proceso_id else '',
+        f'{documento.tipo_documento} {documento.get_tipo_documento_display()}',
+    )
+
+
+class SearchResults:
+    """
+    Resultados ordenados por relevancia, con count() y rebanadas [inicio:fin]
+    para que el paginador solo traiga de la base de datos la página pedida.
+    Solo incluye documentos de `queryset` (por ejemplo el del ViewSet).
+    """
+
+    def __init__(self, backend, terms, queryset=None):
+        self.backend = backend
+        self.terms = terms
+        self.queryset = Documento.objects.all() if queryset is None else queryset
+        self._count = None
+
+    def count(self):
+        if self._count is None:
+            self._count = self.backend.count(self.terms, self.queryset) if self.terms else 0
+        return self._count
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start = index.start or 0
+        if not self.terms or (index.stop is not None and index.stop <= start):
+            return []
+        limit = None if index.stop is None else index.stop - start
+        ids = self.backend.ranked_ids(self.terms, start, limit, self.queryset)
+        order = Case(*[When(pk=pk, then=position) for position, pk in enumerate(ids)], output_field=IntegerField())
+        return list(self.queryset.filter(pk__in=ids).select_related('proceso').order_by(order)) if ids else []
+
+
+class SearchBackend:
+    """Sin índice: filtra con icontains y ordena por nombre."""
+
+    def ensure_index(self):
+        return False
+
+    def index(self, documentos):
+        pass
+
+    def set_content(self, documento_id, text):
+        pass
+
+    def remove(self, ids):
+        pass
+
+    def clear(self):
+        pass
+
+    def rebuild(self, batch_size=1000):
+        """Vuelve a indexar todos los documentos y retorna la cantidad indexada."""
+        self.clear()
+        total = 0
+        batch = []
+        for documento in Documento.objects.select_related('proceso').iterator(chunk_size=batch_size):
+            batch.append(documento)
+            if len(batch) >= batch_size:
+                self._index_with_content(batch)
+                total += len(batch)
+                batch = []
+        self._index_with_content(batch)
+        return total + len(batch)
+
+    def _index_with_content(self, documentos):
+        """Indexa los metadatos y restaura el texto ya extraído de los archivos."""
+        self.index(documentos)
+        contents = defaultdict(list)
+        extracted = TextoExtraido.objects.filter(documento__in=documentos).exclude(texto='')
+        for documento_id, texto in extracted.order_by('documento_id', 'campo').values_list('documento_id', 'texto'):
+            contents[documento_id].append(texto)
+        for documento_id, texts in contents.items():
+            self.set_content(documento_id, '\n'.join(texts))
+
+    def search(self, text, queryset=None):
+        return SearchResults(self, search_terms(text), queryset)
+
+    def _filter(self, terms, queryset):
+        for term in terms:
+            queryset = queryset.filter(
+                Q(nombre_documento__icontains=term) | Q(codigo_documento__icontains=term)
+                | Q(proceso__name__icontains=term) | Q(tipo_documento__iexact=term)
+                | Q(textos__texto__icontains=term)
+            )
+        return queryset.distinct()
+
+    def count(self, terms, queryset):
+        return self._filter(terms, queryset).count()
+
+    def ranked_ids(self, terms, offset, limit, queryset):
+        ids = self._filter(terms, queryset).order_by('nombre_documento', 'id').values_list('id', flat=True)
+        return list(ids[offset:offset + limit] if limit is not None else ids[offset:])
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """Tabla virtual FTS5; el rowid es el id del documento."""
+    # Pesos de bm25 por columna: nombre, código, proceso, tipo, contenido
+    weights = (10.0, 8.0, 3.0, 2.0, 1.0)
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            if TABLE in connection.introspection.table_names(cursor):
+                return False
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {TABLE} USING fts5("
+                "nombre, codigo, proceso, tipo, contenido, tokenize='unicode61 remove_diacritics 2')"
+            )
+        return True
+
+    def index(self, documentos):
+        with connection.cursor() as cursor:
+            for documento in documentos:
+                fields = document_fields(documento)
+                cursor.execute(
+                    f'UPDATE {TABLE} SET nombre = %s, codigo = %s, proceso = %s, tipo = %s WHERE rowid = %s',
+                    [*fields, documento.pk],
+                )
+                if not cursor.rowcount:
+                    cursor.execute(
+                        f"INSERT INTO {TABLE} (rowid, nombre, codigo, proceso, tipo, contenido) VALUES (%s, %s, %s, %s, %s, '')",
+                        [documento.pk, *fields],
+                    )
+
+    def set_content(self, documento_id, text):
+        with connection.cursor() as cursor:
+            cursor.execute(f'UPDATE {TABLE} SET contenido = %s WHERE rowid = %s', [text, documento_id])
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {TABLE} WHERE rowid = %s', [[pk] for pk in ids])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE}')
+
+    def _match(self, terms):
+        return ' '.join(f'"{term}"*' for term in terms)
+
+    def count(self, terms, queryset):
+        scope, params = scope_sql(queryset, 'rowid')
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {TABLE} WHERE {TABLE} MATCH %s{scope}', [self._match(terms), *params])
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, terms, offset, limit, queryset):
+        weights = ', '.join(str(weight) for weight in self.weights)
+        scope, params = scope_sql(queryset, 'rowid')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s{scope} '
+                f'ORDER BY bm25({TABLE}, {weights}), rowid LIMIT %s OFFSET %s',
+                [self._match(terms), *params, -1 if limit is None else limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """Tabla con tsvector por documento e índice GIN; los metadatos pesan más que el contenido."""
+    config = 'simple'
+
+    def ensure_index(self):
+        with connection.cursor() as cursor:
+            if TABLE in connection.introspection.table_names(cursor):
+                return False
+            cursor.execute(
+                f"CREATE TABLE {TABLE} ("
+                "documento_id bigint PRIMARY KEY REFERENCES processes_documento (id) ON DELETE CASCADE, "
+                "metadatos tsvector NOT NULL DEFAULT ''::tsvector, "
+                "contenido tsvector NOT NULL DEFAULT ''::tsvector, "
+                "vector tsvector GENERATED ALWAYS AS (metadatos || contenido) STORED)"
+            )
+            cursor.execute(f'CREATE INDEX {TABLE}_vector_idx ON {TABLE} USING GIN (vector)')
+        return True
+
+    def index(self, documentos):
+        metadatos = (
+            f"setweight(to_tsvector('{self.config}', %s), 'A') || setweight(to_tsvector('{self.config}', %s), 'A') || "
+            f"setweight(to_tsvector('{self.config}', %s), 'B') || setweight(to_tsvector('{self.config}', %s), 'C')"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {TABLE} (documento_id, metadatos) VALUES (%s, {metadatos}) '
+                'ON CONFLICT (documento_id) DO UPDATE SET metadatos = EXCLUDED.metadatos',
+                [[documento.pk, *document_fields(documento)] for documento in documentos],
+            )
+
+    def set_content(self, documento_id, text):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {TABLE} SET contenido = setweight(to_tsvector('{self.config}', %s), 'D') WHERE documento_id = %s",
+                [text, documento_id],
+            )
+
+    def remove(self, ids):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {TABLE} WHERE documento_id = ANY(%s)', [list(ids)])
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {TABLE}')
+
+    def _query(self, terms):
+        return ' & '.join(f'{term}:*' for term in terms)
+
+    def count(self, terms, queryset):
+        scope, params = scope_sql(queryset, 'documento_id')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {TABLE} WHERE vector @@ to_tsquery('{self.config}', %s){scope}",
+                [self._query(terms), *params],
+            )
+            return cursor.fetchone()[0]
+
+    def ranked_ids(self, terms, offset, limit, queryset):
+        scope, params = scope_sql(queryset, 'documento_id')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT documento_id FROM {TABLE}, to_tsquery('{self.config}', %s) query WHERE vector @@ query{scope} "
+                'ORDER BY ts_rank(vector, query) DESC, documento_id LIMIT %s OFFSET %s',
+                [self._query(terms), *params, limit, offset],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+
+def get_backend():
+    """Implementación del índice según el motor de la base de datos por defecto."""
+    if connection.vendor == 'sqlite':
+        return SQLiteSearchBackend()
+    if connection.vendor == 'postgresql':
+        return PostgresSearchBackend()
+    return SearchBackend()
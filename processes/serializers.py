@@ -1,7 +1,95 @@
+import os
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files import File
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Documento
+from companies.models import Process
+from .models import TIPOS_DOCUMENTO, CargaArchivo, Documento, validar_archivo_editable, validar_archivo_oficial
 
 class DocumentoSerializer(serializers.ModelSerializer):
+    # URL de la miniatura con el hash del archivo (?v=), que el navegador puede guardar en caché sin vencimiento
+    miniatura_url = serializers.SerializerMethodField()
+
     class Meta:
         model = Documento
         fields = '__all__'
+
+    def get_miniatura_url(self, documento):
+        if not documento.miniatura:
+            return None
+        version = os.path.splitext(os.path.basename(documento.miniatura.name))[0]
+        return f"{reverse('documento-thumbnail', kwargs={'pk': documento.pk})}?v={version}"
+
+
+class CargaArchivoSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CargaArchivo
+        fields = ('id', 'campo', 'nombre_archivo', 'tamano', 'sha256', 'recibido', 'fecha_creacion')
+        read_only_fields = ('recibido', 'fecha_creacion')
+
+    def validate_tamano(self, value):
+        if value > settings.DOCUMENT_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'El archivo supera el máximo de {settings.DOCUMENT_UPLOAD_MAX_SIZE} bytes.')
+        return value
+
+    def validate_sha256(self, value):
+        value = value.lower()
+        if value and (len(value) != 64 or any(char not in '0123456789abcdef' for char in value)):
+            raise serializers.ValidationError('Debe ser el SHA-256 en hexadecimal.')
+        return value
+
+    def validate(self, attrs):
+        # Se valida la extensión antes de recibir el archivo
+        validador = validar_archivo_editable if attrs.get('campo') == 'archivo_editable' else validar_archivo_oficial
+        try:
+            validador(File(None, name=attrs['nombre_archivo']))
+        except DjangoValidationError as error:
+            raise serializers.ValidationError({'nombre_archivo': error.messages})
+        return attrs
+
+
+class CompletarCargaSerializer(serializers.ModelSerializer):
+    """Datos del documento que recibe el archivo: uno nuevo o una nueva versión de documento_padre."""
+
+    class Meta:
+        model = Documento
+        fields = ('documento_padre', 'codigo_documento', 'nombre_documento', 'proceso', 'tipo_documento', 'version')
+        extra_kwargs = {field: {'required': False} for field in fields}
+        # La unicidad de (código, versión) se revisa abajo: en una nueva versión ambos los pone el padre
+        validators = []
+
+    def validate(self, attrs):
+        if attrs.get('documento_padre'):
+            return attrs
+        if self.context['carga'].campo != 'archivo_oficial':
+            raise serializers.ValidationError('Un documento nuevo requiere el archivo oficial.')
+        faltantes = [
+            field for field in ('codigo_documento', 'nombre_documento', 'proceso', 'tipo_documento') if not attrs.get(field)
+        ]
+        if faltantes:
+            raise serializers.ValidationError({field: 'Este campo es requerido.' for field in faltantes})
+        if Documento.objects.filter(codigo_documento=attrs['codigo_documento'], version=attrs.get('version') or 0).exists():
+            raise serializers.ValidationError({'version': 'Ya existe esta versión del documento.'})
+        return attrs
+
+
+class NuevaVersionSerializer(serializers.Serializer):
+    """Una versión de la revisión por lotes: el documento que reemplaza y, opcionalmente, sus nuevos archivos."""
+    documento_padre = serializers.PrimaryKeyRelatedField(queryset=Documento.objects.all())
+    nombre_documento = serializers.CharField(max_length=255, required=False)
+    tipo_documento = serializers.ChoiceField(choices=TIPOS_DOCUMENTO, required=False)
+    proceso = serializers.PrimaryKeyRelatedField(queryset=Process.objects.all(), required=False)
+    carga_oficial = serializers.PrimaryKeyRelatedField(queryset=CargaArchivo.objects.all(), required=False)
+    carga_editable = serializers.PrimaryKeyRelatedField(queryset=CargaArchivo.objects.all(), required=False)
+
+    def validate(self, attrs):
+        for field, campo in (('carga_oficial', 'archivo_oficial'), ('carga_editable', 'archivo_editable')):
+            carga = attrs.get(field)
+            if carga is None:
+                continue
+            if carga.usuario_id != self.context['request'].user.pk or carga.campo != campo:
+                raise serializers.ValidationError({field: 'Carga no válida para este archivo.'})
+            if carga.recibido < carga.tamano:
+                raise serializers.ValidationError({field: 'La carga no está completa.'})
+        return attrs
@@ -0,0 +1,143 @@
+from collections import Counter
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from companies.models import Process
+from .models import Blob, Documento
+from .extraction import CAMPOS, queue_documento, queue_miniatura
+from .search import get_backend
+from .storage import blob_hash
+
+
+def crear_indice_busqueda(sender, **kwargs):
+    """
+    Crea el índice de texto completo después de migrar y, si es nuevo, indexa los documentos existentes.
+    Se conecta en ProcessesConfig.ready con la app como remitente.
+    """
+    backend = get_backend()
+    if backend.ensure_index():
+        backend.rebuild()
+
+
+def completar_linajes(sender, **kwargs):
+    """
+    Calcula después de migrar el linaje de las versiones que no lo tienen (las cadenas
+    creadas antes del campo), para que el historial no quede incompleto.
+    Se conecta en ProcessesConfig.ready con la app como remitente.
+    """
+    if Documento.linajes_pendientes():
+        with transaction.atomic():
+            Documento.reconstruir_linajes()
+
+
+@receiver(post_save, sender=Documento)
+def indexar_documento(sender, instance, raw=False, **kwargs):
+    """
+    Mantiene el índice de búsqueda en la misma transacción del guardado del documento.
+    """
+    if not raw:
+        get_backend().index([instance])
+
+
+@receiver(post_save, sender=Documento)
+def extraer_texto_documento(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Envía los archivos a extracción de texto cuando se confirma la transacción,
+    salvo en guardados parciales que no tocan los archivos (por ejemplo el cambio de estado).
+    """
+    if raw or (update_fields is not None and not set(update_fields) & set(CAMPOS)):
+        return
+    transaction.on_commit(partial(queue_documento, instance))
+
+
+@receiver(post_save, sender=Documento)
+def generar_miniatura(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Genera la miniatura del archivo oficial cuando se confirma la transacción.
+    """
+    if raw or (update_fields is not None and 'archivo_oficial' not in update_fields):
+        return
+    transaction.on_commit(partial(queue_miniatura, instance))
+
+
+@receiver(post_delete, sender=Documento)
+def desindexar_documento(sender, instance, **kwargs):
+    get_backend().remove([instance.pk])
+
+
+@receiver(post_save, sender=Documento)
+@receiver(post_delete, sender=Documento)
+@receiver(post_save, sender=Process)
+def invalidar_catalogo(sender, **kwargs):
+    """
+    El catálogo por proceso se recalcula en la siguiente consulta después de confirmar el cambio.
+    """
+    transaction.on_commit(Documento.invalidar_catalogo)
+
+
+@receiver(pre_save, sender=Process)
+def recordar_nombre_proceso(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Lee el nombre guardado antes de actualizar un proceso; solo se consulta si el guardado
+    puede cambiar el nombre.
+    """
+    instance._nombre_anterior = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and 'name' not in update_fields:
+        return
+    instance._nombre_anterior = Process.objects.filter(pk=instance.pk).values_list('name', flat=True).first()
+
+
+@receiver(post_save, sender=Process)
+def reindexar_documentos_del_proceso(sender, instance, created, raw=False, **kwargs):
+    """
+    El nombre del proceso forma parte del índice: al cambiar se reindexan sus documentos.
+    """
+    anterior = getattr(instance, '_nombre_anterior', None)
+    instance._nombre_anterior = None
+    if created or raw or anterior is None or anterior == instance.name:
+        return
+    documentos = list(Documento.objects.filter(proceso=instance))
+    for documento in documentos:
+        documento.proceso = instance
+    get_backend().index(documentos)
+
+
+def _blob_names(names):
+    return Counter(name for name in names if name and blob_hash(name))
+
+
+@receiver(pre_save, sender=Documento)
+def recordar_blobs(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Lee los blobs guardados antes de actualizar el documento para ajustar sus referencias.
+    Solo consulta en actualizaciones que pueden cambiar los archivos; las lecturas no pagan nada.
+    """
+    instance._blobs = Counter()
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and not set(update_fields) & set(CAMPOS):
+        return
+    row = Documento.objects.filter(pk=instance.pk).values_list(*CAMPOS).first()
+    instance._blobs = _blob_names(row or ())
+
+
+@receiver(post_save, sender=Documento)
+def actualizar_referencias_blobs(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Mantiene Blob.referencias en la misma transacción del guardado del documento.
+    """
+    if raw or (update_fields is not None and not set(update_fields) & set(CAMPOS)):
+        return
+    cambios = _blob_names(getattr(instance, campo).name for campo in CAMPOS)
+    cambios.subtract(getattr(instance, '_blobs', Counter()))
+    Blob.ajustar_referencias(cambios)
+    instance._blobs = Counter()
+
+
+@receiver(post_delete, sender=Documento)
+def liberar_blobs(sender, instance, **kwargs):
+    nombres = _blob_names(getattr(instance, campo).name for campo in CAMPOS)
+    Blob.ajustar_referencias({nombre: -cantidad for nombre, cantidad in nombres.items()})
@@ -0,0 +1,134 @@
+"""
+Almacenamiento por contenido de los archivos de los documentos.
+
+Cada archivo se guarda una sola vez en documentos/blobs/<aa>/<sha256>/<nombre>, donde el
+hash se calcula mientras se copia el archivo subido y el nombre original se recorta para que
+la ruta quepa en el max_length del campo. Si el mismo contenido ya existe con la misma
+extensión, el documento apunta al archivo existente y la copia nueva se descarta. Las
+referencias de cada blob se llevan en el modelo Blob (processes/signals.py) y el comando
+gc_document_blobs elimina los blobs que ningún documento usa.
+"""
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.move import file_move_safe
+
+BLOB_DIR = 'documentos/blobs'
+BLOB_RE = re.compile(rf'^{BLOB_DIR}/[0-9a-f]{{2}}/(?P<hash>[0-9a-f]{{64}})/[^/]+$')
+
+
+def blob_hash(name):
+    """Hash del blob al que apunta el nombre de un archivo, o None si no es un blob."""
+    match = BLOB_RE.match(name or '')
+    return match.group('hash') if match else None
+
+
+def blob_folder(file_hash):
+    return f'{BLOB_DIR}/{file_hash[:2]}/{file_hash}'
+
+
+def blob_filename(name, max_length=None):
+    """
+    Nombre original del archivo dentro del blob, recortado (conservando la extensión)
+    para que la ruta completa quepa en `max_length`, el del FileField.
+    """
+    filename = os.path.basename(name)
+    available = max_length - len(blob_folder('0' * 64)) - 1 if max_length else None
+    if available is not None and len(filename) > available:
+        root, extension = os.path.splitext(filename)
+        filename = root[:max(available - len(extension), 1)] + extension
+    return filename
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage que deduplica por SHA-256 del contenido."""
+
+    def get_available_name(self, name, max_length=None):
+        # El nombre definitivo sale del hash en _save; el nombre pedido solo aporta el nombre
+        # del archivo, recortado aquí porque _save no recibe max_length
+        return blob_filename(name, max_length)
+
+    def _save(self, name, content):
+        temporary_dir = self.path(f'{BLOB_DIR}/tmp')
+        os.makedirs(temporary_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        descriptor, temporary = tempfile.mkstemp(dir=temporary_dir)
+        try:
+            with os.fdopen(descriptor, 'wb') as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            return self.save_hashed(temporary, name, digest.hexdigest())
+        finally:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+
+    def save_hashed(self, path, name, file_hash, max_length=None, keep_source=False):
+        """
+        Mueve al blob un archivo local cuyo hash ya se conoce, sin volver a leerlo.
+        Si el contenido ya existe, descarta el archivo y retorna el nombre existente.
+        Con `keep_source` el archivo local se conserva: el blob se crea como enlace duro
+        (o copia, si están en sistemas de archivos distintos).
+        """
+        folder = blob_folder(file_hash)
+        extension = os.path.splitext(name)[1].lower()
+        # Se reutiliza un archivo con el mismo contenido y la misma extensión, de la que
+        # dependen el tipo de contenido y los validadores
+        existing = [
+            filename for filename in (self.listdir(folder)[1] if self.exists(folder) else [])
+            if os.path.splitext(filename)[1].lower() == extension
+        ]
+        if existing:
+            # Renueva la fecha para que gc_document_blobs no lo elimine antes de guardar el documento
+            os.utime(self.path(folder))
+            if not keep_source:
+                os.remove(path)
+            return f'{folder}/{existing[0]}'
+
+        blob_name = f'{folder}/{blob_filename(name, max_length)}'
+        os.makedirs(self.path(folder), exist_ok=True)
+        if keep_source:
+            _link_or_copy(path, self.path(blob_name))
+        else:
+            file_move_safe(path, self.path(blob_name), allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(self.path(blob_name), self.file_permissions_mode)
+        return blob_name
+
+
+def _link_or_copy(source, destination):
+    if os.path.exists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copyfile(source, destination)
+
+
+def save_local_file(field, path, filename, file_hash, keep_source=False):
+    """
+    Guarda un archivo local (por ejemplo una carga por partes ya verificada) en el
+    almacenamiento del campo y retorna el nombre guardado. Con el almacenamiento por
+    contenido el archivo se mueve sin copiarlo. Con `keep_source` el archivo local no
+    se elimina (quien llama lo descarta cuando ya no lo necesita).
+    """
+    name = field.generate_filename(None, filename)
+    if isinstance(field.storage, ContentAddressedStorage):
+        return field.storage.save_hashed(path, name, file_hash, field.max_length, keep_source)
+    with open(path, 'rb') as file:
+        saved = field.storage.save(name, File(file), max_length=field.max_length)
+    if not keep_source:
+        os.remove(path)
+    return saved
+
+
+def get_document_storage():
+    """Almacenamiento de archivo_oficial y archivo_editable según DOCUMENT_DEDUP_STORAGE."""
+    if getattr(settings, 'DOCUMENT_DEDUP_STORAGE', True):
+        return ContentAddressedStorage()
+    return default_storage
@@ -1,3 +1,656 @@
-from django.test import TestCase
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import zipfile
+from io import BytesIO, StringIO
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, TestCase, override_settings
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from companies.models import Company, Department, Process, ProcessType
+from users.models import User
+from .authentication import QueryStringJWTAuthentication, token_cache
+from .extractors import _pdf_first_jpeg, extract_file
+from .file_responses import media_view
+from .models import Blob, CargaArchivo, Documento, TextoExtraido
+from .signals import completar_linajes
+from .views import DocumentoViewSet
 
-# Create your tests here.
+
+class DocumentoFileTestCase(TestCase):
+    """Documento con archivo oficial en un MEDIA_ROOT temporal."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_override.enable()
+        for folder in ('documentos/oficiales', 'documentos/editables', 'fotosFuncionarios'):
+            os.makedirs(os.path.join(cls.media_root, folder))
+        with open(os.path.join(cls.media_root, 'documentos/oficiales/manual.pdf'), 'wb') as file:
+            file.write(b'%PDF-1.4\n' + b'0' * 1024)
+        with open(os.path.join(cls.media_root, 'fotosFuncionarios/foto.png'), 'wb') as file:
+            file.write(b'\x89PNG')
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('lector', 'lector@example.com', 'clave')
+        company = Company.objects.create(
+            name='Empresa', nit='900', legalRepresentative='-', phone='-', address='-',
+            contactEmail='empresa@example.com', foundationDate='2020-01-01',
+        )
+        department = Department.objects.create(name='Área', departmentCode='A', company=company, description='-')
+        process_type = ProcessType.objects.create(name='Misional', description='-', company=company, user=cls.user)
+        process = Process.objects.create(
+            name='Proceso', description='-', code='P', version='1', processType=process_type,
+            department=department, user=cls.user,
+        )
+        cls.documento = Documento.objects.create(
+            codigo_documento='MAN-1', nombre_documento='Manual', proceso=process, tipo_documento='MA',
+            version=1, archivo_oficial='documentos/oficiales/manual.pdf',
+        )
+
+    def url(self, action):
+        return f'/api/processes/documentos/{self.documento.pk}/{action}/'
+
+
+class FileOffloadTests(DocumentoFileTestCase):
+    """Encabezados de entrega por el proxy (FILE_OFFLOAD_MODE) en previsualización, descarga y media."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @override_settings(FILE_OFFLOAD_MODE='x-accel', FILE_OFFLOAD_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_returns_header_without_body(self):
+        for action in ('preview', 'download'):
+            response = self.client.get(self.url(action))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response['X-Accel-Redirect'], '/protected-media/documentos/oficiales/manual.pdf')
+            self.assertEqual(response.content, b'')
+
+    @override_settings(FILE_OFFLOAD_MODE='x-sendfile')
+    def test_x_sendfile_uses_absolute_path(self):
+        response = self.client.get(self.url('download'))
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, 'documentos/oficiales/manual.pdf'))
+        self.assertIn('attachment;', response['Content-Disposition'])
+
+    @override_settings(FILE_OFFLOAD_MODE='local')
+    def test_local_mode_sets_header_and_streams_file(self):
+        response = self.client.get(self.url('preview'))
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/documentos/oficiales/manual.pdf')
+        self.assertEqual(len(b''.join(response.streaming_content)), 1033)
+
+    @override_settings(FILE_OFFLOAD_MODE='x-accel')
+    def test_not_modified_is_not_offloaded(self):
+        etag = self.client.get(self.url('preview'))['ETag']
+        response = self.client.get(self.url('preview'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('X-Accel-Redirect', response)
+
+    @override_settings(FILE_OFFLOAD_MODE='x-accel')
+    def test_media_view_offloads_public_files_only(self):
+        request = RequestFactory().get('/media/fotosFuncionarios/foto.png')
+        response = media_view(request, 'fotosFuncionarios/foto.png')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/fotosFuncionarios/foto.png')
+        for path in ('documentos/oficiales/manual.pdf', 'fotosFuncionarios/../documentos/oficiales/manual.pdf',
+                     '../settings.py', 'fotosFuncionarios/no-existe.png'):
+            with self.assertRaises(Http404):
+                media_view(request, path)
+
+
+@override_settings(FILE_OFFLOAD_MODE='', DOCUMENT_CACHE_MAX_AGE=600)
+class FileRangeTests(DocumentoFileTestCase):
+    """Range/If-Range y encabezados de caché privada al servir el archivo desde Django."""
+
+    size = 1033
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_private_cache_and_etag(self):
+        for action in ('preview', 'download'):
+            response = self.client.get(self.url(action))
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('private', response['Cache-Control'])
+            self.assertIn('max-age=600', response['Cache-Control'])
+            self.assertTrue(response['ETag'].startswith('"'))
+            self.assertEqual((response['Content-Length'], response['Accept-Ranges']), (str(self.size), 'bytes'))
+
+    def test_range_with_current_and_stale_if_range(self):
+        etag = self.client.get(self.url('download'))['ETag']
+        response = self.client.get(self.url('download'), HTTP_RANGE='bytes=-10', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes {self.size - 10}-{self.size - 1}/{self.size}')
+        self.assertEqual(b''.join(response.streaming_content), b'0' * 10)
+
+        # El cliente tiene otra versión del archivo: se envía completo
+        response = self.client.get(self.url('download'), HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"otra-version"')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Range', response)
+        self.assertEqual(len(b''.join(response.streaming_content)), self.size)
+
+    def test_unsatisfiable_range(self):
+        response = self.client.get(self.url('preview'), HTTP_RANGE=f'bytes={self.size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{self.size}')
+
+
+class QueryStringTokenTests(DocumentoFileTestCase):
+    """Autenticación por ?token= en previsualización y descarga, con caché del token validado."""
+
+    def setUp(self):
+        token_cache.clear()
+        self.client = APIClient()
+        self.token = str(AccessToken.for_user(self.user))
+
+    def test_token_is_validated_once(self):
+        response = self.client.get(self.url('preview'), {'token': self.token})
+        self.assertEqual(response.status_code, 200)
+        with mock.patch.object(QueryStringJWTAuthentication, 'get_validated_token') as get_validated_token:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(self.url('download'), {'token': self.token}, HTTP_RANGE='bytes=0-99')
+        self.assertEqual(response.status_code, 206)
+        get_validated_token.assert_not_called()
+        # Solo la lectura del usuario por llave primaria
+        self.assertEqual(len([query for query in queries.captured_queries if 'users_user' in query['sql']]), 1)
+
+    def test_deactivated_user_is_rejected_while_cached(self):
+        self.assertEqual(self.client.get(self.url('preview'), {'token': self.token}).status_code, 200)
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.client.get(self.url('preview'), {'token': self.token}).status_code, 401)
+
+    def test_invalid_token_is_rejected(self):
+        self.assertEqual(self.client.get(self.url('preview'), {'token': 'no-es-un-token'}).status_code, 401)
+        self.assertEqual(self.client.get(self.url('preview')).status_code, 401)
+
+    def test_token_only_accepted_by_viewers(self):
+        self.assertEqual(self.client.get('/api/processes/documentos/', {'token': self.token}).status_code, 401)
+        detalle = f'/api/processes/documentos/{self.documento.pk}/?token={self.token}'
+        self.assertEqual(self.client.delete(detalle).status_code, 401)
+        self.assertTrue(Documento.objects.filter(pk=self.documento.pk).exists())
+
+
+class VersionLineageTests(DocumentoFileTestCase):
+    """Historial de versiones resuelto por linaje, sin recorrer documento_padre nivel por nivel."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def crear_cadena(self, versiones):
+        cadena = [Documento.objects.get(pk=self.documento.pk)]
+        for _ in range(versiones):
+            cadena.append(cadena[-1].crear_nueva_version(archivo_oficial='documentos/oficiales/manual.pdf'))
+        return cadena
+
+    def test_historial_in_constant_queries(self):
+        cadena = self.crear_cadena(5)
+        self.assertEqual({documento.linaje for documento in cadena[1:]}, {self.documento.pk})
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/processes/documentos/{cadena[3].pk}/historial/')
+        self.assertEqual([row['id'] for row in response.data], [documento.pk for documento in cadena])
+        self.assertEqual(cadena[0].get_version_vigente(), cadena[-1])
+        self.assertEqual(cadena[2].get_ultima_version(), cadena[-1])
+
+    def test_reconstruir_linajes(self):
+        cadena = self.crear_cadena(3)
+        self.assertEqual(Documento.reconstruir_linajes(), 0)
+        Documento.objects.update(linaje=None)
+        self.assertEqual(Documento.reconstruir_linajes(), 3)
+        self.assertEqual(list(cadena[-1].get_historial()), cadena)
+
+    def test_migrate_completes_missing_lineage(self):
+        cadena = self.crear_cadena(2)
+        Documento.objects.update(linaje=None)  # Cadena anterior al campo
+        self.assertTrue(Documento.linajes_pendientes())
+        completar_linajes(sender=None)
+        self.assertFalse(Documento.linajes_pendientes())
+        self.assertEqual(list(cadena[-1].get_historial()), cadena)
+
+
+class DocumentSearchTests(DocumentoFileTestCase):
+    """Búsqueda de texto completo sincronizada con el guardado de los documentos."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def buscar(self, q, **params):
+        return self.client.get('/api/processes/documentos/buscar/', {'q': q, **params}).data
+
+    def test_prefix_search_ranked_and_paginated(self):
+        for index in range(3):
+            Documento.objects.create(
+                codigo_documento=f'GU-{index}', nombre_documento=f'Guía de limpieza {index}', proceso=self.documento.proceso,
+                tipo_documento='GU', version=1, archivo_oficial='documentos/oficiales/manual.pdf',
+            )
+        Documento.objects.create(
+            codigo_documento='LIMP-1', nombre_documento='Formato', proceso=self.documento.proceso,
+            tipo_documento='FR', version=1, archivo_oficial='documentos/oficiales/manual.pdf',
+        )
+        data = self.buscar('limp', page_size=2)
+        self.assertEqual(data['count'], 4)
+        self.assertEqual(len(data['results']), 2)
+        rows = data['results'] + self.buscar('limp', page_size=2, page=2)['results']
+        self.assertEqual(len({row['id'] for row in rows}), 4)
+        self.assertEqual(self.buscar('guia limpieza 2')['results'][0]['codigo_documento'], 'GU-2')
+        self.assertEqual(self.buscar('')['count'], 0)
+
+    def test_index_follows_changes(self):
+        self.assertEqual(self.buscar('manual')['count'], 1)
+        self.documento.nombre_documento = 'Reglamento'
+        self.documento.save()
+        self.assertEqual(self.buscar('manual')['count'], 0)
+        self.documento.proceso.name = 'Gestión ambiental'
+        self.documento.proceso.save()
+        self.assertEqual(self.buscar('ambiental')['results'][0]['id'], self.documento.pk)
+        self.documento.delete()
+        self.assertEqual(self.buscar('reglamento')['count'], 0)
+
+    def test_process_save_reindexes_only_on_rename(self):
+        proceso = Process.objects.get(pk=self.documento.proceso_id)
+        proceso.description = 'Otra descripción'
+        with CaptureQueriesContext(connection) as queries:
+            proceso.save()
+        self.assertFalse([query for query in queries.captured_queries if 'processes_documento_fts' in query['sql']])
+
+    def test_results_scoped_to_viewset_queryset(self):
+        Documento.objects.create(
+            codigo_documento='MAN-9', nombre_documento='Manual retirado', proceso=self.documento.proceso,
+            tipo_documento='MA', version=1, activo=False, archivo_oficial='documentos/oficiales/manual.pdf',
+        )
+        self.assertEqual(self.buscar('manual')['count'], 2)
+        with mock.patch.object(DocumentoViewSet, 'get_queryset', lambda view: Documento.objects.filter(activo=True)):
+            data = self.buscar('manual')
+        self.assertEqual((data['count'], [row['id'] for row in data['results']]), (1, [self.documento.pk]))
+
+
+@override_settings(DOCUMENT_EXTRACTION_WORKERS=0)
+class TextExtractionTests(DocumentoFileTestCase):
+    """Extracción del texto de los archivos al guardar, omitida si el hash no cambió."""
+
+    def escribir(self, name, content):
+        with open(os.path.join(self.media_root, name), 'wb') as file:
+            file.write(content)
+        return name
+
+    def escribir_docx(self, name, text):
+        path = os.path.join(self.media_root, name)
+        with zipfile.ZipFile(path, 'w') as archive:
+            archive.writestr('word/document.xml', (
+                '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main">'
+                f'<w:body><w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>'
+            ))
+        return name
+
+    def test_extractors(self):
+        pdf = self.escribir('documentos/oficiales/texto.pdf', b'%PDF-1.4\nstream\nBT (Lavado de manos) Tj ET\nendstream\n')
+        docx = self.escribir_docx('documentos/editables/texto.docx', 'Esterilización de instrumental')
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+            _, text, error = pool.submit(extract_file, os.path.join(self.media_root, pdf)).result()
+        self.assertEqual((text, error), ('Lavado de manos', ''))
+        file_hash, text, _ = extract_file(os.path.join(self.media_root, docx))
+        self.assertEqual(text, 'Esterilización de instrumental')
+        self.assertEqual(extract_file(os.path.join(self.media_root, docx), file_hash), (file_hash, None, ''))
+
+    def test_content_is_searchable_and_not_reextracted(self):
+        self.documento.archivo_editable = self.escribir_docx('documentos/editables/manual.docx', 'Esterilización de instrumental')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.documento.save()
+        texto = TextoExtraido.objects.get(documento=self.documento, campo='archivo_editable')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/processes/documentos/buscar/', {'q': 'esterilizacion'})
+        self.assertEqual([row['id'] for row in response.data['results']], [self.documento.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.documento.save()
+        self.assertEqual(TextoExtraido.objects.get(pk=texto.pk).fecha_extraccion, texto.fecha_extraccion)
+
+    def test_blob_hash_read_from_the_name(self):
+        self.documento.archivo_editable = ContentFile(b'%PDF-1.4\nstream\nBT (Higiene) Tj ET\nendstream\n', name='a.pdf')
+        from . import extractors
+        with mock.patch.object(extractors, 'file_sha256', wraps=extractors.file_sha256) as file_sha256:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.documento.save()
+        # Solo se calcula el hash del archivo oficial, que no está en un blob
+        self.assertEqual({call.args[0] for call in file_sha256.call_args_list}, {self.documento.archivo_oficial.path})
+        texto = TextoExtraido.objects.get(documento=self.documento, campo='archivo_editable')
+        self.assertEqual((texto.texto, texto.hash_archivo), ('Higiene', self.documento.archivo_editable.name.split('/')[3]))
+
+
+@override_settings(DOCUMENT_EXTRACTION_WORKERS=0)
+class ThumbnailTests(DocumentoFileTestCase):
+    """Miniaturas con el hash del archivo en la ruta, servidas con caché de larga duración."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def escribir_pdf_escaneado(self, name):
+        from PIL import Image
+
+        jpeg = BytesIO()
+        Image.new('RGB', (600, 800), (200, 200, 200)).save(jpeg, format='JPEG')
+        with open(os.path.join(self.media_root, name), 'wb') as file:
+            file.write(
+                b'%PDF-1.4\n1 0 obj <</Type /XObject /Subtype /Image /Width 600 /Height 800 /Filter /DCTDecode>>\n'
+                b'stream\n' + jpeg.getvalue() + b'\nendstream endobj\n'
+            )
+        return name
+
+    def test_thumbnail_generated_and_cached(self):
+        self.documento.archivo_oficial = self.escribir_pdf_escaneado('documentos/oficiales/escaneado.pdf')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.documento.save()
+
+        url = self.client.get(f'/api/processes/documentos/{self.documento.pk}/').data['miniatura_url']
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+        from PIL import Image
+        with Image.open(BytesIO(b''.join(response.streaming_content))) as image:
+            self.assertEqual(max(image.size), 256)
+
+        response = self.client.get(self.url('thumbnail'))
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_document_without_thumbnail(self):
+        self.assertEqual(self.client.get(self.url('thumbnail')).status_code, 404)
+
+    def test_jpeg_read_from_a_single_object(self):
+        flate = b'1 0 obj <</Subtype /Image /Filter /FlateDecode>>\nstream\nplano\nendstream endobj\n'
+        logo = b'2 0 obj <</Subtype /Image /Filter /DCTDecode>>\nstream\nlogo\nendstream endobj\n'
+        self.assertIsNone(_pdf_first_jpeg(b'%PDF-1.4\n' + flate + logo))
+        self.assertEqual(_pdf_first_jpeg(b'%PDF-1.4\n' + logo + flate), b'logo')
+
+    def test_missing_renderer_logged_once(self):
+        from . import extractors
+        with mock.patch.object(extractors, '_renderer_warned', False):
+            with self.assertLogs('processes.extractors', 'WARNING') as logs:
+                extractors._warn_without_renderer()
+                extractors._warn_without_renderer()
+        self.assertEqual(len(logs.output), 1)
+
+    def test_gc_removes_replaced_thumbnails(self):
+        self.documento.archivo_oficial = self.escribir_pdf_escaneado('documentos/oficiales/escaneado.pdf')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.documento.save()
+        anterior = Documento.objects.get(pk=self.documento.pk).miniatura.path
+        Documento.objects.filter(pk=self.documento.pk).update(miniatura='')
+
+        call_command('gc_document_blobs', min_age=0, dry_run=True, stdout=StringIO())
+        self.assertTrue(os.path.exists(anterior))
+        call_command('gc_document_blobs', min_age=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(anterior))
+
+
+class BlobStorageTests(DocumentoFileTestCase):
+    """Archivos guardados una vez por contenido, con referencias y recolección de los no usados."""
+
+    def crear(self, codigo, contenido, nombre='procedimiento.pdf'):
+        return Documento.objects.create(
+            codigo_documento=codigo, nombre_documento=codigo, proceso=self.documento.proceso, tipo_documento='PR',
+            version=1, archivo_oficial=ContentFile(contenido, name=nombre),
+        )
+
+    def test_identical_uploads_share_one_blob(self):
+        primero = self.crear('PR-1', b'%PDF-1.4 igual')
+        segundo = self.crear('PR-2', b'%PDF-1.4 igual', nombre='copia.pdf')
+        self.assertEqual(primero.archivo_oficial.name, segundo.archivo_oficial.name)
+        self.assertTrue(primero.archivo_oficial.name.endswith('/procedimiento.pdf'))
+        blob = Blob.objects.get()
+        self.assertEqual((blob.referencias, blob.tamano), (2, 14))
+
+        nueva = segundo.crear_nueva_version(archivo_oficial=primero.archivo_oficial, archivo_editable=None)
+        self.assertEqual(Blob.objects.get().referencias, 3)
+        nueva.archivo_oficial = ContentFile(b'%PDF-1.4 distinto', name='nuevo.pdf')
+        nueva.save()
+        self.assertEqual(sorted(Blob.objects.values_list('referencias', flat=True)), [1, 2])
+        primero.delete()
+        self.assertEqual(sorted(Blob.objects.values_list('referencias', flat=True)), [1, 1])
+        self.assertNotIn('_blobs', Documento.objects.get(pk=segundo.pk).__dict__)  # Leer un documento no calcula sus blobs
+
+    def test_concurrent_first_reference(self):
+        from django.db.models import QuerySet
+        documento = self.crear('PR-5', b'%PDF-1.4 concurrente')
+        update = QuerySet.update
+        llamadas = []
+
+        def update_tras_insert_ajeno(queryset, **kwargs):
+            # El primer UPDATE no ve el registro: otra carga lo insertó después
+            llamadas.append(kwargs)
+            return 0 if len(llamadas) == 1 else update(queryset, **kwargs)
+
+        with mock.patch.object(QuerySet, 'update', update_tras_insert_ajeno):
+            Blob.ajustar_referencias({documento.archivo_oficial.name: 1})
+        self.assertEqual(Blob.objects.get().referencias, 2)
+
+    def test_long_names_fit_the_field(self):
+        max_length = Documento._meta.get_field('archivo_oficial').max_length
+        nombre = 'procedimiento de limpieza y desinfeccion ' * 8 + '.pdf'
+        documento = self.crear('PR-4', b'%PDF-1.4 largo', nombre=nombre)
+        self.assertEqual(len(documento.archivo_oficial.name), max_length)
+        self.assertTrue(documento.archivo_oficial.name.endswith('.pdf'))
+        self.assertTrue(os.path.exists(documento.archivo_oficial.path))
+
+    def test_gc_removes_unreferenced_blobs(self):
+        documento = self.crear('PR-3', b'%PDF-1.4 temporal')
+        path = documento.archivo_oficial.path
+        Documento.objects.filter(pk=documento.pk).delete()
+        call_command('gc_document_blobs', min_age=60, stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+        call_command('gc_document_blobs', min_age=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(Blob.objects.exists())
+
+    def test_import_existing_files(self):
+        call_command('gc_document_blobs', import_existing=True, stdout=StringIO())
+        self.documento.refresh_from_db()
+        self.assertTrue(self.documento.archivo_oficial.name.startswith('documentos/blobs/'))
+        self.assertEqual(Blob.objects.get().referencias, 1)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, 'documentos/oficiales/manual.pdf')))
+
+
+class CargaTestMixin:
+    """Inicia cargas por partes y envía sus partes."""
+
+    contenido = b'%PDF-1.4\n' + bytes(range(256)) * 40
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def iniciar(self, **datos):
+        datos = {'nombre_archivo': 'escaneado.pdf', 'tamano': len(self.contenido), **datos}
+        response = self.client.post('/api/processes/cargas/', datos)
+        self.assertEqual(response.status_code, 201, response.data)
+        return f"/api/processes/cargas/{response.data['id']}/"
+
+    def parte(self, url, offset, data):
+        return self.client.put(f'{url}parte/', data, content_type='application/octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+
+class ChunkedUploadTests(CargaTestMixin, DocumentoFileTestCase):
+    """Carga por partes reanudable que termina en un documento nuevo o en una nueva versión."""
+
+    def test_resume_and_complete_new_document(self):
+        url = self.iniciar(sha256=hashlib.sha256(self.contenido).hexdigest())
+        self.assertEqual(self.parte(url, 0, self.contenido[:4000]).data['recibido'], 4000)
+        # Parte repetida tras un corte y parte con hueco
+        self.assertEqual(self.parte(url, 2000, self.contenido[2000:6000]).data['recibido'], 6000)
+        self.assertEqual(self.parte(url, 8000, self.contenido[8000:]).status_code, 409)
+        self.assertEqual(self.client.post(f'{url}completar/').status_code, 409)
+        self.assertEqual(self.client.get(url).data['recibido'], 6000)
+        self.parte(url, 6000, self.contenido[6000:])
+
+        response = self.client.post(f'{url}completar/', {
+            'codigo_documento': 'MAN-2', 'nombre_documento': 'Manual escaneado',
+            'proceso': self.documento.proceso_id, 'tipo_documento': 'MA',
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        documento = Documento.objects.get(pk=response.data['id'])
+        with documento.archivo_oficial.open('rb') as file:
+            self.assertEqual(file.read(), self.contenido)
+        self.assertFalse(CargaArchivo.objects.exists())
+
+    def test_hash_mismatch_restarts_upload(self):
+        url = self.iniciar(sha256='0' * 64)
+        self.parte(url, 0, self.contenido)
+        response = self.client.post(f'{url}completar/', {'documento_padre': self.documento.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get(url).data['recibido'], 0)
+
+    def test_complete_as_new_version(self):
+        url = self.iniciar(campo='archivo_editable', nombre_archivo='manual.docx')
+        self.parte(url, 0, self.contenido)
+        response = self.client.post(f'{url}completar/', {'documento_padre': self.documento.pk})
+        self.assertEqual(response.status_code, 201, response.data)
+        version = Documento.objects.get(pk=response.data['id'])
+        self.assertEqual((version.version, version.archivo_oficial.name), (2, 'documentos/oficiales/manual.pdf'))
+        self.assertTrue(version.archivo_editable.name.endswith('/manual.docx'))
+
+    @override_settings(DOCUMENT_EXTRACTION_WORKERS=0)
+    def test_failed_insert_keeps_upload(self):
+        url = self.iniciar()
+        self.parte(url, 0, self.contenido)
+        with mock.patch.object(Documento, 'crear_nueva_version', side_effect=IntegrityError('bloqueo')):
+            with self.assertRaises(IntegrityError):
+                self.client.post(f'{url}completar/', {'documento_padre': self.documento.pk})
+        self.assertEqual(self.client.get(url).data['recibido'], len(self.contenido))
+        self.assertEqual(Documento.objects.count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'{url}completar/', {'documento_padre': self.documento.pk})
+        self.assertEqual(response.status_code, 201, response.data)
+        with Documento.objects.get(pk=response.data['id']).archivo_oficial.open('rb') as file:
+            self.assertEqual(file.read(), self.contenido)
+        carga = url.rstrip('/').rsplit('/', 1)[1]
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, f'documentos/cargas/{carga}.part')))
+
+    def test_rejects_invalid_extension(self):
+        response = self.client.post('/api/processes/cargas/', {'nombre_archivo': 'virus.exe', 'tamano': 10})
+        self.assertEqual(response.status_code, 400)
+
+
+class VersioningTests(CargaTestMixin, DocumentoFileTestCase):
+    """Versiones creadas con la cadena bloqueada y revisión por lotes."""
+
+    def test_new_version_from_old_version(self):
+        segunda = self.documento.crear_nueva_version(archivo_oficial=self.documento.archivo_oficial)
+        tercera = Documento.objects.get(pk=self.documento.pk).crear_nueva_version(archivo_oficial=self.documento.archivo_oficial)
+        self.assertEqual((segunda.version, tercera.version), (2, 3))
+        estados = dict(Documento.filtrar_linaje(self.documento.pk).values_list('version', 'estado'))
+        self.assertEqual(estados, {1: 'OBS', 2: 'OBS', 3: 'VIG'})
+
+    def test_batch_supersede(self):
+        otro = Documento.objects.create(
+            codigo_documento='PR-9', nombre_documento='Procedimiento', proceso=self.documento.proceso,
+            tipo_documento='PR', version=1, archivo_oficial='documentos/oficiales/manual.pdf',
+        )
+        url = self.iniciar()
+        self.parte(url, 0, self.contenido)
+        carga = url.rstrip('/').rsplit('/', 1)[1]
+
+        response = self.client.post('/api/processes/documentos/nuevas_versiones/', [
+            {'documento_padre': self.documento.pk, 'carga_oficial': carga},
+            {'documento_padre': otro.pk, 'nombre_documento': 'Procedimiento revisado'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(Documento.objects.filter(estado='VIG').count(), 2)
+        self.assertEqual(Documento.objects.get(codigo_documento='PR-9', version=2).nombre_documento, 'Procedimiento revisado')
+        with Documento.objects.get(codigo_documento='MAN-1', version=2).archivo_oficial.open('rb') as file:
+            self.assertEqual(file.read(), self.contenido)
+        self.assertFalse(CargaArchivo.objects.exists())
+
+    def test_batch_is_all_or_nothing(self):
+        response = self.client.post('/api/processes/documentos/nuevas_versiones/', [
+            {'documento_padre': self.documento.pk}, {'documento_padre': 0},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Documento.objects.count(), 1)
+
+
+@override_settings(DOCUMENT_EXTRACTION_WORKERS=0)
+class CatalogueTests(DocumentoFileTestCase):
+    """Catálogo por proceso calculado con una consulta y guardado en caché hasta el siguiente cambio."""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def catalogo(self):
+        return self.client.get('/api/processes/documentos/catalogo/').data
+
+    def test_counts_cached_and_invalidated(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.documento.crear_nueva_version(archivo_oficial=self.documento.archivo_oficial)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.catalogo(), [{
+                'proceso': self.documento.proceso_id, 'nombre': 'Proceso', 'vigentes': {'MA': 1},
+                'obsoletos': {'MA': 1}, 'total_vigentes': 1, 'total_obsoletos': 1,
+            }])
+        with self.assertNumQueries(0):
+            self.catalogo()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Documento.objects.create(
+                codigo_documento='PR-1', nombre_documento='Procedimiento', proceso=self.documento.proceso,
+                tipo_documento='PR', version=1, archivo_oficial='documentos/oficiales/manual.pdf',
+            )
+        self.assertEqual(self.catalogo()[0]['vigentes'], {'MA': 1, 'PR': 1})
+
+
+class BundleTests(DocumentoFileTestCase):
+    """ZIP por bloques de los documentos de un proceso, sin recomprimir los formatos comprimidos."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_process_bundle(self):
+        with open(os.path.join(self.media_root, 'documentos/editables/formato.doc'), 'wb') as file:
+            file.write(b'texto ' * 1000)
+        Documento.objects.create(
+            codigo_documento='FR-1', nombre_documento='Formato', proceso=self.documento.proceso, tipo_documento='FR',
+            version=1, archivo_oficial='documentos/oficiales/manual.pdf', archivo_editable='documentos/editables/formato.doc',
+        )
+        Documento.objects.create(
+            codigo_documento='FR-2', nombre_documento='Perdido', proceso=self.documento.proceso, tipo_documento='FR',
+            version=1, archivo_oficial='documentos/oficiales/no-existe.pdf',
+        )
+        response = self.client.get('/api/processes/documentos/bundle/', {'proceso': self.documento.proceso_id, 'editables': '1'})
+        self.assertTrue(response.streaming)
+        with zipfile.ZipFile(BytesIO(b''.join(response.streaming_content))) as archive:
+            infos = {info.filename: info for info in archive.infolist()}
+            self.assertEqual(sorted(infos), [
+                'FALTANTES.txt', 'FR-1 v1 - formato.doc', 'FR-1 v1 - manual.pdf', 'MAN-1 v1 - manual.pdf',
+            ])
+            self.assertEqual(infos['MAN-1 v1 - manual.pdf'].compress_type, zipfile.ZIP_STORED)
+            self.assertEqual(infos['FR-1 v1 - formato.doc'].compress_type, zipfile.ZIP_DEFLATED)
+            self.assertEqual(archive.read('FR-1 v1 - formato.doc'), b'texto ' * 1000)
+            self.assertEqual(archive.read('FALTANTES.txt'), b'FR-2 v1 - no-existe.pdf\n')
+            self.assertIsNone(archive.testzip())
+
+    def test_requires_selection(self):
+        self.assertEqual(self.client.get('/api/processes/documentos/bundle/').status_code, 400)
@@ -0,0 +1,110 @@
+"""
+Cargas por partes y reanudables de archivos de documentos.
+
+    POST   /cargas/                 inicia la carga (nombre, tamaño y sha256 opcional)
+    PUT    /cargas/{id}/parte/      envía una parte con Upload-Offset (o ?offset=)
+    GET    /cargas/{id}/            consulta cuántos bytes se recibieron para retomar
+    POST   /cargas/{id}/completar/  verifica el hash y crea el documento o la nueva versión
+    DELETE /cargas/{id}/            cancela la carga
+
+Cada parte se escribe en su posición del archivo de preparación leyendo el cuerpo de la
+petición por bloques, así que la memoria usada no depende del tamaño del archivo. Reenviar
+una parte ya escrita la sobrescribe con los mismos bytes.
+"""
+import hashlib
+import os
+from django.conf import settings
+from django.db import transaction
+from .models import CargaArchivo, Documento
+from .storage import save_local_file
+
+CHUNK_SIZE = 64 * 1024
+STAGING_DIR = 'documentos/cargas'
+
+
+def staging_path(carga):
+    return os.path.join(settings.MEDIA_ROOT, STAGING_DIR, f'{carga.pk}.part')
+
+
+def create_staging_file(carga):
+    path = staging_path(carga)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+
+
+def write_chunk(carga, offset, stream, length, chunk_size=CHUNK_SIZE):
+    """
+    Escribe hasta `length` bytes de `stream` desde la posición `offset` del archivo de
+    preparación, sin leer lo ya recibido. Retorna la cantidad de bytes escritos.
+    """
+    written = 0
+    with open(staging_path(carga), 'r+b') as file:
+        file.seek(offset)
+        while written < length:
+            data = stream.read(min(chunk_size, length - written))
+            if not data:
+                break
+            file.write(data)
+            written += len(data)
+    return written
+
+
+def finish_staging_file(carga, chunk_size=CHUNK_SIZE):
+    """
+    Recorta lo escrito de más por partes interrumpidas y retorna (ruta, sha256 del archivo).
+    Esta es la única lectura completa del archivo.
+    """
+    path = staging_path(carga)
+    digest = hashlib.sha256()
+    with open(path, 'r+b') as file:
+        file.truncate(carga.tamano)
+        for data in iter(lambda: file.read(chunk_size), b''):
+            digest.update(data)
+    return path, digest.hexdigest()
+
+
+def discard_staging_file(carga):
+    _remove(staging_path(carga))
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class UploadHashMismatch(Exception):
+    """El SHA-256 del archivo recibido no coincide con el declarado al iniciar la carga."""
+
+
+def verify_upload(carga):
+    """
+    Verifica el hash de la carga completa y retorna (ruta, sha256).
+    Si no coincide con el declarado, reinicia la carga y lanza UploadHashMismatch.
+    """
+    path, file_hash = finish_staging_file(carga)
+    if carga.sha256 and carga.sha256 != file_hash:
+        # Se reinicia la carga para que el cliente la vuelva a enviar
+        create_staging_file(carga)
+        CargaArchivo.objects.filter(pk=carga.pk).update(recibido=0)
+        raise UploadHashMismatch(carga.pk)
+    return path, file_hash
+
+
+def store_upload(carga, verified=None):
+    """
+    Guarda la carga verificada en el almacenamiento de su campo y retorna el nombre guardado.
+    `verified` es el resultado de verify_upload si ya se verificó antes.
+
+    El archivo de preparación se elimina solo cuando se confirma la transacción: si falla
+    la creación del documento, la carga sigue completa y se puede volver a completar (el
+    blob que haya quedado sin referencias lo elimina gc_document_blobs).
+    """
+    path, file_hash = verified or verify_upload(carga)
+    name = save_local_file(
+        Documento._meta.get_field(carga.campo), path, carga.nombre_archivo, file_hash, keep_source=True
+    )
+    # La ruta se calcula ahora: al confirmar, la carga ya se eliminó y no tiene pk
+    transaction.on_commit(lambda: _remove(path))
+    return name
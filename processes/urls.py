@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DocumentoViewSet
+from .views import CargaArchivoViewSet, DocumentoViewSet
 
 router = DefaultRouter()
 router.register(r'documentos', DocumentoViewSet)
+router.register(r'cargas', CargaArchivoViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
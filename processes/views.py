@@ -1,44 +1,47 @@
-from django.http import HttpResponse, Http404
+from django.conf import settings
+from django.http import HttpResponse, Http404, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
 from django.shortcuts import get_object_or_404
 from django.views.decorators.clickjacking import xframe_options_sameorigin
 from django.utils.decorators import method_decorator
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework_simplejwt.authentication import JWTAuthentication
-from rest_framework_simplejwt.tokens import AccessToken
 import mimetypes
 import os
 
 from django.shortcuts import render
-from rest_framework import viewsets
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import mixins, status, viewsets
 from rest_framework.permissions import IsAuthenticated
-from .models import Documento
-from .serializers import DocumentoSerializer
+from . import uploads
+from .models import CargaArchivo, Documento
+from .authentication import QueryStringJWTAuthentication
+from .bundles import stream_zip
+from .file_responses import serve_file
+from .pagination import DocumentoPagination, DocumentoSearchPagination
+from .search import get_backend
+from .serializers import CargaArchivoSerializer, CompletarCargaSerializer, DocumentoSerializer, NuevaVersionSerializer
 from django.http import FileResponse
 
+# Solo los visores aceptan el token en la URL (queda en registros de acceso, Referer e
+# historial); se valida una vez y se reutiliza en las peticiones siguientes del visor
+VISOR_AUTHENTICATION = [JWTAuthentication, QueryStringJWTAuthentication]
+
+
 class DocumentoViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Documento.objects.all().order_by('-fecha_actualizacion')
     serializer_class = DocumentoSerializer
+    pagination_class = DocumentoPagination
     http_method_names = ['get', 'post', 'put', 'patch', 'delete']
+    versiones_max = 500
 
-    @action(detail=True, methods=['get'])
+    @action(detail=True, methods=['get'], authentication_classes=VISOR_AUTHENTICATION)
     @method_decorator(xframe_options_sameorigin)
     def preview(self, request, pk=None):
-        """Endpoint para previsualizar documentos"""
-        # Manejar autenticación por token en query params
-        token = request.GET.get('token')
-        if token:
-            try:
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                user = User.objects.get(id=user_id)
-                request.user = user
-            except Exception:
-                return HttpResponse('Token inválido', status=401)
-        
+        """Endpoint para previsualizar documentos (acepta el token en ?token= para visores embebidos)"""
         documento = self.get_object()
         
         # Determinar qué archivo mostrar
@@ -55,35 +58,148 @@ class DocumentoViewSet(viewsets.ModelViewSet):
             # Determinar el tipo de contenido
             content_type, _ = mimetypes.guess_type(archivo.name)
             
-            # Leer el archivo
-            file_data = archivo.read()
-            
-            response = HttpResponse(file_data, content_type=content_type)
+            # Enviar el archivo por bloques, respetando Range para que el visor de PDF cargue por partes
+            response = serve_file(
+                request, archivo, content_type or 'application/octet-stream',
+                f'inline; filename="{os.path.basename(archivo.name)}"',
+                last_modified=documento.fecha_actualizacion,
+            )
             response['X-Frame-Options'] = 'SAMEORIGIN'
-            response['Content-Disposition'] = f'inline; filename="{os.path.basename(archivo.name)}"'
             
             return response
             
         except Exception as e:
             return HttpResponse(f'Error al acceder al archivo: {str(e)}', status=500)
 
-    from django.http import FileResponse
+    @action(detail=True, methods=['get'], authentication_classes=VISOR_AUTHENTICATION)
+    def thumbnail(self, request, pk=None):
+        """
+        Miniatura de la primera página. Con ?v= igual al hash actual (miniatura_url del
+        serializador) se puede guardar en caché sin vencimiento; sin él, se revalida por ETag.
+        """
+        documento = self.get_object()
+        if not documento.miniatura:
+            return HttpResponse('El documento no tiene miniatura', status=404)
 
-    @action(detail=True, methods=['get'])
-    def download(self, request, pk=None):
-        """Endpoint para descargar documentos"""
-        token = request.GET.get('token')
-        if token:
+        version = os.path.splitext(os.path.basename(documento.miniatura.name))[0]
+        inmutable = request.query_params.get('v') == version
+        try:
+            response = serve_file(
+                request, documento.miniatura, 'image/jpeg', f'inline; filename="{version}.jpg"',
+                max_age=settings.DOCUMENT_THUMBNAIL_MAX_AGE if inmutable else None,
+            )
+        except FileNotFoundError:
+            return HttpResponse('El documento no tiene miniatura', status=404)
+        if inmutable:
+            patch_cache_control(response, immutable=True)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def buscar(self, request):
+        """
+        Búsqueda de texto completo por nombre, código, proceso, tipo y contenido (?q=),
+        ordenada por relevancia y paginada por número de página
+        """
+        resultados = get_backend().search(request.query_params.get('q', ''), self.get_queryset())
+        paginator = DocumentoSearchPagination()
+        page = paginator.paginate_queryset(resultados, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['post'])
+    def nuevas_versiones(self, request):
+        """
+        Reemplaza varios documentos a la vez (revisión del manual de calidad): una lista de
+        {documento_padre, nombre_documento?, tipo_documento?, proceso?, carga_oficial?, carga_editable?}.
+        Todas las versiones se crean en una sola transacción; si una falla no se crea ninguna.
+        """
+        if not isinstance(request.data, list) or not request.data:
+            return Response({'detail': 'Se espera una lista de versiones.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > self.versiones_max:
+            return Response(
+                {'detail': f'Máximo {self.versiones_max} versiones por petición.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+        serializer = NuevaVersionSerializer(data=request.data, many=True, context=self.get_serializer_context())
+        serializer.is_valid(raise_exception=True)
+
+        # Se verifican los archivos antes de la transacción: una carga con hash distinto se reinicia
+        cargas = [item[field] for item in serializer.validated_data for field in ('carga_oficial', 'carga_editable') if field in item]
+        if len({carga.pk for carga in cargas}) < len(cargas):
+            return Response({'detail': 'Cada carga se puede usar una sola vez.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            verificadas = {carga.pk: uploads.verify_upload(carga) for carga in cargas}
+        except uploads.UploadHashMismatch as error:
+            return Response(
+                {'detail': f'El SHA-256 de la carga {error.args[0]} no coincide.'}, status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Cadenas en orden de raíz para que dos revisiones simultáneas bloqueen en el mismo orden
+        items = sorted(serializer.validated_data, key=lambda item: item['documento_padre'].raiz_id)
+        creados = []
+        with transaction.atomic():
+            for item in items:
+                padre = item.pop('documento_padre')
+                archivos = {'archivo_oficial': padre.archivo_oficial, 'archivo_editable': padre.archivo_editable}
+                for field, campo in (('carga_oficial', 'archivo_oficial'), ('carga_editable', 'archivo_editable')):
+                    carga = item.pop(field, None)
+                    if carga is not None:
+                        archivos[campo] = uploads.store_upload(carga, verificadas[carga.pk])
+                creados.append(padre.crear_nueva_version(**item, **archivos))
+            CargaArchivo.objects.filter(pk__in=[carga.pk for carga in cargas]).delete()
+        return Response(self.get_serializer(creados, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['get'])
+    def catalogo(self, request):
+        """Conteo de documentos vigentes y obsoletos por tipo en cada proceso (?proceso= para uno solo)"""
+        catalogo = Documento.get_catalogo()
+        proceso = request.query_params.get('proceso')
+        if proceso:
+            catalogo = [fila for fila in catalogo if str(fila['proceso']) == proceso]
+        return Response(catalogo)
+
+    @action(detail=False, methods=['get'])
+    def bundle(self, request):
+        """
+        ZIP de los documentos vigentes de un proceso (?proceso=) o de los indicados (?ids=1,2,3),
+        generado por bloques mientras se descarga. Con ?editables=1 incluye también los editables.
+        """
+        documentos = self.get_queryset()
+        if request.query_params.get('ids'):
             try:
-                access_token = AccessToken(token)
-                user_id = access_token['user_id']
-                from django.contrib.auth import get_user_model
-                User = get_user_model()
-                user = User.objects.get(id=user_id)
-                request.user = user
-            except Exception:
-                return HttpResponse('Token inválido', status=401)
+                ids = [int(pk) for pk in request.query_params['ids'].split(',')]
+            except ValueError:
+                return Response({'detail': 'ids debe ser una lista de números separados por comas.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            documentos = documentos.filter(pk__in=ids)
+            filename = 'documentos.zip'
+        elif request.query_params.get('proceso'):
+            documentos = documentos.filter(proceso_id=request.query_params['proceso'], estado='VIG', activo=True)
+            filename = f"proceso-{request.query_params['proceso']}.zip"
+        else:
+            return Response({'detail': 'Indique ?proceso= o ?ids='}, status=status.HTTP_400_BAD_REQUEST)
+
+        campos = ['archivo_oficial'] + (['archivo_editable'] if request.query_params.get('editables') == '1' else [])
+        entries = (
+            (documento, getattr(documento, campo))
+            for documento in documentos.order_by('codigo_documento', 'version').iterator()
+            for campo in campos if getattr(documento, campo)
+        )
+        response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
 
+    @action(detail=True, methods=['get'])
+    def historial(self, request, pk=None):
+        """Historial completo de versiones del documento (una consulta sin importar la longitud de la cadena)"""
+        documento = self.get_object()
+        serializer = self.get_serializer(documento.get_historial(), many=True)
+        return Response(serializer.data)
+
+    from django.http import FileResponse
+
+    @action(detail=True, methods=['get'], authentication_classes=VISOR_AUTHENTICATION)
+    def download(self, request, pk=None):
+        """Endpoint para descargar documentos (acepta el token en ?token=)"""
         documento = self.get_object()
         
         tipo_archivo = request.GET.get('tipo', 'oficial')
@@ -111,10 +227,11 @@ class DocumentoViewSet(viewsets.ModelViewSet):
             ext = os.path.splitext(filename)[1].lower()
             content_type = MIME_TYPES.get(ext, 'application/octet-stream')
 
-            response = FileResponse(archivo, content_type=content_type)
-            response['Content-Disposition'] = f'attachment; filename="{filename}"'
-
-            return response
+            # Por bloques y con Range (descargas reanudables), o entregado por el proxy si está configurado
+            return serve_file(
+                request, archivo, content_type, f'attachment; filename="{filename}"',
+                last_modified=documento.fecha_actualizacion,
+            )
 
         except Exception as e:
             return HttpResponse(f'Error al acceder al archivo: {str(e)}', status=500)
@@ -140,4 +257,75 @@ class DocumentoViewSet(viewsets.ModelViewSet):
                 serializer.save(documento_padre=documento_padre)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
             
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class CargaArchivoViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, mixins.DestroyModelMixin,
+                          viewsets.GenericViewSet):
+    """Cargas por partes y reanudables de archivos de documentos (ver processes/uploads.py)"""
+    permission_classes = [IsAuthenticated]
+    queryset = CargaArchivo.objects.all()
+    serializer_class = CargaArchivoSerializer
+
+    def get_queryset(self):
+        return super().get_queryset().filter(usuario=self.request.user)
+
+    def perform_create(self, serializer):
+        carga = serializer.save(usuario=self.request.user)
+        uploads.create_staging_file(carga)
+
+    def perform_destroy(self, instance):
+        uploads.discard_staging_file(instance)
+        instance.delete()
+
+    @action(detail=True, methods=['put'])
+    def parte(self, request, pk=None):
+        """Escribe el cuerpo de la petición desde la posición Upload-Offset (o ?offset=)"""
+        carga = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', request.query_params.get('offset', '')))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'detail': 'Indique la posición de la parte en Upload-Offset.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        if offset < 0 or offset > carga.recibido:
+            # No se aceptan huecos: el cliente debe retomar desde lo recibido
+            return Response({'recibido': carga.recibido}, status=status.HTTP_409_CONFLICT)
+        if length > settings.DOCUMENT_UPLOAD_MAX_CHUNK or offset + length > carga.tamano:
+            return Response(
+                {'detail': 'La parte supera el tamaño permitido o el tamaño declarado del archivo.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        written = uploads.write_chunk(carga, offset, request.stream, length) if length else 0
+        CargaArchivo.objects.filter(pk=carga.pk, recibido__gte=offset, recibido__lt=offset + written).update(
+            recibido=offset + written, fecha_actualizacion=timezone.now()
+        )
+        carga.refresh_from_db(fields=['recibido'])
+        return Response({'recibido': carga.recibido})
+
+    @action(detail=True, methods=['post'])
+    def completar(self, request, pk=None):
+        """Verifica el archivo y lo asigna a un documento nuevo o a una nueva versión"""
+        carga = self.get_object()
+        if carga.recibido < carga.tamano:
+            return Response({'recibido': carga.recibido}, status=status.HTTP_409_CONFLICT)
+        serializer = CompletarCargaSerializer(data=request.data, context={'carga': carga, 'request': request})
+        serializer.is_valid(raise_exception=True)
+
+        with transaction.atomic():
+            try:
+                name = uploads.store_upload(carga)
+            except uploads.UploadHashMismatch:
+                return Response({'detail': 'El SHA-256 del archivo recibido no coincide.'}, status=status.HTTP_400_BAD_REQUEST)
+            datos = dict(serializer.validated_data)
+            padre = datos.pop('documento_padre', None)
+            if padre:
+                datos.pop('codigo_documento', None)
+                datos.pop('version', None)
+                archivos = {'archivo_oficial': padre.archivo_oficial, carga.campo: name}
+                documento = padre.crear_nueva_version(**datos, **archivos)
+            else:
+                documento = Documento.objects.create(**datos, archivo_oficial=name)
+            carga.delete()
+        return Response(DocumentoSerializer(documento, context=self.get_serializer_context()).data,
+                        status=status.HTTP_201_CREATED)
@@ -161,12 +161,12 @@ class Verify2FAView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 class RoleListCreateView(generics.ListCreateAPIView):
-    queryset = Role.objects.all()
+    queryset = Role.objects.select_related('app')
     serializer_class = RoleSerializer
     permission_classes = [permissions.IsAdminUser]
 
 class UserListView(generics.ListAPIView):
-    queryset = User.objects.all()
+    queryset = User.objects.prefetch_related('roles__app')
     serializer_class = UserSerializer
     permission_classes = [permissions.IsAuthenticated]
 